@@ -0,0 +1,263 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db.models import BigIntegerField, Count, Func, Max, Min, Q, Sum
+from django.db.models.functions import Substr
+from polaris.compaction import compacted_before
+from polaris.models import CellInfo, CellInfoRollup, Test, TestRollup, TileRollup
+from polaris.rollups import TILE_ROLLUP_ZOOMS, watermark
+from utils.geo import bbox_tiles, covering_quadkeys, quadkey_to_xy
+import math
+
+BUCKETS = {
+    '1m': 60,
+    '5m': 5 * 60,
+    '1h': 60 * 60,
+    '1d': 24 * 60 * 60,
+}
+
+GROUP_FIELDS = ['plmn', 'gen', 'tech', 'cid']
+
+STATS = ['count', 'mean', 'min', 'max', 'p50', 'p90']
+
+PERCENTILES = {'p50': 50, 'p90': 90}
+
+# Each percentile costs one query per series point, so requests for more
+# points than this are refused.
+MAX_PERCENTILE_POINTS = 500
+
+ROLLUP_SECONDS = 60 * 60
+
+HEATMAP_METRICS = ['rsrp', 'rsrq', 'rscp', 'ecno', 'rxlev']
+
+MAX_HEATMAP_TILES = 4096
+
+# metric -> (model, value field, test type)
+METRICS = {
+    'rsrp': (CellInfo, 'rsrp', None),
+    'rsrq': (CellInfo, 'rsrq', None),
+    'rscp': (CellInfo, 'rscp', None),
+    'ecno': (CellInfo, 'ecno', None),
+    'rxlev': (CellInfo, 'rxlev', None),
+    'download_throughput': (Test, 'httpdownloadtest__throughput', 'http_download'),
+    'upload_throughput': (Test, 'httpuploadtest__throughput', 'http_upload'),
+    'latency': (Test, 'pingtest__latency', 'ping'),
+    'dns_time': (Test, 'dnstest__time', 'dns'),
+    'web_response_time': (Test, 'webtest__response_time', 'web'),
+    'sms_send_time': (Test, 'smstest__send_time', 'sms'),
+}
+
+
+class EpochBucket(Func):
+    """Index of the fixed-width bucket containing a datetime, i.e. floor(epoch / seconds)."""
+    output_field = BigIntegerField()
+
+    def __init__(self, expression, seconds):
+        self.seconds = int(seconds)
+        super().__init__(expression)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        template = f'FLOOR(EXTRACT(EPOCH FROM %(expressions)s) / {self.seconds})'
+        return super().as_sql(compiler, connection, template=template, **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        template = f"FLOOR(TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', %(expressions)s) / {self.seconds})"
+        return super().as_sql(compiler, connection, template=template, **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        template = f"CAST(strftime('%%%%s', %(expressions)s) AS INTEGER) / {self.seconds}"
+        return super().as_sql(compiler, connection, template=template, **extra_context)
+
+
+def bucket_start(index, seconds):
+    start = datetime.fromtimestamp(index * seconds, tz=dt_timezone.utc)
+    return start.isoformat().replace('+00:00', 'Z')
+
+
+def metric_query(metric, since):
+    model, field, test_type = METRICS[metric]
+    query = model.objects.filter(timestamp__gte=since, **{f'{field}__isnull': False})
+    if test_type:
+        query = query.filter(test_type=test_type)
+    return query, field
+
+
+def group_path(metric, name):
+    model = METRICS[metric][0]
+    return f'cell_info__{name}' if model is Test else name
+
+
+def _raw_groups(query, field, seconds, paths):
+    return (
+        query.annotate(bucket_index=EpochBucket('timestamp', seconds))
+        .values('bucket_index', *paths)
+        .annotate(count=Count(field), total=Sum(field), min=Min(field), max=Max(field))
+        .order_by()
+    )
+
+
+def _rollup_groups(metric, seconds, group_by, since):
+    model, _, test_type = METRICS[metric]
+    if model is Test:
+        query = TestRollup.objects.filter(test_type=test_type)
+        prefix = 'value'
+    else:
+        query = CellInfoRollup.objects.all()
+        prefix = metric
+    return (
+        query.filter(bucket__gte=since, **{f'{prefix}_count__gt': 0})
+        .annotate(bucket_index=EpochBucket('bucket', seconds))
+        .values('bucket_index', *group_by)
+        .annotate(
+            count=Sum(f'{prefix}_count'), total=Sum(f'{prefix}_sum'),
+            min=Min(f'{prefix}_min'), max=Max(f'{prefix}_max'),
+        )
+        .order_by()
+    )
+
+
+def _merge_groups(merged, rows, paths):
+    for row in rows:
+        key = tuple(row[path] for path in paths)
+        group = merged.get(key)
+        if group is None:
+            merged[key] = {'count': row['count'], 'total': row['total'] or 0, 'min': row['min'], 'max': row['max']}
+            continue
+        group['count'] += row['count']
+        group['total'] += row['total'] or 0
+        group['min'] = row['min'] if group['min'] is None else min(group['min'], row['min'])
+        group['max'] = row['max'] if group['max'] is None else max(group['max'], row['max'])
+
+
+def can_use_rollups(bucket, stats):
+    return BUCKETS[bucket] % ROLLUP_SECONDS == 0 and all(stat not in PERCENTILES for stat in stats)
+
+
+def aggregate_series(metric, bucket, group_by, since, stats):
+    """
+    Compute per-bucket statistics of ``metric`` in the database.
+
+    Hour-aligned buckets without percentiles are served from the hourly rollups,
+    topped up with the raw rows the rollups do not cover yet: the partial first
+    hour and everything above the rollup watermark.
+
+    Otherwise count/mean/min/max come from one GROUP BY over the raw rows.
+    Each percentile is then read in the database as the nearest-rank row of
+    its group, one ORDER BY value LIMIT 1 OFFSET rank query per point, and
+    ValueError is raised when that would exceed MAX_PERCENTILE_POINTS points.
+
+    Returns ``(series, source)`` where source is 'rollup' or 'raw'.
+    """
+    seconds = BUCKETS[bucket]
+    query, field = metric_query(metric, since)
+    paths = [group_path(metric, name) for name in group_by]
+    groups = {}
+
+    if can_use_rollups(bucket, stats):
+        source = 'rollup'
+        first_hour = since.replace(minute=0, second=0, microsecond=0)
+        if first_hour < since:
+            first_hour += timedelta(hours=1)
+        covered = watermark('test' if METRICS[metric][0] is Test else 'cell_info')
+
+        _merge_groups(groups, _rollup_groups(metric, seconds, group_by, first_hour), ['bucket_index', *group_by])
+        uncovered = query.filter(Q(timestamp__lt=first_hour) | Q(id__gt=covered))
+        _merge_groups(groups, _raw_groups(uncovered, field, seconds, paths), ['bucket_index', *paths])
+    else:
+        source = 'raw'
+        _merge_groups(groups, _raw_groups(query, field, seconds, paths), ['bucket_index', *paths])
+
+    series = {}
+    for key in sorted(groups, key=lambda key: tuple((value is None, value) for value in key)):
+        group = groups[key]
+        group['mean'] = group['total'] / group['count']
+        point = {'bucket_start': bucket_start(key[0], seconds)}
+        point.update(zip(group_by, key[1:]))
+        point.update({stat: group[stat] for stat in ('count', 'mean', 'min', 'max') if stat in stats})
+        series[key] = (group['count'], point)
+
+    wanted = [stat for stat in PERCENTILES if stat in stats]
+    if not wanted:
+        return [point for _, point in series.values()], source
+    if len(series) > MAX_PERCENTILE_POINTS:
+        raise ValueError(
+            f"Percentiles are limited to {MAX_PERCENTILE_POINTS} points; use a wider bucket, "
+            f"fewer group_by fields or a shorter range."
+        )
+
+    for key, (count, point) in series.items():
+        start = datetime.fromtimestamp(key[0] * seconds, tz=dt_timezone.utc)
+        values = (
+            query.filter(timestamp__gte=start, timestamp__lt=start + timedelta(seconds=seconds))
+            .filter(**dict(zip(paths, key[1:])))
+            .order_by(field)
+            .values_list(field, flat=True)
+        )
+        ranks = {}
+        for stat in wanted:
+            rank = max(math.ceil(PERCENTILES[stat] / 100 * count) - 1, 0)
+            if rank not in ranks:
+                ranks[rank] = values[rank]
+            point[stat] = ranks[rank]
+
+    return [point for _, point in series.values()], source
+
+
+def _tile_ranges(prefixes):
+    ranges = Q()
+    for prefix in prefixes:
+        # Quadkey digits are 0-3, so every key starting with prefix sorts below prefix + '4'.
+        ranges |= Q(tile__gte=prefix, tile__lt=prefix + '4')
+    return ranges
+
+
+def tile_heatmap(metric, min_lat, min_lng, max_lat, max_lng, zoom, since):
+    """
+    Aggregate ``metric`` per map tile at ``zoom`` for the tiles overlapping a
+    bounding box, each tile counted whole.
+
+    Rolled up hours are read from the tile rollups of the next stored zoom
+    level, so their cost follows the number of tiles and hours rather than the
+    number of measurements. Only the partial first hour and the rows above the
+    rollup watermark are grouped from raw CellInfo rows.
+
+    When ``since`` falls before the compaction horizon its raw rows are gone,
+    so the hour containing it is taken whole from the rollups instead.
+    """
+    level = min(level for level in TILE_ROLLUP_ZOOMS if level >= zoom)
+    prefixes = covering_quadkeys(min_lat, min_lng, max_lat, max_lng)
+    first_hour = since.replace(minute=0, second=0, microsecond=0)
+    horizon = compacted_before()
+    if first_hour < since and (horizon is None or since >= horizon):
+        first_hour += timedelta(hours=1)
+
+    rollups = (
+        TileRollup.objects.filter(_tile_ranges({key[:level] for key in prefixes}))
+        .filter(zoom=level, bucket__gte=first_hour, **{f'{metric}_count__gt': 0})
+        .annotate(quadkey=Substr('tile', 1, zoom))
+        .values('quadkey')
+        .annotate(
+            count=Sum(f'{metric}_count'), total=Sum(f'{metric}_sum'),
+            min=Min(f'{metric}_min'), max=Max(f'{metric}_max'),
+        )
+        .order_by()
+    )
+    raw = (
+        CellInfo.objects.filter(_tile_ranges(prefixes))
+        .filter(timestamp__gte=since, **{f'{metric}__isnull': False})
+        .filter(Q(timestamp__lt=first_hour) | Q(id__gt=watermark('cell_info')))
+        .annotate(quadkey=Substr('tile', 1, zoom))
+        .values('quadkey')
+        .annotate(count=Count(metric), total=Sum(metric), min=Min(metric), max=Max(metric))
+        .order_by()
+    )
+    groups = {}
+    _merge_groups(groups, rollups, ['quadkey'])
+    _merge_groups(groups, raw, ['quadkey'])
+
+    x0, y0, x1, y1 = bbox_tiles(min_lat, min_lng, max_lat, max_lng, zoom)
+    tiles = []
+    for (key,), group in sorted(groups.items()):
+        x, y = quadkey_to_xy(key)
+        if x0 <= x <= x1 and y0 <= y <= y1:
+            tiles.append({'quadkey': key, 'x': x, 'y': y, 'z': zoom, 'count': group['count'],
+                          'mean': group['total'] / group['count'], 'min': group['min'], 'max': group['max']})
+    return tiles
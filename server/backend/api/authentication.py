@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from polaris.models import User
+import hashlib
+
+# Short enough that a token deleted outside this module (admin, shell) stops
+# working quickly even on cache backends the signals below cannot reach.
+TOKEN_CACHE_TIMEOUT = 60
+
+
+def _key(token_key):
+    return f"auth_token_{hashlib.sha256(token_key.encode()).hexdigest()}"
+
+
+def invalidate_token(token_key):
+    cache.delete(_key(token_key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps resolved tokens, with their user, in the
+    Django cache for ``TOKEN_CACHE_TIMEOUT`` seconds, so devices polling every
+    few seconds do not each cost a token/user join.
+    """
+
+    def authenticate_credentials(self, key):
+        token = cache.get(_key(key))
+        if token is None:
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            cache.set(_key(key), token, timeout=TOKEN_CACHE_TIMEOUT)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return (token.user, token)
+
+
+@receiver(post_delete, sender=Token)
+def _evict_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def _evict_user_tokens(sender, instance, created, **kwargs):
+    if not created:
+        for token_key in Token.objects.filter(user=instance).values_list('key', flat=True):
+            invalidate_token(token_key)
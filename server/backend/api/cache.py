@@ -0,0 +1,63 @@
+from django.core.cache import cache
+import hashlib
+import time
+
+CACHE_TIMEOUT = 5 * 60
+
+# Relative ranges ('1d', '1w', ...) are pinned to this many seconds so that
+# repeated dashboard requests within the window share a cache entry.
+RANGE_BUCKET_SECONDS = 60
+
+NAMESPACES = ['cell_info', 'tests']
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def current_version(namespace):
+    version = cache.get(f"readcache_version_{namespace}")
+    if version is None:
+        cache.add(f"readcache_version_{namespace}", 1, timeout=None)
+        version = cache.get(f"readcache_version_{namespace}", 1)
+    return version
+
+
+def invalidate(namespace):
+    """Bump the namespace version so every cached response for it becomes unreachable."""
+    _incr(f"readcache_version_{namespace}")
+
+
+def cache_key(namespace, params):
+    normalized = sorted(
+        (key.lower(), value.strip().lower() if key.lower() == 'range' else value.strip())
+        for key, value in params.items()
+    )
+    digest = hashlib.sha1(repr(normalized).encode()).hexdigest()
+    window = int(time.time() // RANGE_BUCKET_SECONDS)
+    return f"readcache_{namespace}_v{current_version(namespace)}_{window}_{digest}"
+
+
+def lookup(namespace, key):
+    data = cache.get(key)
+    _incr(f"readcache_{namespace}_{'misses' if data is None else 'hits'}")
+    return data
+
+
+def store(key, data):
+    cache.set(key, data, timeout=CACHE_TIMEOUT)
+
+
+def stats():
+    return {
+        namespace: {
+            'hits': cache.get(f"readcache_{namespace}_hits", 0),
+            'misses': cache.get(f"readcache_{namespace}_misses", 0),
+            'version': current_version(namespace),
+        }
+        for namespace in NAMESPACES
+    }
@@ -0,0 +1,129 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError, UnsupportedMediaType
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from . import instrumentation
+import gzip
+import io
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content-Encoding of request bodies and negotiated compression of listing
+# responses. zstd is offered only when the zstandard package is installed.
+
+CHUNK_SIZE = 64 * 1024
+MAX_DECOMPRESSED_REQUEST_SIZE = 10 * 1024 * 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_errors = (OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Decompressed request body is too large.'
+    default_code = 'request_too_large'
+
+
+def encodings():
+    """Supported codings in order of preference."""
+    return (['zstd'] if zstandard is not None else []) + ['gzip']
+
+
+def _reader(stream, encoding):
+    if encoding == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    raise UnsupportedMediaType(f'Content-Encoding: {encoding}')
+
+
+def decompress(stream, encoding, limit=None):
+    """
+    The decompressed body of ``stream`` as a file object. It is read in
+    CHUNK_SIZE pieces and RequestTooLarge is raised as soon as it grows past
+    ``limit`` bytes, so a small compressed body cannot expand without bound.
+    """
+    if limit is None:
+        limit = getattr(settings, 'MAX_DECOMPRESSED_REQUEST_SIZE', MAX_DECOMPRESSED_REQUEST_SIZE)
+    reader = _reader(stream, encoding)
+    body = io.BytesIO()
+    try:
+        while True:
+            chunk = reader.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if body.tell() + len(chunk) > limit:
+                raise RequestTooLarge()
+            body.write(chunk)
+    except _errors as e:
+        raise ParseError(f'Invalid {encoding} body: {e}')
+    body.seek(0)
+    return body
+
+
+class DecompressingJSONParser(JSONParser):
+    """JSONParser that also accepts bodies sent with ``Content-Encoding: gzip`` or ``zstd``."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower() if request else ''
+        if encoding not in ('', 'identity'):
+            with instrumentation.compressing():
+                stream = decompress(stream, encoding)
+        return super().parse(stream, media_type, parser_context)
+
+
+# DRF's default parsers, with JSON bodies optionally compressed.
+INGEST_PARSERS = [DecompressingJSONParser, FormParser, MultiPartParser]
+
+
+def negotiate(accept_encoding):
+    """The preferred coding that ``accept_encoding`` allows, or None."""
+    accepted = set()
+    refused = set()
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        quality = params.strip().lower()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    # An explicit q=0 refuses the coding even when '*' is accepted.
+                    refused.add(coding)
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    for encoding in encodings():
+        if encoding in accepted or ('*' in accepted and encoding not in refused):
+            return encoding
+    return None
+
+
+def _compressor(encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def compress(body, encoding):
+    if encoding == 'zstd':
+        # One-shot frames record the content size, which some decoders need.
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    compressor = _compressor(encoding)
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_chunks(chunks, encoding):
+    """Compress an iterator of str or bytes chunks into one ``encoding`` stream."""
+    compressor = _compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
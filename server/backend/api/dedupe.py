@@ -0,0 +1,36 @@
+from django.core.cache import cache
+
+# How long a client measurement UUID is remembered in the cache. Retries older
+# than this still deduplicate, through the unique index instead.
+RECENT_ID_TIMEOUT = 24 * 60 * 60
+
+
+def _key(kind, uuid):
+    return f"ingest_seen_{kind}_{uuid}"
+
+
+def recent_id(kind, uuid):
+    return cache.get(_key(kind, uuid))
+
+
+def remember(kind, ids):
+    """Record ``{uuid: pk}`` pairs of freshly stored measurements."""
+    if ids:
+        cache.set_many({_key(kind, uuid): pk for uuid, pk in ids.items()}, timeout=RECENT_ID_TIMEOUT)
+
+
+def known_ids(kind, model, uuids):
+    """
+    Map every UUID in ``uuids`` that is already stored to its primary key,
+    consulting the recent-ID cache first and the database only for the rest.
+    """
+    uuids = set(uuids)
+    if not uuids:
+        return {}
+
+    cached = cache.get_many([_key(kind, uuid) for uuid in uuids])
+    found = {uuid: cached[_key(kind, uuid)] for uuid in uuids if _key(kind, uuid) in cached}
+    missing = uuids - found.keys()
+    if missing:
+        found.update(model.objects.filter(uuid__in=missing).values_list('uuid', 'id'))
+    return found
@@ -0,0 +1,194 @@
+from datetime import timezone as dt_timezone
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from operator import itemgetter
+from polaris.models import CellInfo, Test
+from utils.time_range import parse_range
+from .aggregation import METRICS
+from .pagination import keyset_page
+import io
+
+# Rows read per keyset query, and so per Parquet row group / Arrow record batch.
+EXPORT_CHUNK_SIZE = 50000
+
+FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# dataset -> (model, [(column, ORM path, arrow type)])
+DATASETS = {
+    'cell_info': (CellInfo, [
+        ('id', 'id', 'int64'),
+        ('uuid', 'uuid', 'string'),
+        ('phone_number', 'phone_number_id', 'string'),
+        ('timestamp', 'timestamp', 'timestamp'),
+        ('lat', 'lat', 'float64'),
+        ('lng', 'lng', 'float64'),
+        ('tile', 'tile', 'string'),
+        ('gen', 'gen', 'string'),
+        ('tech', 'tech', 'string'),
+        ('plmn', 'plmn', 'string'),
+        ('cid', 'cid', 'int64'),
+        ('lac', 'lac', 'int64'),
+        ('rac', 'rac', 'int64'),
+        ('tac', 'tac', 'int64'),
+        ('freq_band', 'freq_band', 'float64'),
+        ('afrn', 'afrn', 'float64'),
+        ('freq', 'freq', 'float64'),
+        ('rsrp', 'rsrp', 'float64'),
+        ('rsrq', 'rsrq', 'float64'),
+        ('rscp', 'rscp', 'float64'),
+        ('ecno', 'ecno', 'float64'),
+        ('rxlev', 'rxlev', 'float64'),
+    ]),
+    'tests': (Test, [
+        ('id', 'id', 'int64'),
+        ('uuid', 'uuid', 'string'),
+        ('phone_number', 'phone_number_id', 'string'),
+        ('timestamp', 'timestamp', 'timestamp'),
+        ('type', 'test_type', 'string'),
+        ('cell_info', 'cell_info_id', 'int64'),
+        ('lat', 'cell_info__lat', 'float64'),
+        ('lng', 'cell_info__lng', 'float64'),
+        ('gen', 'cell_info__gen', 'string'),
+        ('tech', 'cell_info__tech', 'string'),
+        ('plmn', 'cell_info__plmn', 'string'),
+        ('cid', 'cell_info__cid', 'int64'),
+    ] + [
+        # One sparse column per subtype value, filled only for tests of that type.
+        (metric, field, 'float64') for metric, (model, field, _) in METRICS.items() if model is Test
+    ]),
+}
+
+
+def load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Exports need the 'pyarrow' package listed in requirements.txt.")
+    return pyarrow
+
+
+def _parse_timestamp(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid timestamp '{value}', use ISO 8601.")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, dt_timezone.utc)
+
+
+def parse_bounds(time_filter=None, start=None, end=None):
+    """Resolve either a relative range ('1w') or ISO start/end into ``(start, end)``."""
+    if time_filter:
+        return timezone.now() - parse_range(time_filter), None
+    return (
+        _parse_timestamp(start) if start else None,
+        _parse_timestamp(end) if end else None,
+    )
+
+
+def export_schema(dataset):
+    pa = load_pyarrow()
+    types = {
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'string': pa.string(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([(column, types[type_name]) for column, _, type_name in DATASETS[dataset][1]])
+
+
+def export_query(dataset, start=None, end=None):
+    model, columns = DATASETS[dataset]
+    query = model.objects.all()
+    if start is not None:
+        query = query.filter(timestamp__gte=start)
+    if end is not None:
+        query = query.filter(timestamp__lt=end)
+    return query.values(*(path for _, path, _ in columns))
+
+
+def iter_record_batches(dataset, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the rows of ``dataset`` in [start, end) as Arrow record batches of at
+    most ``chunk_size`` rows, reading one keyset page per batch.
+    """
+    pa = load_pyarrow()
+    schema = export_schema(dataset)
+    columns = DATASETS[dataset][1]
+    query = export_query(dataset, start, end)
+    key = itemgetter('timestamp', 'id')
+
+    cursor = None
+    while True:
+        page = keyset_page(query, cursor, chunk_size)
+        if page:
+            arrays = []
+            for (column, path, type_name), field in zip(columns, schema):
+                values = [row[path] for row in page]
+                if column == 'uuid':
+                    values = [str(value) if value is not None else None for value in values]
+                arrays.append(pa.array(values, type=field.type))
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+        if len(page) < chunk_size:
+            return
+        cursor = key(page[-1])
+
+
+def _open_writer(fmt, sink, schema):
+    pa = load_pyarrow()
+    if fmt == 'parquet':
+        return pa.parquet.ParquetWriter(sink, schema, compression='zstd')
+    return pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+
+def write_export(dataset, fmt, sink, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write ``dataset`` to the binary file object ``sink``. Returns the row count."""
+    rows = 0
+    writer = _open_writer(fmt, sink, export_schema(dataset))
+    try:
+        for batch in iter_record_batches(dataset, start, end, chunk_size):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    return rows
+
+
+class _DrainableSink(io.RawIOBase):
+    # Write-only file object whose contents are handed out and dropped as the
+    # response is streamed, so only one batch is ever held in memory.
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_export(dataset, fmt, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Like write_export, but yield the encoded bytes as each batch is written."""
+    sink = _DrainableSink()
+    writer = _open_writer(fmt, sink, export_schema(dataset))
+    for batch in iter_record_batches(dataset, start, end, chunk_size):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
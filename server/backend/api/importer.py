@@ -0,0 +1,151 @@
+from datetime import datetime, timezone as dt_timezone
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from polaris.models import CellInfo
+from .serializers import BatchTestSerializer
+import csv
+import json
+import uuid
+
+# Namespace for UUIDs derived from record contents, so that re-importing the
+# same record (after a crash, or from an overlapping file) is a duplicate.
+IMPORT_NAMESPACE = uuid.UUID('5d3b1c2e-8f0a-4e6b-9a57-1f2c3d4e5f60')
+
+FORMATS = ['csv', 'ndjson']
+
+CELL_INFO_FIELDS = [
+    field for field in CellInfo._meta.concrete_fields
+    if field.name not in ('id', 'tile', 'phone_number')
+]
+
+REQUIRED_FIELDS = ['phone_number'] + [
+    field.name for field in CELL_INFO_FIELDS if not field.null and not field.has_default()
+]
+
+
+class LineTracker:
+    """Iterates the decoded lines of a binary file, tracking the byte offset and line number reached."""
+
+    def __init__(self, handle, offset=0, line=0):
+        self.handle = handle
+        self.offset = offset
+        self.line = line
+
+    def __iter__(self):
+        for raw in self.handle:
+            self.offset += len(raw)
+            self.line += 1
+            yield raw.decode('utf-8')
+
+
+def iter_records(handle, fmt, offset=0, line=0, mapping=None):
+    """
+    Read a CSV or NDJSON file opened in binary mode, starting at byte ``offset``.
+
+    Returns ``(tracker, records)``: ``records`` yields ``(line, record)`` pairs,
+    where record is the raw row or text when it is not a mapping, and ``tracker`` holds
+    the position just past the last record yielded, for checkpointing.
+    """
+    mapping = mapping or {}
+    header = None
+    if fmt == 'csv':
+        handle.seek(0)
+        header_line = handle.readline()
+        header = [mapping.get(name, name) for name in next(csv.reader([header_line.decode('utf-8-sig')]))]
+        if offset == 0:
+            offset, line = len(header_line), 1
+
+    handle.seek(offset)
+    tracker = LineTracker(handle, offset, line)
+
+    def records():
+        if fmt == 'csv':
+            for row in csv.reader(tracker):
+                if row:
+                    yield tracker.line, dict(zip(header, row)) if len(row) == len(header) else row
+            return
+        for text in tracker:
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError:
+                yield tracker.line, text.rstrip('\n')
+                continue
+            if isinstance(record, dict):
+                yield tracker.line, {mapping.get(key, key): value for key, value in record.items()}
+            else:
+                yield tracker.line, record
+
+    return tracker, records()
+
+
+def record_uuid(record):
+    canonical = json.dumps(record, sort_keys=True, default=str)
+    return uuid.uuid5(IMPORT_NAMESPACE, canonical)
+
+
+def _convert(field, value):
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == '':
+        return None
+    value = field.to_python(value)
+    if isinstance(value, datetime) and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    if getattr(field, 'max_length', None) and isinstance(value, str) and len(value) > field.max_length:
+        raise ValidationError(f'Ensure this value has at most {field.max_length} characters.')
+    return value
+
+
+def validate_records(records):
+    """
+    Validate a batch of raw records column by column.
+
+    Returns ``(valid, errors)``: ``valid`` is a list of ``(index, data)`` ready
+    for ``persist_validated``, ``errors`` maps the index of each rejected record
+    to its field errors. Records without a ``uuid`` get one derived from their
+    contents.
+    """
+    rows = [{} for _ in records]
+    errors = {}
+
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors[index] = {'non_field_errors': ['Unparseable record.']}
+            continue
+        missing = [name for name in REQUIRED_FIELDS if record.get(name) in (None, '')]
+        if missing:
+            errors[index] = {name: ['This field is required.'] for name in missing}
+        rows[index]['phone_number'] = str(record.get('phone_number', '')).strip()
+
+    for field in CELL_INFO_FIELDS:
+        for index, record in enumerate(records):
+            if index in errors:
+                continue
+            try:
+                rows[index][field.name] = _convert(field, record.get(field.name))
+            except ValidationError as e:
+                errors.setdefault(index, {})[field.name] = e.messages
+
+    valid = []
+    for index, record in enumerate(records):
+        if index in errors:
+            continue
+        data = rows[index]
+        if data['uuid'] is None:
+            data['uuid'] = record_uuid(record)
+
+        tests = record.get('tests') or []
+        if tests:
+            serializer = BatchTestSerializer(data=tests, many=True)
+            if not serializer.is_valid():
+                errors[index] = {'tests': serializer.errors}
+                continue
+            data['tests'] = [dict(test) for test in serializer.validated_data]
+            for position, test in enumerate(data['tests']):
+                if test.get('uuid') is None:
+                    test['uuid'] = uuid.uuid5(data['uuid'], str(position))
+        valid.append((index, data))
+
+    return valid, errors
@@ -0,0 +1,230 @@
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from functools import lru_cache
+from polaris.models import CellInfo, IngestReceipt, Test, User
+from utils.durable_queue import DurableQueue
+from .serializers import BatchCellInfoSerializer, TEST_SERIALIZER_MAP
+from utils.geo import quadkey
+from . import cache as response_cache
+from . import dedupe, lookups
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 500
+
+
+def bulk_create_with_ids(model, objs):
+    # Backends that cannot return primary keys from a multi-row INSERT (MySQL)
+    # read them back through the client UUIDs when every row has one, and
+    # otherwise fall back to one INSERT per row inside the caller's transaction.
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs)
+    if objs and all(obj.uuid for obj in objs):
+        model.objects.bulk_create(objs)
+        ids = dict(model.objects.filter(uuid__in=[obj.uuid for obj in objs]).values_list('uuid', 'id'))
+        for obj in objs:
+            obj.id = ids[obj.uuid]
+        return objs
+    for obj in objs:
+        obj.save(force_insert=True)
+    return objs
+
+
+def ingest_batch(items):
+    """
+    Validate a list of cell info records (each with optional nested tests) and
+    persist the valid ones in a single transaction.
+
+    Records and tests carrying a client ``uuid`` that is already stored are
+    skipped and reported as duplicates of the existing row.
+
+    Returns one status dict per input item, in input order.
+    """
+    results = [None] * len(items)
+    valid = []
+
+    for index, item in enumerate(items):
+        serializer = BatchCellInfoSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, dict(serializer.validated_data)))
+        else:
+            results[index] = {'index': index, 'status': 'rejected', 'errors': serializer.errors}
+
+    phones = {data['phone_number'] for _, data in valid}
+    users = User.objects.in_bulk(phones, field_name='phone_number') if phones else {}
+
+    accepted = []
+    for index, data in valid:
+        if data['phone_number'] not in users:
+            results[index] = {
+                'index': index,
+                'status': 'rejected',
+                'errors': {'phone_number': ['User with this phone number does not exist.']},
+            }
+        else:
+            accepted.append((index, data))
+
+    if not accepted:
+        return results
+
+    try:
+        persist_validated(accepted, users, results)
+    except IntegrityError:
+        # A concurrent request stored one of the UUIDs first; the retry sees it.
+        logger.info("Batch ingest raced on a measurement UUID, retrying")
+        persist_validated(accepted, users, results)
+    return results
+
+
+def persist_validated(accepted, users, results):
+    """
+    Store already validated ``(index, data)`` cell infos and their tests in one
+    transaction, skipping UUIDs that are already stored. ``users`` maps phone
+    numbers to User rows; ``results`` is filled in by index.
+    """
+    known_cells = dedupe.known_ids('cell_info', CellInfo, [data['uuid'] for _, data in accepted if data.get('uuid')])
+    known_tests = dedupe.known_ids('test', Test, [
+        test_data['uuid'] for _, data in accepted for test_data in data.get('tests', []) if test_data.get('uuid')
+    ])
+
+    fresh = []
+    repeats = []
+    batch_uuids = set()
+    for index, data in accepted:
+        uuid = data.get('uuid')
+        if uuid in known_cells:
+            results[index] = {'index': index, 'status': 'duplicate', 'id': known_cells[uuid], 'tests': []}
+        elif uuid and uuid in batch_uuids:
+            repeats.append((index, uuid))
+        else:
+            batch_uuids.add(uuid)
+            fresh.append((index, data))
+
+    with transaction.atomic():
+        cells = []
+        for _, data in fresh:
+            fields = {key: value for key, value in data.items() if key != 'tests'}
+            fields['phone_number'] = users[fields['phone_number']]
+            cell = CellInfo(**fields)
+            cell.tile = quadkey(cell.lat, cell.lng)
+            cells.append(cell)
+        bulk_create_with_ids(CellInfo, cells)
+
+        tests = []
+        details = []
+        tests_by_cell = {}
+        batch_tests = {}
+        repeated_tests = []
+        for cell, (_, data) in zip(cells, fresh):
+            tests_by_cell[cell.id] = []
+            for test_data in data.get('tests', []):
+                uuid = test_data.get('uuid')
+                if uuid in known_tests:
+                    tests_by_cell[cell.id].append(known_tests[uuid])
+                    continue
+                if uuid and uuid in batch_tests:
+                    # Sent twice in this batch; the first copy is stored.
+                    repeated_tests.append((cell.id, batch_tests[uuid]))
+                    continue
+                test = Test(
+                    uuid=uuid,
+                    phone_number=cell.phone_number,
+                    timestamp=test_data['timestamp'],
+                    cell_info=cell,
+                    test_type=test_data['type_'],
+                )
+                if uuid:
+                    batch_tests[uuid] = test
+                tests.append(test)
+                details.append((test_data['type_'], test_data['detail']))
+        bulk_create_with_ids(Test, tests)
+
+        subtypes = {}
+        for test, (type_, detail) in zip(tests, details):
+            tests_by_cell[test.cell_info_id].append(test.id)
+            model = TEST_SERIALIZER_MAP[type_].Meta.model
+            fields = {key: value for key, value in detail.items() if key != 'id'}
+            subtypes.setdefault(model, []).append(model(id=test, **fields))
+        for model, objs in subtypes.items():
+            model.objects.bulk_create(objs)
+        for cell_id, test in repeated_tests:
+            tests_by_cell[cell_id].append(test.id)
+
+        new_cells = {cell.uuid: cell.id for cell in cells if cell.uuid}
+        new_tests = {test.uuid: test.id for test in tests if test.uuid}
+        transaction.on_commit(lambda: lookups.remember_cell_infos([cell.id for cell in cells]))
+        transaction.on_commit(lambda: dedupe.remember('cell_info', new_cells))
+        transaction.on_commit(lambda: dedupe.remember('test', new_tests))
+        transaction.on_commit(lambda: response_cache.invalidate('cell_info'))
+        if tests:
+            transaction.on_commit(lambda: response_cache.invalidate('tests'))
+
+    for cell, (index, _) in zip(cells, fresh):
+        results[index] = {'index': index, 'status': 'created', 'id': cell.id, 'tests': tests_by_cell[cell.id]}
+    for index, uuid in repeats:
+        results[index] = {'index': index, 'status': 'duplicate', 'id': new_cells[uuid], 'tests': []}
+
+
+@lru_cache(maxsize=None)
+def get_ingest_queue():
+    return DurableQueue(settings.INGEST_QUEUE_PATH)
+
+
+def enqueue_batch(items):
+    """
+    Validate the shape of each item without touching the database and append
+    the valid ones to the ingest queue as a single entry.
+
+    Returns ``(key, results)``; key is None when nothing was queued.
+    """
+    results = []
+    valid = []
+    indices = []
+    for index, item in enumerate(items):
+        serializer = BatchCellInfoSerializer(data=item)
+        if serializer.is_valid():
+            valid.append(item)
+            indices.append(index)
+            results.append({'index': index, 'status': 'queued'})
+        else:
+            results.append({'index': index, 'status': 'rejected', 'errors': serializer.errors})
+
+    key = get_ingest_queue().put({'items': valid, 'indices': indices}) if valid else None
+    return key, results
+
+
+def drain_ingest_queue(limit=50):
+    """
+    Write up to ``limit`` queued entries to the database. An entry is
+    acknowledged only after its transaction commits, and its receipt makes a
+    redelivery after a crash a no-op. Returns the number of entries handled.
+    """
+    queue = get_ingest_queue()
+    entries = queue.claim(limit)
+    done = []
+    for entry_id, key, payload in entries:
+        if isinstance(payload, list):
+            # Queued before entries recorded the positions of their items.
+            payload = {'items': payload, 'indices': list(range(len(payload)))}
+        try:
+            with transaction.atomic():
+                receipt, fresh = IngestReceipt.objects.select_for_update().get_or_create(key=key)
+                if fresh:
+                    results = ingest_batch(payload['items'])
+                    receipt.created = sum(1 for result in results if result['status'] == 'created')
+                    receipt.rejected = sum(1 for result in results if result['status'] == 'rejected')
+                    receipt.save()
+                    for result in results:
+                        if result['status'] == 'rejected':
+                            # Reported by the item's position in the enqueue_batch/ request.
+                            index = payload['indices'][result['index']]
+                            logger.warning(f"Queued item {key}#{index} rejected: {result['errors']}")
+        except Exception as e:
+            logger.exception(f"Failed to ingest queue entry {key}")
+            queue.release(entry_id, e)
+            continue
+        done.append(entry_id)
+
+    queue.ack(done)
+    return len(entries)
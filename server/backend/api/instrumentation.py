@@ -0,0 +1,281 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-request SQL, serializer, render and compression timings. They are reported in a
+# Server-Timing header and aggregated into Prometheus histograms per endpoint.
+# The histograms are process-local: scrape every worker, or sum across them.
+
+N_PLUS_ONE_THRESHOLD = 5
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_current = ContextVar('request_stats', default=None)
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_lists = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+
+
+def sql_shape(sql):
+    """SQL with literals and placeholder lists collapsed, so repeats of one query compare equal."""
+    shape = _literals.sub('%s', sql)
+    return _lists.sub('(%s, ...)', shape)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.compress = 0.0
+        self.shapes = Counter()
+
+    def record_query(self, sql, elapsed):
+        self.queries += 1
+        self.db += elapsed
+        self.shapes[sql_shape(sql)] += 1
+
+    def repeated_queries(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.items() if count >= threshold]
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.record_query(sql, time.perf_counter() - started)
+
+
+@contextmanager
+def serializing():
+    """
+    Count the enclosed block as serializer time. Queries run inside it, such as
+    a lazily evaluated queryset, stay counted as SQL time.
+    """
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    started, db = time.perf_counter(), stats.db
+    try:
+        yield
+    finally:
+        stats.serialize += time.perf_counter() - started - (stats.db - db)
+
+
+@contextmanager
+def compressing():
+    """Count the CPU time of the enclosed block as compression time."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    started = time.thread_time()
+    try:
+        yield
+    finally:
+        stats.compress += time.thread_time() - started
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts, total, observed = self.series.get(labels, ([0] * len(self.buckets), 0.0, 0))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self.series[labels] = (counts, total + value, observed + 1)
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, observed) in sorted(self.series.items()):
+            label_text = _labels(labels)
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {observed}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {observed}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.series = Counter()
+
+    def inc(self, labels):
+        self.series[labels] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{_labels(labels)}}} {value}')
+        return lines
+
+
+def _labels(labels):
+    method, endpoint = labels
+    return f'method="{method}",endpoint="{endpoint}"'
+
+
+_lock = threading.Lock()
+
+REQUEST_DURATION = Histogram('polaris_request_duration_seconds', 'Time spent handling the request.', DURATION_BUCKETS)
+DB_DURATION = Histogram('polaris_request_db_seconds', 'Time spent in SQL per request.', DURATION_BUCKETS)
+SERIALIZE_DURATION = Histogram('polaris_request_serialize_seconds', 'Time spent in serializers per request.', DURATION_BUCKETS)
+RENDER_DURATION = Histogram('polaris_request_render_seconds', 'Time spent rendering the response body.', DURATION_BUCKETS)
+COMPRESS_DURATION = Histogram(
+    'polaris_request_compress_seconds', 'CPU time spent compressing or decompressing bodies per request.', DURATION_BUCKETS,
+)
+QUERIES = Histogram('polaris_request_queries', 'SQL queries per request.', QUERY_BUCKETS)
+REQUEST_SIZE = Histogram('polaris_request_size_bytes', 'Size of request bodies as sent, before decompression.', SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram('polaris_response_size_bytes', 'Size of non-streaming response bodies as sent.', SIZE_BUCKETS)
+N_PLUS_ONE = CounterMetric('polaris_n_plus_one_total', 'Requests that repeated one SQL shape at least N_PLUS_ONE_THRESHOLD times.')
+
+HISTOGRAMS = [
+    REQUEST_DURATION, DB_DURATION, SERIALIZE_DURATION, RENDER_DURATION, COMPRESS_DURATION, QUERIES,
+    REQUEST_SIZE, RESPONSE_SIZE,
+]
+
+
+def observe(histogram, labels, value):
+    with _lock:
+        histogram.observe(labels, value)
+
+
+def expose():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        lines = []
+        for metric in HISTOGRAMS + [N_PLUS_ONE]:
+            lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        for histogram in HISTOGRAMS:
+            histogram.series.clear()
+        N_PLUS_ONE.series.clear()
+
+
+def _endpoint(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.url_name or match.view_name if match else 'unmatched'
+
+
+def _wrap_connections():
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(_execute_wrapper))
+    return stack
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with _wrap_connections():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.report(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        # Connections are per thread. Under ASGI the ORM runs in the request's
+        # thread-sensitive executor thread, so the wrappers are installed there.
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            stack = await sync_to_async(_wrap_connections)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current.reset(token)
+        self.report(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time it with a
+        # post-render callback.
+        stats = _current.get()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                stats.render += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
+
+    def report(self, request, response, stats, total):
+        labels = (request.method, _endpoint(request))
+        observe(REQUEST_DURATION, labels, total)
+        observe(DB_DURATION, labels, stats.db)
+        observe(SERIALIZE_DURATION, labels, stats.serialize)
+        observe(RENDER_DURATION, labels, stats.render)
+        observe(COMPRESS_DURATION, labels, stats.compress)
+        observe(QUERIES, labels, stats.queries)
+        content_length = request.META.get('CONTENT_LENGTH')
+        if content_length and content_length.isdigit():
+            observe(REQUEST_SIZE, labels, int(content_length))
+        if not response.streaming:
+            observe(RESPONSE_SIZE, labels, len(response.content))
+
+        threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', N_PLUS_ONE_THRESHOLD)
+        repeated = stats.repeated_queries(threshold)
+        if repeated:
+            with _lock:
+                N_PLUS_ONE.inc(labels)
+            for shape, count in repeated:
+                logger.warning(f"Possible N+1 on {request.method} {request.path}: {count}x {shape}")
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={stats.db * 1000:.2f};desc="{stats.queries} queries"',
+            f'serialize;dur={stats.serialize * 1000:.2f}',
+            f'render;dur={stats.render * 1000:.2f}',
+            f'compress;dur={stats.compress * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+        logger.debug(
+            f"{request.method} {request.path}: {stats.queries} queries in {stats.db * 1000:.1f} ms, "
+            f"serialize {stats.serialize * 1000:.1f} ms, render {stats.render * 1000:.1f} ms, "
+            f"compress {stats.compress * 1000:.1f} ms, total {total * 1000:.1f} ms"
+        )
@@ -0,0 +1,104 @@
+from django.utils import timezone
+from operator import itemgetter
+from .serializers import CellInfoSerializer, TEST_SERIALIZER_MAP, UnifiedTestSerializer
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Read path of the listing endpoints. Rows are fetched as values_list()
+# tuples and converted straight to the JSON values CellInfoSerializer and
+# UnifiedTestSerializer produce, skipping model instances and DRF fields.
+
+LAYOUTS = ['records', 'columnar']
+
+
+def dumps(data):
+    """JSON bytes in DRF's compact style; uses orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _timestamp(value, tz):
+    # Same output as serializers.DateTimeField with the default ISO 8601 format.
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class Listing:
+    def __init__(self, fields, columns, convert):
+        self.fields = fields
+        self.columns = columns
+        self.convert = convert
+        self.key = itemgetter(columns.index('timestamp'), columns.index('id'))
+
+    def values(self, query):
+        return query.values_list(*self.columns)
+
+    def rows(self, rows):
+        """Rows as lists of values in ``fields`` order, for the columnar layout."""
+        tz = timezone.get_current_timezone()
+        return [self.convert(row, tz) for row in rows]
+
+    def records(self, rows):
+        tz = timezone.get_current_timezone()
+        fields = self.fields
+        return [dict(zip(fields, self.convert(row, tz))) for row in rows]
+
+    def record(self, row):
+        return dict(zip(self.fields, self.convert(row, timezone.get_current_timezone())))
+
+
+def _cell_info_listing():
+    fields = list(CellInfoSerializer().fields)
+    columns = ['phone_number_id' if field == 'phone_number' else field for field in fields]
+    timestamp, uuid = fields.index('timestamp'), fields.index('uuid')
+
+    def convert(row, tz):
+        row = list(row)
+        row[timestamp] = _timestamp(row[timestamp], tz)
+        if row[uuid] is not None:
+            row[uuid] = str(row[uuid])
+        return row
+    return Listing(fields, columns, convert)
+
+
+def _test_listing(types):
+    # Each subtype contributes its primary key, which tells whether the row
+    # exists, followed by its value columns.
+    columns = ['id', 'phone_number_id', 'timestamp', 'cell_info_id', 'test_type']
+    subtypes = {}
+    for type_ in types:
+        model = TEST_SERIALIZER_MAP[type_].Meta.model
+        accessor = model._meta.model_name
+        names = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+        marker = len(columns)
+        columns += [f'{accessor}__id'] + [f'{accessor}__{name}' for name in names]
+        subtypes[type_] = (marker, [(name, marker + 1 + i) for i, name in enumerate(names)])
+    every = list(subtypes.items())
+
+    def convert(row, tz):
+        # Mirrors UnifiedTestSerializer._subtype.
+        test_type = row[4]
+        if test_type in TEST_SERIALIZER_MAP:
+            candidates = [(test_type, subtypes[test_type])] if test_type in subtypes else []
+        else:
+            candidates = every
+        type_, detail = 'unknown', None
+        for name, (marker, values) in candidates:
+            if row[marker] is not None:
+                type_ = name
+                detail = {'id': row[marker]}
+                for field, index in values:
+                    detail[field] = row[index]
+                break
+        return [row[0], row[1], _timestamp(row[2], tz), row[3], type_, detail]
+    return Listing(list(UnifiedTestSerializer.Meta.fields), columns, convert)
+
+
+CELL_INFO_LISTING = _cell_info_listing()
+TEST_LISTINGS = {type_: _test_listing([type_]) for type_ in TEST_SERIALIZER_MAP}
+TEST_LISTINGS[None] = _test_listing(list(TEST_SERIALIZER_MAP))
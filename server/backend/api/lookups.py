@@ -0,0 +1,72 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from polaris.models import CellInfo, User
+from utils.ttl_cache import TTLCache
+
+LOOKUP_TTL = 60
+
+_users = TTLCache(maxsize=4096, ttl=LOOKUP_TTL)
+_cell_infos = TTLCache(maxsize=16384, ttl=LOOKUP_TTL)
+
+
+def get_user(phone_number):
+    """The User with ``phone_number``, or None. Hits are cached per process."""
+    user = _users.get(phone_number)
+    if user is None:
+        user = User.objects.filter(phone_number=phone_number).first()
+        if user is not None:
+            _users.set(phone_number, user)
+    return user
+
+
+async def aget_user(phone_number):
+    user = _users.get(phone_number)
+    if user is None:
+        user = await User.objects.filter(phone_number=phone_number).afirst()
+        if user is not None:
+            _users.set(phone_number, user)
+    return user
+
+
+def remember_cell_infos(ids):
+    for cell_info_id in ids:
+        _cell_infos.set(cell_info_id, True)
+
+
+def cell_info_exists(cell_info_id):
+    if _cell_infos.get(cell_info_id):
+        return True
+    if CellInfo.objects.filter(id=cell_info_id).exists():
+        _cell_infos.set(cell_info_id, True)
+        return True
+    return False
+
+
+async def acell_info_exists(cell_info_id):
+    if _cell_infos.get(cell_info_id):
+        return True
+    if await CellInfo.objects.filter(id=cell_info_id).aexists():
+        _cell_infos.set(cell_info_id, True)
+        return True
+    return False
+
+
+def forget_cell_info(cell_info_id):
+    # For rows deleted by another process, which the signal below cannot see.
+    _cell_infos.discard(cell_info_id)
+
+
+def clear():
+    _users.clear()
+    _cell_infos.clear()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _evict_user(sender, instance, **kwargs):
+    _users.discard(instance.phone_number)
+
+
+@receiver(post_delete, sender=CellInfo)
+def _evict_cell_info(sender, instance, **kwargs):
+    _cell_infos.discard(instance.id)
@@ -0,0 +1,82 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from itertools import chain
+from operator import attrgetter
+from rest_framework.utils.encoders import JSONEncoder
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+STREAM_CHUNK_SIZE = 2000
+
+row_key = attrgetter('timestamp', 'id')
+
+
+def encode_cursor(timestamp, pk):
+    raw = json.dumps([timestamp.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, pk = json.loads(raw)
+        timestamp = parse_datetime(timestamp)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if timestamp is None or not isinstance(pk, int):
+        raise ValueError('Invalid cursor')
+    return timestamp, pk
+
+
+def _after(query, cursor):
+    query = query.order_by('timestamp', 'id')
+    if cursor is not None:
+        timestamp, pk = cursor
+        query = query.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk))
+    return query
+
+
+def keyset_page(query, cursor, limit):
+    """Return up to ``limit`` rows of ``query`` ordered by (timestamp, id), after ``cursor``."""
+    return list(_after(query, cursor)[:limit])
+
+
+async def akeyset_page(query, cursor, limit):
+    return [row async for row in _after(query, cursor)[:limit]]
+
+
+def iter_keyset(query, chunk_size=STREAM_CHUNK_SIZE, key=row_key, page=keyset_page):
+    # Walks the range one keyset page at a time. Unlike a single .iterator()
+    # this keeps memory flat on MySQL too, where the driver buffers the whole
+    # result set client-side.
+    cursor = None
+    while True:
+        rows = page(query, cursor, chunk_size)
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        cursor = key(rows[-1])
+
+
+def stream_json(rows, represent, chunk_size=STREAM_CHUNK_SIZE, leading=(), **envelope):
+    """
+    Yield a JSON object ``{**envelope, "results": [...]}`` incrementally.
+    ``leading`` records, an iterable of already represented records, go first.
+    """
+    head = json.dumps(envelope, cls=JSONEncoder)[:-1]
+    yield head + (', ' if envelope else '') + '"results": ['
+
+    buffer = []
+    first = True
+    for record in chain(leading, map(represent, rows)):
+        buffer.append(json.dumps(record, cls=JSONEncoder))
+        if len(buffer) >= chunk_size:
+            yield ('' if first else ',') + ','.join(buffer)
+            buffer = []
+            first = False
+    if buffer:
+        yield ('' if first else ',') + ','.join(buffer)
+
+    yield ']}'
@@ -0,0 +1,9 @@
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class FromMonitoringAddress(BasePermission):
+    """Allows requests from the addresses in MONITORING_ALLOWED_IPS, e.g. a metrics scraper."""
+
+    def has_permission(self, request, view):
+        return request.META.get('REMOTE_ADDR') in getattr(settings, 'MONITORING_ALLOWED_IPS', ())
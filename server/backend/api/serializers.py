@@ -4,6 +4,8 @@ from polaris.models import *
 from django.core.cache import cache
 from utils.check_password import *
 from django.contrib.auth import authenticate
+from . import lookups
+from .speedtest import DEFAULT_STREAMS, MAX_STREAMS, parse_download_params
 
 
 class RequestOTPSerializer(serializers.Serializer):
@@ -112,7 +114,11 @@ class CellInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = CellInfo
         fields = '__all__'
+        read_only_fields = ['tile']
         extra_kwargs = {
+            # Duplicate UUIDs are answered idempotently by the views instead of
+            # being rejected, and checking here would cost a query per record.
+            'uuid': {'validators': []},
             'lac': {'required': False},
             'rac': {'required': False},
             'tac': {'required': False},
@@ -128,11 +134,10 @@ class CellInfoSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         phone_str = validated_data.pop('phone_number')
-        try:
-            user = User.objects.get(phone_number=phone_str)
-        except User.DoesNotExist:
+        user = lookups.get_user(phone_str)
+        if user is None:
             raise serializers.ValidationError({'phone_number': 'User with this phone number does not exist.'})
-        
+
         validated_data['phone_number'] = user
         return super().create(validated_data)
 
@@ -141,40 +146,56 @@ class HTTPDownloadTestSerializer(serializers.ModelSerializer):
     class Meta:
         model = HTTPDownloadTest
         fields = '__all__'
+        extra_kwargs = {'id': {'required': False}}
 
 
 class HTTPUploadTestSerializer(serializers.ModelSerializer):
     class Meta:
         model = HTTPUploadTest
         fields = '__all__'
+        extra_kwargs = {'id': {'required': False}}
 
 
 class PingTestSerializer(serializers.ModelSerializer):
     class Meta:
         model = PingTest
         fields = '__all__'
+        extra_kwargs = {'id': {'required': False}}
 
 
 class DNSTestSerializer(serializers.ModelSerializer):
     class Meta:
         model = DNSTest
         fields = '__all__'
+        extra_kwargs = {'id': {'required': False}}
 
 
 class WebTestSerializer(serializers.ModelSerializer):
     class Meta:
         model = WebTest
         fields = '__all__'
+        extra_kwargs = {'id': {'required': False}}
 
 
 class SMSTestSerializer(serializers.ModelSerializer):
     class Meta:
         model = SMSTest
         fields = '__all__'
+        extra_kwargs = {'id': {'required': False}}
+
 
+TEST_SERIALIZER_MAP = {
+    'http_download': HTTPDownloadTestSerializer,
+    'http_upload': HTTPUploadTestSerializer,
+    'ping': PingTestSerializer,
+    'dns': DNSTestSerializer,
+    'web': WebTestSerializer,
+    'sms': SMSTestSerializer,
+}
 
 
 class UnifiedTestSerializer(serializers.ModelSerializer):
+    phone_number = serializers.CharField(source='phone_number_id', read_only=True)
     type_ = serializers.SerializerMethodField()
     detail = serializers.SerializerMethodField()
 
@@ -182,47 +203,65 @@ class UnifiedTestSerializer(serializers.ModelSerializer):
         model = Test
         fields = ['id', 'phone_number', 'timestamp', 'cell_info', 'type_', 'detail']
 
+    def _subtype(self, obj):
+        candidates = TEST_SERIALIZER_MAP.items()
+        if obj.test_type in TEST_SERIALIZER_MAP:
+            candidates = [(obj.test_type, TEST_SERIALIZER_MAP[obj.test_type])]
+        for type_, serializer_class in candidates:
+            accessor = serializer_class.Meta.model._meta.model_name
+            if hasattr(obj, accessor):
+                return type_, serializer_class, getattr(obj, accessor)
+        return 'unknown', None, None
+
     def get_type_(self, obj):
-        if hasattr(obj, 'httpdownloadtest'):
-            return 'http_download'
-        elif hasattr(obj, 'httpuploadtest'):
-            return 'http_upload'
-        elif hasattr(obj, 'pingtest'):
-            return 'ping'
-        elif hasattr(obj, 'dnstest'):
-            return 'dns'
-        elif hasattr(obj, 'webtest'):
-            return 'web'
-        elif hasattr(obj, 'smstest'):
-            return 'sms'
-        return 'unknown'
+        return self._subtype(obj)[0]
 
     def get_detail(self, obj):
-        if hasattr(obj, 'httpdownloadtest'):
-            return HTTPDownloadTestSerializer(obj.httpdownloadtest).data
-        elif hasattr(obj, 'httpuploadtest'):
-            return HTTPUploadTestSerializer(obj.httpuploadtest).data
-        elif hasattr(obj, 'pingtest'):
-            return PingTestSerializer(obj.pingtest).data
-        elif hasattr(obj, 'dnstest'):
-            return DNSTestSerializer(obj.dnstest).data
-        elif hasattr(obj, 'webtest'):
-            return WebTestSerializer(obj.webtest).data
-        elif hasattr(obj, 'smstest'):
-            return SMSTestSerializer(obj.smstest).data
-        return None
+        _, serializer_class, subtype = self._subtype(obj)
+        if serializer_class is None:
+            return None
+        return serializer_class(subtype).data
 
 class AddTestInputSerializer(serializers.Serializer):
-    type_ = serializers.ChoiceField(choices=[
-        ('http_download', 'http_download'),
-        ('http_upload', 'http_upload'),
-        ('ping', 'ping'),
-        ('dns', 'dns'),
-        ('web', 'web'),
-        ('sms', 'sms'),
-        
-    ],required=True)
+    type_ = serializers.ChoiceField(choices=Test.TYPE_CHOICES, required=True)
+    phone_number = serializers.CharField(required=True)
+    timestamp = serializers.DateTimeField(required=True)
+    cell_info = serializers.IntegerField(required=True)
+    detail = serializers.DictField(required=True)
+    uuid = serializers.UUIDField(required=False)
+
+
+class SpeedTestSessionInputSerializer(serializers.Serializer):
+    type_ = serializers.ChoiceField(choices=SpeedTestSession.TYPE_CHOICES, required=True)
     phone_number = serializers.CharField(required=True)
     timestamp = serializers.DateTimeField(required=True)
     cell_info = serializers.IntegerField(required=True)
-    detail = serializers.DictField(required=True)
\ No newline at end of file
+    streams = serializers.IntegerField(min_value=1, max_value=MAX_STREAMS, default=DEFAULT_STREAMS)
+    # Per download stream, with the same meaning and limits as on download_test/.
+    size = serializers.IntegerField(required=False)
+    duration = serializers.FloatField(required=False)
+
+    def validate(self, data):
+        try:
+            data['size'], data['duration'] = parse_download_params(data)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return data
+
+
+class BatchTestSerializer(serializers.Serializer):
+    type_ = serializers.ChoiceField(choices=Test.TYPE_CHOICES, required=True)
+    timestamp = serializers.DateTimeField(required=True)
+    detail = serializers.DictField(required=True)
+    uuid = serializers.UUIDField(required=False)
+
+    def validate(self, data):
+        serializer = TEST_SERIALIZER_MAP[data['type_']](data=data['detail'])
+        if not serializer.is_valid():
+            raise serializers.ValidationError({'detail': serializer.errors})
+        data['detail'] = serializer.validated_data
+        return data
+
+
+class BatchCellInfoSerializer(CellInfoSerializer):
+    tests = BatchTestSerializer(many=True, required=False)
@@ -0,0 +1,269 @@
+import json
+import os
+import re
+import time
+
+# Download-test payloads are served from one random buffer allocated at import,
+# so every response is incompressible and costs no allocation per chunk. Byte
+# ``i`` of any payload is ``DOWNLOAD_BUFFER[i % DOWNLOAD_BUFFER_SIZE]``, which
+# keeps range requests consistent with the full body.
+
+# Django's ASGI handler sends bodies in messages of 64 KiB and passes a chunk
+# of exactly that size through without slicing it.
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_BUFFER_SIZE = 64 * DOWNLOAD_CHUNK_SIZE
+DEFAULT_DOWNLOAD_SIZE = 1024 * 1024
+MAX_DOWNLOAD_SIZE = 1024 * 1024 * 1024
+MAX_DOWNLOAD_SECONDS = 30
+# Parallel streams of a speed-test session.
+DEFAULT_STREAMS = 4
+MAX_STREAMS = 16
+
+DOWNLOAD_BUFFER = os.urandom(DOWNLOAD_BUFFER_SIZE)
+# Whole chunks are pre-sliced into bytes objects, which responses pass on
+# without copying; only a partial first or last chunk is sliced per request.
+_CHUNKS = [
+    DOWNLOAD_BUFFER[offset:offset + DOWNLOAD_CHUNK_SIZE]
+    for offset in range(0, DOWNLOAD_BUFFER_SIZE, DOWNLOAD_CHUNK_SIZE)
+]
+_VIEW = memoryview(DOWNLOAD_BUFFER)
+
+_range = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_download_params(params):
+    """
+    ``(size, duration)`` from the ``size`` (bytes) and ``duration`` (seconds)
+    query parameters. With a duration the payload is streamed until it elapses,
+    up to ``size`` bytes, which then defaults to MAX_DOWNLOAD_SIZE.
+    """
+    try:
+        duration = float(params['duration']) if params.get('duration') else None
+        size = int(params['size']) if params.get('size') else None
+    except ValueError:
+        raise ValueError("size must be an integer number of bytes and duration a number of seconds")
+
+    if duration is not None and not 0 < duration <= MAX_DOWNLOAD_SECONDS:
+        raise ValueError(f"duration must be between 0 and {MAX_DOWNLOAD_SECONDS} seconds")
+    if size is None:
+        size = MAX_DOWNLOAD_SIZE if duration else DEFAULT_DOWNLOAD_SIZE
+    if not 0 < size <= MAX_DOWNLOAD_SIZE:
+        raise ValueError(f"size must be between 1 and {MAX_DOWNLOAD_SIZE} bytes")
+    return size, duration
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` inclusive for a single ``bytes=`` range of a ``size``-byte
+    body, None when there is no usable Range header (the full body is sent),
+    or raises ValueError when the range cannot be satisfied.
+    """
+    match = _range.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def iter_payload(start, end, deadline=None):
+    """Yield bytes ``start``..``end`` (inclusive) of the payload, stopping early at ``deadline``."""
+    position = start
+    stop = end + 1
+    while position < stop:
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+        offset = position % DOWNLOAD_BUFFER_SIZE
+        length = min(DOWNLOAD_CHUNK_SIZE - offset % DOWNLOAD_CHUNK_SIZE, stop - position)
+        if length == DOWNLOAD_CHUNK_SIZE:
+            yield _CHUNKS[offset // DOWNLOAD_CHUNK_SIZE]
+        else:
+            yield _VIEW[offset:offset + length]
+        position += length
+
+
+# Upload tests count the request body and discard it as it arrives.
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_INTERVAL = 0.1
+# Set by UploadSink on ASGI scopes whose body it has already drained.
+UPLOAD_SCOPE_KEY = 'polaris.upload'
+
+
+class TransferMeter:
+    """Bytes transferred per UPLOAD_INTERVAL, timed from the first chunk on."""
+
+    def __init__(self, interval=UPLOAD_INTERVAL):
+        self.interval = interval
+        self.started = self.finished = None
+        self.first = 0
+        self.received = 0
+        self.intervals = []
+
+    def add(self, count):
+        now = time.monotonic()
+        if self.started is None:
+            self.started, self.first = now, count
+        index = int((now - self.started) / self.interval)
+        if index >= len(self.intervals):
+            self.intervals.extend([0] * (index + 1 - len(self.intervals)))
+        self.intervals[index] += count
+        self.received += count
+        self.finished = now
+
+    def drain(self, stream):
+        """Read ``stream`` to the end in UPLOAD_CHUNK_SIZE reads, keeping nothing."""
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                return self
+            self.add(len(chunk))
+
+    def span(self):
+        """``(started, finished)`` in epoch seconds."""
+        offset = time.time() - time.monotonic()
+        return self.started + offset, self.finished + offset
+
+    def result(self):
+        seconds = self.finished - self.started if self.started is not None else 0.0
+        # The first chunk was already on its way when the clock started.
+        mbps = (self.received - self.first) * 8 / seconds / 1e6 if seconds else None
+        return {
+            'bytes': self.received,
+            'seconds': round(seconds, 6),
+            'mbps': round(mbps, 3) if mbps is not None else None,
+            'interval_ms': round(self.interval * 1000),
+            'intervals': self.intervals,
+        }
+
+
+def metered(iterator, meter):
+    """Yield from ``iterator``, adding each chunk to ``meter`` as it is handed on."""
+    for chunk in iterator:
+        meter.add(len(chunk))
+        yield chunk
+
+
+class UploadSink:
+    """
+    ASGI middleware that measures and discards the body of requests to
+    ``paths`` before Django sees them. Django's ASGI handler would otherwise
+    spool the whole body to memory, and past FILE_UPLOAD_MAX_MEMORY_SIZE to a
+    temporary file, before calling the view. The meter is passed on in
+    ``scope[UPLOAD_SCOPE_KEY]`` and Django receives an empty body.
+    """
+
+    def __init__(self, application, paths):
+        self.application = application
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            return await self.application(scope, receive, send)
+
+        meter = TransferMeter()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            if message.get('body'):
+                meter.add(len(message['body']))
+            if not message.get('more_body', False):
+                break
+
+        drained = False
+
+        async def empty_body():
+            nonlocal drained
+            if drained:
+                return await receive()
+            drained = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        await self.application({**scope, UPLOAD_SCOPE_KEY: meter}, empty_body, send)
+
+
+# Latency samples are answered before Django, so they measure the network
+# rather than the middleware, the views and the database.
+ECHO_HEADERS = [
+    (b'content-type', b'application/json'),
+    (b'cache-control', b'no-store'),
+]
+
+
+def echo_body(seq=None):
+    """JSON with ``seq`` echoed back and the server's receive time in epoch milliseconds."""
+    return json.dumps({'seq': seq, 'server_time': time.time_ns() / 1e6}).encode()
+
+
+def _seq(query_string):
+    for pair in query_string.split('&'):
+        name, _, value = pair.partition('=')
+        if name == 'seq':
+            return value[:64]
+    return None
+
+
+class Echo:
+    """
+    ASGI middleware that answers ``path`` itself: an HTTP request gets
+    echo_body() for its ``seq`` query parameter, and a WebSocket gets every
+    text message back as echo_body(message), so one connection can take many
+    samples. Everything else goes to ``application``.
+    """
+
+    def __init__(self, application, path):
+        self.application = application
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] not in ('http', 'websocket') or scope['path'] != self.path:
+            return await self.application(scope, receive, send)
+        if scope['type'] == 'websocket':
+            return await self.websocket(receive, send)
+
+        body = echo_body(_seq(scope['query_string'].decode('latin-1')))
+        await send({
+            'type': 'http.response.start', 'status': 200,
+            'headers': ECHO_HEADERS + [(b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def websocket(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.connect':
+                await send({'type': 'websocket.accept'})
+            elif message['type'] == 'websocket.receive':
+                if message.get('text') is not None:
+                    await send({'type': 'websocket.send', 'text': echo_body(message['text'][:64]).decode()})
+                else:
+                    await send({'type': 'websocket.send', 'bytes': message.get('bytes') or b''})
+            elif message['type'] == 'websocket.disconnect':
+                return
+
+
+class WSGIEcho:
+    """The HTTP half of Echo for WSGI servers."""
+
+    def __init__(self, application, path):
+        self.application = application
+        self.path = path
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO') != self.path:
+            return self.application(environ, start_response)
+        body = echo_body(_seq(environ.get('QUERY_STRING', '')))
+        start_response('200 OK', [
+            (name.decode().title(), value.decode()) for name, value in ECHO_HEADERS
+        ] + [('Content-Length', str(len(body)))])
+        return [body]
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from polaris.models import SpeedTestSession, SpeedTestStream, Test
+from . import cache as response_cache, dedupe
+from .serializers import TEST_SERIALIZER_MAP
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Streams of a session must start within this long of its creation.
+SESSION_TTL = timedelta(minutes=5)
+
+
+def get_session(session_id):
+    """The session ``session_id``, or raises ValueError."""
+    try:
+        return SpeedTestSession.objects.get(pk=uuid.UUID(str(session_id)))
+    except (SpeedTestSession.DoesNotExist, ValueError):
+        raise ValueError("Unknown speed test session")
+
+
+def open_session(session_id, index, test_type):
+    """
+    The unrecorded, unexpired session ``session_id`` of ``test_type`` that has
+    a stream ``index``, or raises ValueError.
+    """
+    session = get_session(session_id)
+    if session.test_type != test_type:
+        raise ValueError(f"Not an {test_type} session")
+    if session.test_id is not None or session.created_at < timezone.now() - SESSION_TTL:
+        raise ValueError("Speed test session is closed")
+    if not 0 <= index < session.streams:
+        raise ValueError(f"stream must be between 0 and {session.streams - 1}")
+    return session
+
+
+def record_stream(session, index, meter):
+    """
+    Store what stream ``index`` of ``session`` transferred, as measured by
+    ``meter``, and write the session's test once every stream is in. Returns
+    the test, or None while streams are outstanding. A stream that reports
+    twice keeps its first result.
+    """
+    started, finished = meter.span()
+    with transaction.atomic():
+        # Streams finish concurrently; the lock lets exactly one of them see
+        # the complete set and write the test.
+        session = SpeedTestSession.objects.select_for_update().get(pk=session.pk)
+        if session.test_id is not None:
+            return None
+        if not session.results.filter(index=index).exists():
+            SpeedTestStream.objects.create(
+                session=session, index=index, bytes=meter.received,
+                started=datetime.fromtimestamp(started, dt_timezone.utc),
+                finished=datetime.fromtimestamp(finished, dt_timezone.utc),
+            )
+        if session.results.count() < session.streams:
+            return None
+        test = _write_test(session)
+
+    response_cache.invalidate('tests')
+    dedupe.remember('test', {session.id: test.id})
+    return test
+
+
+def _write_test(session):
+    totals = summarize(session)
+    test = Test.objects.create(
+        uuid=session.id,
+        phone_number_id=session.phone_number_id,
+        timestamp=session.timestamp,
+        cell_info_id=session.cell_info_id,
+        test_type=session.test_type,
+    )
+    TEST_SERIALIZER_MAP[session.test_type].Meta.model.objects.create(id=test, throughput=totals['throughput'])
+    session.test = test
+    session.save(update_fields=['test'])
+    logger.info(
+        f"Speed test session {session.id}: {session.streams} {session.test_type} streams, "
+        f"{totals['bytes']} bytes in {totals['seconds']} s, {totals['throughput']} Mbps"
+    )
+    return test
+
+
+def summarize(session):
+    """Bytes, wall time and throughput (Mbps) of the streams recorded so far."""
+    totals = session.results.aggregate(
+        bytes=Sum('bytes'), started=Min('started'), finished=Max('finished'),
+    )
+    received = totals['bytes'] or 0
+    seconds = (totals['finished'] - totals['started']).total_seconds() if totals['started'] else 0.0
+    return {
+        'streams': session.results.count(),
+        'bytes': received,
+        'seconds': round(seconds, 6),
+        'throughput': round(received * 8 / seconds / 1e6, 3) if seconds else 0.0,
+    }
+
+
+class RecordedStreamingResponse(StreamingHttpResponse):
+    """
+    A download stream of a session. Both handlers close the response once the
+    server is done sending it, in a thread, which is when the stream is
+    recorded, with however many bytes were sent.
+    """
+
+    def __init__(self, streaming_content, session, index, meter, **kwargs):
+        super().__init__(streaming_content, **kwargs)
+        self.session, self.index, self.meter = session, index, meter
+
+    def close(self):
+        try:
+            self.meter.add(0)
+            record_stream(self.session, self.index, self.meter)
+        finally:
+            super().close()
@@ -0,0 +1,109 @@
+from django.db.models import Q
+from rest_framework import serializers
+from polaris.models import CellInfoRollup, TestRollup
+from polaris.rollups import CELL_INFO_METRICS, TEST_VALUE_FIELDS
+from .pagination import iter_keyset
+
+# Summary records stand in for raw rows of compacted periods in the listing
+# endpoints. They mirror the raw record's keys, carry 'compacted': True and
+# the sample count, and use the negated rollup id so ids stay unique.
+#
+# They are paged with the same (timestamp, id) keyset as the raw rows. Every
+# bucket lies before the compaction horizon and every raw row at or after it,
+# so one cursor runs through the summaries and then the raw rows.
+
+_timestamp = serializers.DateTimeField()
+
+
+def _after(query, cursor):
+    # Ascending record ids are descending rollup ids.
+    query = query.order_by('bucket', '-id')
+    if cursor is not None:
+        timestamp, pk = cursor
+        query = query.filter(Q(bucket__gt=timestamp) | Q(bucket=timestamp, id__lt=-pk))
+    return query
+
+
+def _page(query, cursor, limit):
+    return list(_after(query, cursor)[:limit])
+
+
+class Summaries:
+    def __init__(self, query, record):
+        self.query = query
+        self.record = record
+
+    @staticmethod
+    def key(rollup):
+        return rollup.bucket, -rollup.id
+
+    def page(self, cursor, limit):
+        """Up to ``limit`` rollups after the listing ``cursor``, in record order."""
+        return _page(self.query, cursor, limit)
+
+    def __iter__(self):
+        for rollup in iter_keyset(self.query, key=self.key, page=_page):
+            yield self.record(rollup)
+
+
+def _period(query, since, until):
+    query = query.filter(bucket__lt=until)
+    if since is not None:
+        # The hour containing `since` is included whole.
+        query = query.filter(bucket__gte=since.replace(minute=0, second=0, microsecond=0))
+    return query
+
+
+def _cell_info_record(rollup):
+    record = {
+        'id': -rollup.id,
+        'phone_number': None,
+        'timestamp': _timestamp.to_representation(rollup.bucket),
+        'lat': rollup.lat_sum / rollup.samples,
+        'lng': rollup.lng_sum / rollup.samples,
+        'gen': rollup.gen,
+        'tech': rollup.tech,
+        'plmn': rollup.plmn,
+        'cid': rollup.cid,
+        'compacted': True,
+        'samples': rollup.samples,
+    }
+    for metric in CELL_INFO_METRICS:
+        count = getattr(rollup, f'{metric}_count')
+        record[metric] = getattr(rollup, f'{metric}_sum') / count if count else None
+        record[f'{metric}_min'] = getattr(rollup, f'{metric}_min')
+        record[f'{metric}_max'] = getattr(rollup, f'{metric}_max')
+    return record
+
+
+def _test_record(rollup):
+    field = TEST_VALUE_FIELDS[rollup.test_type].split('__')[1]
+    return {
+        'id': -rollup.id,
+        'phone_number': None,
+        'timestamp': _timestamp.to_representation(rollup.bucket),
+        'cell_info': None,
+        'type_': rollup.test_type,
+        'detail': {
+            field: rollup.value_sum / rollup.value_count,
+            f'{field}_min': rollup.value_min,
+            f'{field}_max': rollup.value_max,
+        },
+        'plmn': rollup.plmn,
+        'gen': rollup.gen,
+        'tech': rollup.tech,
+        'cid': rollup.cid,
+        'compacted': True,
+        'samples': rollup.value_count,
+    }
+
+
+def cell_info_summaries(since, until):
+    return Summaries(_period(CellInfoRollup.objects.filter(samples__gt=0), since, until), _cell_info_record)
+
+
+def test_summaries(since, until, test_type=None):
+    query = TestRollup.objects.filter(value_count__gt=0)
+    if test_type:
+        query = query.filter(test_type=test_type)
+    return Summaries(_period(query, since, until), _test_record)
@@ -14,13 +14,25 @@ urlpatterns = [
 
     path('add_cell_info/', views.add_cell_info, name='add_cell_info'),
     path('add_test/', views.add_test, name='add_test'),
+    path('add_batch/', views.add_batch, name='add_batch'),
+    path('enqueue_batch/', views.enqueue_batch_view, name='enqueue_batch'),
+    path('get_ingest_queue_stats/', views.get_ingest_queue_stats, name='get_ingest_queue_stats'),
 
     path('get_users/', views.get_users, name='get_users'),
     path('get_cell_infos/', views.get_cell_info, name='get_cell_infos'),
     path('get_tests/', views.get_tests, name='get_tests'),
+    path('get_aggregates/', views.get_aggregates, name='get_aggregates'),
+    path('get_cache_stats/', views.get_cache_stats, name='get_cache_stats'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('get_heatmap/', views.get_heatmap, name='get_heatmap'),
+    path('export/', views.export_measurements, name='export_measurements'),
 
     path("download_test/", views.http_download_test, name='http_download_test'),
     path("upload_test/", views.http_upload_test, name='http_upload_test'),
+    path("speedtest/start/", views.start_speedtest, name='start_speedtest'),
+    path("speedtest/download/", views.speedtest_download, name='speedtest_download'),
+    path("speedtest/upload/", views.speedtest_upload, name='speedtest_upload'),
+    path("speedtest/result/", views.speedtest_result, name='speedtest_result'),
 
 
 ]
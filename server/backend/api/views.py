@@ -1,5 +1,7 @@
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import authentication_classes, parser_classes, permission_classes
+from adrf.decorators import api_view
+from asgiref.sync import sync_to_async
 from rest_framework import status
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.authtoken.models import Token
@@ -17,22 +19,41 @@ from django.contrib.auth import login
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import logout
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
 from datetime import timedelta
 from django.utils import timezone
-from django.http import StreamingHttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db import IntegrityError, transaction
+from . import compression, dedupe, instrumentation, lookups, speedtest_sessions
+from .compression import INGEST_PARSERS
+from .authentication import invalidate_token
+from .permissions import FromMonitoringAddress
+from .summaries import cell_info_summaries, test_summaries
+from polaris.compaction import acompacted_before, compacted_before
+from .export import DATASETS as EXPORT_DATASETS, FORMATS as EXPORT_FORMATS, load_pyarrow, parse_bounds, stream_export
+from .ingest import MAX_BATCH_SIZE, enqueue_batch, get_ingest_queue, ingest_batch
+from . import cache as response_cache
+from .pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, akeyset_page, decode_cursor, encode_cursor, iter_keyset,
+    stream_json,
+)
+from .listing import CELL_INFO_LISTING, LAYOUTS as LISTING_LAYOUTS, TEST_LISTINGS, dumps as dump_json
+from .aggregation import (
+    BUCKETS, GROUP_FIELDS, HEATMAP_METRICS, MAX_HEATMAP_TILES, METRICS, STATS, aggregate_series, tile_heatmap,
+)
+from utils.geo import TILE_ZOOM, bbox_tiles
+from utils.streaming import streaming_content
+from .speedtest import (
+    UPLOAD_SCOPE_KEY, TransferMeter, iter_payload, metered, parse_download_params,
+    parse_range as parse_download_range,
+)
+from utils.time_range import parse_range
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-TEST_SERIALIZER_MAP = {
-    'http_download': HTTPDownloadTestSerializer,
-    'http_upload': HTTPUploadTestSerializer,
-    'ping': PingTestSerializer,
-    'dns': DNSTestSerializer,
-    'web': WebTestSerializer,
-    'sms': SMSTestSerializer,
-}
-
 @swagger_auto_schema(method='post', request_body=RequestOTPSerializer)
 @api_view(['POST'])
 def request_otp(request):
@@ -161,58 +182,184 @@ def login_user(request):
     })
 
 
-@permission_classes([IsAuthenticated])
 @api_view(['POST'])
 def logout_user(request):
+    if isinstance(request.auth, Token):
+        invalidate_token(request.auth.key)
+        request.auth.delete()
     logout(request)
     return Response({"message": "Logged out successfully."})
 
 
+def _save_cell_info(serializer):
+    # Async code cannot open transactions, so the async views run their
+    # writes through sync helpers like this one, in a single sync_to_async hop.
+    uuid = serializer.validated_data.get('uuid')
+    try:
+        with transaction.atomic():
+            serializer.save()
+    except IntegrityError as e:
+        existing = CellInfo.objects.filter(uuid=uuid).first() if uuid else None
+        if existing is None:
+            raise ValueError(f'CellInfo could not be stored: {e}')
+        return CellInfoSerializer(existing).data, False
+
+    response_cache.invalidate('cell_info')
+    lookups.remember_cell_infos([serializer.instance.id])
+    if uuid:
+        dedupe.remember('cell_info', {uuid: serializer.instance.id})
+    return serializer.data, True
+
+
 @swagger_auto_schema(method='post', request_body=CellInfoSerializer)
 @api_view(['POST'])
-def add_cell_info(request):
+@parser_classes(INGEST_PARSERS)
+async def add_cell_info(request):
     serializer = CellInfoSerializer(data=request.data)
-    if serializer.is_valid():
-        serializer.save()
-        return Response(serializer.data, status=201)
-    return Response(serializer.errors, status=400)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
+
+    uuid = serializer.validated_data.get('uuid')
+    if uuid and dedupe.recent_id('cell_info', uuid) is not None:
+        existing = await CELL_INFO_LISTING.values(CellInfo.objects.filter(uuid=uuid)).afirst()
+        if existing is not None:
+            return Response(CELL_INFO_LISTING.record(existing), status=200)
+
+    try:
+        data, created = await sync_to_async(_save_cell_info)(serializer)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    return Response(data, status=201 if created else 200)
+
+
+def _save_test(user, data, type_, detail_serializer):
+    uuid = data.get('uuid')
+    try:
+        with transaction.atomic():
+            test = Test.objects.create(
+                uuid=uuid,
+                phone_number=user,
+                timestamp=data['timestamp'],
+                cell_info_id=data['cell_info'],
+                test_type=type_
+            )
+            detail_serializer.Meta.model.objects.create(id=test, **detail_serializer.validated_data)
+    except IntegrityError as e:
+        existing = Test.objects.filter(uuid=uuid).first() if uuid else None
+        if existing is not None:
+            return UnifiedTestSerializer(existing).data, False
+        if not CellInfo.objects.filter(id=data['cell_info']).exists():
+            # Deleted after this process cached it, e.g. by expire_measurements.
+            lookups.forget_cell_info(data['cell_info'])
+            raise ValueError('CellInfo not found with given ID')
+        raise ValueError(f'Test could not be stored: {e}')
+
+    response_cache.invalidate('tests')
+    if uuid:
+        dedupe.remember('test', {uuid: test.id})
+    return UnifiedTestSerializer(test).data, True
 
 
 @swagger_auto_schema(method='post', request_body=AddTestInputSerializer)
 @api_view(['POST'])
-def add_test(request):
+@parser_classes(INGEST_PARSERS)
+async def add_test(request):
     type_ = request.data.get('type_')
     if not type_ or type_ not in TEST_SERIALIZER_MAP:
         return Response({'error': 'Invalid or missing test type'}, status=400)
 
-    try:
-        user = User.objects.get(phone_number=request.data.get('phone_number'))
-    except User.DoesNotExist:
+    # Everything is validated before the first write, so a bad detail no
+    # longer leaves a Test row behind to delete.
+    input_serializer = AddTestInputSerializer(data=request.data)
+    if not input_serializer.is_valid():
+        return Response(input_serializer.errors, status=400)
+    data = input_serializer.validated_data
+
+    serializer_class = TEST_SERIALIZER_MAP[type_]
+    detail = {key: value for key, value in data['detail'].items() if key != 'id'}
+    detail_serializer = serializer_class(data=detail)
+    if not detail_serializer.is_valid():
+        return Response(detail_serializer.errors, status=400)
+
+    user = await lookups.aget_user(data['phone_number'])
+    if user is None:
         return Response({'error': 'User not found with given phone number'}, status=400)
 
-    try:
-        cell_info = CellInfo.objects.get(id=request.data.get('cell_info'))
-    except CellInfo.DoesNotExist:
+    if not await lookups.acell_info_exists(data['cell_info']):
         return Response({'error': 'CellInfo not found with given ID'}, status=400)
 
-    test = Test.objects.create(
-        phone_number=user,
-        timestamp=request.data.get('timestamp'),
-        cell_info=cell_info
-    )
+    uuid = data.get('uuid')
+    if uuid and dedupe.recent_id('test', uuid) is not None:
+        existing = await TEST_LISTINGS[None].values(Test.objects.filter(uuid=uuid)).afirst()
+        if existing is not None:
+            return Response(TEST_LISTINGS[None].record(existing), status=200)
 
-    subtype_data = dict(request.data.get('detail', {}))
-    subtype_data['id'] = test.id
+    try:
+        data, created = await sync_to_async(_save_test)(user, data, type_, detail_serializer)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    return Response(data, status=status.HTTP_201_CREATED if created else 200)
 
-    serializer_class = TEST_SERIALIZER_MAP[type_]
-    serializer = serializer_class(data=subtype_data)
 
-    if serializer.is_valid():
-        serializer.save()
-        return Response(UnifiedTestSerializer(test).data, status=status.HTTP_201_CREATED)
+@swagger_auto_schema(method='post', request_body=BatchCellInfoSerializer(many=True))
+@api_view(['POST'])
+@parser_classes(INGEST_PARSERS)
+def add_batch(request):
+    items = request.data
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'Expected a non-empty list of cell info records'}, status=400)
+    if len(items) > MAX_BATCH_SIZE:
+        return Response({'error': f'Batch size exceeds the limit of {MAX_BATCH_SIZE} records'}, status=400)
+
+    results = ingest_batch(items)
+    created = sum(1 for result in results if result['status'] == 'created')
+    duplicates = sum(1 for result in results if result['status'] == 'duplicate')
+    rejected = len(items) - created - duplicates
+    logger.info(f"Batch ingest: {created} of {len(items)} cell infos created, {duplicates} duplicates")
+
+    if rejected == len(items):
+        response_status = status.HTTP_400_BAD_REQUEST
+    elif rejected:
+        response_status = status.HTTP_207_MULTI_STATUS
     else:
-        test.delete()
-        return Response(serializer.errors, status=400)
+        response_status = status.HTTP_201_CREATED
+
+    return Response({
+        'created': created,
+        'duplicates': duplicates,
+        'rejected': rejected,
+        'results': results,
+    }, status=response_status)
+
+
+@swagger_auto_schema(method='post', request_body=BatchCellInfoSerializer(many=True))
+@api_view(['POST'])
+@parser_classes(INGEST_PARSERS)
+def enqueue_batch_view(request):
+    items = request.data
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'Expected a non-empty list of cell info records'}, status=400)
+    if len(items) > MAX_BATCH_SIZE:
+        return Response({'error': f'Batch size exceeds the limit of {MAX_BATCH_SIZE} records'}, status=400)
+
+    key, results = enqueue_batch(items)
+    if key is None:
+        return Response({'queued': 0, 'rejected': len(items), 'results': results}, status=400)
+
+    queued = sum(1 for result in results if result['status'] == 'queued')
+    return Response({
+        'key': key,
+        'queued': queued,
+        'rejected': len(items) - queued,
+        'results': results,
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@swagger_auto_schema(method='get')
+@api_view(['GET'])
+@permission_classes([IsAuthenticated | FromMonitoringAddress])
+def get_ingest_queue_stats(request):
+    return Response(get_ingest_queue().stats())
 
 
 @swagger_auto_schema(method='get')
@@ -223,161 +370,484 @@ def get_users(request):
     return Response(serializer.data)
 
 
+def _apply_range(query, time_filter, label):
+    time_filter = time_filter.lower().strip()
+    time_threshold = timezone.now() - parse_range(time_filter)
+    query = query.filter(timestamp__gte=time_threshold)
+    logger.info(f"Filtering {label} from last {time_filter} (since {time_threshold})")
+    logger.debug(f"Generated SQL: {str(query.query)}")
+    return query, time_filter, time_threshold
+
+
+def _compacted(query, since, horizon):
+    # Returns the raw query narrowed to the uncompacted period, and the start
+    # of that period when summaries must stand in for what lies before it.
+    if horizon is None or (since is not None and since >= horizon):
+        return query, None
+    return query.filter(timestamp__gte=horizon), horizon
+
+
+def _json_response(body, cache_status, encoding=None):
+    response = HttpResponse(body, content_type='application/json')
+    response['X-Cache'] = cache_status
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+async def _list_response(request, query, listing, time_filter, namespace, summaries=None):
+    params = request.query_params
+    layout = params.get('layout', 'records')
+    if layout not in LISTING_LAYOUTS:
+        return Response({"error": f"Invalid layout. Use one of: {', '.join(LISTING_LAYOUTS)}."}, status=400)
+
+    encoding = compression.negotiate(request.headers.get('Accept-Encoding'))
+
+    if params.get('stream', '').lower() in ('1', 'true', 'yes'):
+        rows = iter_keyset(listing.values(query), key=listing.key)
+        chunks = stream_json(rows, listing.record, leading=summaries or (), time_filter=time_filter)
+        if encoding:
+            chunks = compression.compress_chunks(chunks, encoding)
+        response = StreamingHttpResponse(streaming_content(request, chunks), content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    # Responses are cached as encoded, and compressed, JSON, so hits skip
+    # serialization and compression too. Each coding has its own entry.
+    cache_key = response_cache.cache_key(namespace, params)
+    if encoding:
+        cache_key = f'{cache_key}_{encoding}'
+    body = response_cache.lookup(namespace, cache_key)
+    if body is not None:
+        return _json_response(body, 'HIT', encoding)
+
+    payload = await _build_list_payload(request, query, listing, time_filter, layout, summaries)
+    if isinstance(payload, Response):
+        return payload
+    with instrumentation.serializing():
+        body = dump_json(payload)
+    if encoding:
+        with instrumentation.compressing():
+            body = compression.compress(body, encoding)
+    response_cache.store(cache_key, body)
+    return _json_response(body, 'MISS', encoding)
+
+
+async def _build_list_payload(request, query, listing, time_filter, layout, summaries=None):
+    # Summaries of compacted periods precede the raw rows, and in cursor mode
+    # are paged with them through one (timestamp, id) keyset. The columnar
+    # layout names the fields once and gives each row as an array; summaries,
+    # which carry extra keys, stay records under "summaries".
+    params = request.query_params
+
+    if 'cursor' in params or 'page_size' in params:
+        try:
+            page_size = int(params.get('page_size', DEFAULT_PAGE_SIZE))
+            cursor = decode_cursor(params['cursor']) if params.get('cursor') else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+        rollups = await sync_to_async(summaries.page)(cursor, page_size + 1) if summaries else []
+        rows = []
+        if len(rollups) <= page_size:
+            rows = await akeyset_page(listing.values(query), cursor, page_size + 1 - len(rollups))
+        next_cursor = None
+        if len(rollups) > page_size:
+            rollups = rollups[:page_size]
+            next_cursor = encode_cursor(*summaries.key(rollups[-1]))
+        elif len(rollups) + len(rows) > page_size:
+            rows = rows[:page_size - len(rollups)]
+            next_cursor = encode_cursor(*(listing.key(rows[-1]) if rows else summaries.key(rollups[-1])))
+
+        leading = [summaries.record(rollup) for rollup in rollups]
+        payload = {"time_filter": time_filter, "next_cursor": next_cursor}
+    else:
+        leading = await sync_to_async(list)(summaries) if summaries else []
+        count = await query.acount() + len(leading)
+        rows = [row async for row in listing.values(query)]
+        logger.info(f"Query returned {count} results")
+        payload = {"count": count, "time_filter": time_filter}
+
+    with instrumentation.serializing():
+        if layout == 'columnar':
+            payload.update(fields=listing.fields, results=listing.rows(rows), summaries=leading)
+        else:
+            payload['results'] = leading + listing.records(rows)
+    return payload
+
+
 @swagger_auto_schema(method='get')
-@permission_classes([IsAuthenticated])
 @api_view(['GET'])
-def get_cell_info(request):
-    token_key = request.headers.get("Authorization")
-    if not token_key or not token_key.startswith("Token "):
-        return Response(
-            {"detail": "Authentication credentials were not provided."},
-            status=403
-        )
-
+@permission_classes([IsAuthenticated])
+async def get_cell_info(request):
     time_filter = request.query_params.get('range') or request.query_params.get('Range')
     
     logger.info(f"GET cell_info request received with range parameter: {time_filter}")
     
     query = CellInfo.objects.all()
+    since = None
     
     if time_filter:
-        time_filter = time_filter.lower().strip()
-        now = timezone.now()
-        
         try:
-            if time_filter.endswith('h'):  
-                hours = float(time_filter[:-1])
-                time_threshold = now - timedelta(hours=hours)
-                query = query.filter(timestamp__gte=time_threshold)
-                logger.info(f"Filtering cell_info from last {hours} hours (since {time_threshold})")
-                logger.info(f"Time threshold: {time_threshold}")
-                logger.info(f"Generated SQL: {str(query.query)}")
-
-            elif time_filter.endswith('d'):  
-                days = int(time_filter[:-1])
-                time_threshold = now - timedelta(days=days)
-                query = query.filter(timestamp__gte=time_threshold)
-                logger.info(f"Filtering cell_info from last {days} days (since {time_threshold})")
-                logger.info(f"Time threshold: {time_threshold}")
-                logger.info(f"Generated SQL: {str(query.query)}")
-                
-            elif time_filter.endswith('w'): 
-                weeks = int(time_filter[:-1])
-                time_threshold = now - timedelta(weeks=weeks)
-                query = query.filter(timestamp__gte=time_threshold)
-                logger.info(f"Filtering cell_info from last {weeks} weeks (since {time_threshold})")
-                logger.info(f"Time threshold: {time_threshold}")
-                logger.info(f"Generated SQL: {str(query.query)}")
-            else:
-                return Response({"error": "Invalid range format. Use formats like '1h', '1d', '1w'."}, status=400)
-                
+            query, time_filter, since = _apply_range(query, time_filter, 'cell_info')
         except ValueError as e:
             logger.error(f"Error parsing time filter '{time_filter}': {str(e)}")
             return Response({"error": f"Invalid range format: {str(e)}"}, status=400)
-    
-    count = query.count()
-    logger.info(f"Query returned {count} results")
-    
-    serializer = CellInfoSerializer(query, many=True)
-    return Response({
-        "count": count,
-        "time_filter": time_filter,
-        "results": serializer.data
-    })
+
+    query, horizon = _compacted(query, since, await acompacted_before())
+    summaries = cell_info_summaries(since, horizon) if horizon else None
+    return await _list_response(request, query, CELL_INFO_LISTING, time_filter, 'cell_info', summaries)
 
 
 @swagger_auto_schema(method='get', responses={200: UnifiedTestSerializer(many=True)})
-@permission_classes([IsAuthenticated])
 @api_view(['GET'])
-def get_tests(request):
-
-    token_key = request.headers.get("Authorization")
-    if not token_key or not token_key.startswith("Token "):
-        return Response(
-            {"detail": "Authentication credentials were not provided."},
-            status=403
-        )
+@permission_classes([IsAuthenticated])
+async def get_tests(request):
     time_filter = request.query_params.get('range') or request.query_params.get('Range')
     
     logger.info(f"GET tests request received with range parameter: {time_filter}")
     
-    query = Test.objects.all()
+    test_type = request.query_params.get('type')
+    if test_type:
+        if test_type not in TEST_SERIALIZER_MAP:
+            return Response({"error": f"Invalid test type: {test_type}"}, status=400)
+        query = Test.objects.filter(test_type=test_type)
+    else:
+        query = Test.objects.all()
+    since = None
     
     if time_filter:
-        time_filter = time_filter.lower().strip()
-        
-        now = timezone.now()
-       
         try:
-            if time_filter.endswith('h'):  
-                hours = float(time_filter[:-1])
-                time_threshold = now - timedelta(hours=hours)
-                query = query.filter(timestamp__gte=time_threshold)
-                logger.info(f"Filtering tests from last {hours} hours (since {time_threshold})")
-                logger.info(f"Time threshold: {time_threshold}")
-                logger.info(f"Generated SQL: {str(query.query)}")
-
-            elif time_filter.endswith('d'):  
-                days = int(time_filter[:-1])
-                time_threshold = now - timedelta(days=days)
-                query = query.filter(timestamp__gte=time_threshold)
-                logger.info(f"Filtering tests from last {days} days (since {time_threshold})")
-                logger.info(f"Time threshold: {time_threshold}")
-                logger.info(f"Generated SQL: {str(query.query)}")
-                
-            elif time_filter.endswith('w'): 
-                weeks = int(time_filter[:-1])
-                time_threshold = now - timedelta(weeks=weeks)
-                query = query.filter(timestamp__gte=time_threshold)
-                logger.info(f"Filtering tests from last {weeks} weeks (since {time_threshold})")
-                logger.info(f"Time threshold: {time_threshold}")
-                logger.info(f"Generated SQL: {str(query.query)}")
-            else:
-                return Response({"error": "Invalid range format. Use formats like '1h', '1d', '1w'."}, status=400)
-                
+            query, time_filter, since = _apply_range(query, time_filter, 'tests')
         except ValueError as e:
             logger.error(f"Error parsing time filter '{time_filter}': {str(e)}")
             return Response({"error": f"Invalid range format: {str(e)}"}, status=400)
-    
-    count = query.count()
-    logger.info(f"Query returned {count} results")
-    
-    serializer = UnifiedTestSerializer(query, many=True)
+
+    query, horizon = _compacted(query, since, await acompacted_before())
+    summaries = test_summaries(since, horizon, test_type) if horizon else None
+    return await _list_response(request, query, TEST_LISTINGS[test_type or None], time_filter, 'tests', summaries)
+
+
+@swagger_auto_schema(method='get')
+@api_view(['GET'])
+@permission_classes([IsAuthenticated | FromMonitoringAddress])
+def get_cache_stats(request):
+    return Response(response_cache.stats())
+
+
+@swagger_auto_schema(method='get', auto_schema=None)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated | FromMonitoringAddress])
+def metrics(request):
+    return HttpResponse(instrumentation.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@swagger_auto_schema(method='get')
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_aggregates(request):
+    params = request.query_params
+    metric = params.get('metric')
+    bucket = params.get('bucket', '1h')
+    time_filter = params.get('range', '1d').lower().strip()
+    group_by = [name for name in params.get('group_by', '').split(',') if name]
+    stats = [name for name in params.get('stats', ','.join(STATS)).split(',') if name]
+
+    if metric not in METRICS:
+        return Response({"error": f"Invalid metric. Use one of: {', '.join(METRICS)}."}, status=400)
+    if bucket not in BUCKETS:
+        return Response({"error": f"Invalid bucket. Use one of: {', '.join(BUCKETS)}."}, status=400)
+    if any(name not in GROUP_FIELDS for name in group_by):
+        return Response({"error": f"Invalid group_by. Use any of: {', '.join(GROUP_FIELDS)}."}, status=400)
+    if not stats or any(name not in STATS for name in stats):
+        return Response({"error": f"Invalid stats. Use any of: {', '.join(STATS)}."}, status=400)
+
+    try:
+        since = timezone.now() - parse_range(time_filter)
+    except ValueError as e:
+        return Response({"error": f"Invalid range format: {str(e)}"}, status=400)
+
+    try:
+        series, source = aggregate_series(metric, bucket, group_by, since, stats)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    logger.info(f"Aggregated {metric} into {len(series)} points from {source} ({bucket} buckets, range {time_filter})")
+
+    data = {
+        "metric": metric,
+        "bucket": bucket,
+        "group_by": group_by,
+        "time_filter": time_filter,
+        "source": source,
+        "series": series
+    }
+    horizon = compacted_before()
+    if source == 'raw' and horizon is not None and since < horizon:
+        # Sub-hour buckets and percentiles need raw rows, which no longer
+        # exist before the compaction horizon; use 1h/1d buckets for that span.
+        data["compacted_before"] = horizon
+    return Response(data)
+
+
+@swagger_auto_schema(method='get')
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_heatmap(request):
+    params = request.query_params
+    metric = params.get('metric', 'rsrp')
+    time_filter = params.get('range', '1d').lower().strip()
+
+    if metric not in HEATMAP_METRICS:
+        return Response({"error": f"Invalid metric. Use one of: {', '.join(HEATMAP_METRICS)}."}, status=400)
+
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(value) for value in params.get('bbox', '').split(','))
+        zoom = int(params.get('zoom', 14))
+    except ValueError:
+        return Response({"error": "bbox must be 'min_lng,min_lat,max_lng,max_lat' and zoom an integer."}, status=400)
+    if min_lat > max_lat or min_lng > max_lng:
+        return Response({"error": "bbox minimum must not exceed its maximum."}, status=400)
+    if not 0 <= zoom <= TILE_ZOOM:
+        return Response({"error": f"zoom must be between 0 and {TILE_ZOOM}."}, status=400)
+
+    x0, y0, x1, y1 = bbox_tiles(min_lat, min_lng, max_lat, max_lng, zoom)
+    if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_HEATMAP_TILES:
+        return Response({"error": "Too many tiles for this bbox; use a lower zoom."}, status=400)
+
+    try:
+        since = timezone.now() - parse_range(time_filter)
+    except ValueError as e:
+        return Response({"error": f"Invalid range format: {str(e)}"}, status=400)
+
+    tiles = tile_heatmap(metric, min_lat, min_lng, max_lat, max_lng, zoom, since)
+    logger.info(f"Heatmap of {metric} at zoom {zoom}: {len(tiles)} tiles")
+
     return Response({
-        "count": count,
+        "metric": metric,
+        "zoom": zoom,
         "time_filter": time_filter,
-        "results": serializer.data
+        "tiles": tiles
     })
 
 
-@swagger_auto_schema(method='get')
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('dataset', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(EXPORT_DATASETS)),
+    openapi.Parameter('file_format', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(EXPORT_FORMATS)),
+    openapi.Parameter('range', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_measurements(request):
+    # 'format' is taken by DRF's renderer override, hence 'file_format'.
+    params = request.query_params
+    dataset = params.get('dataset', 'cell_info')
+    file_format = params.get('file_format', 'parquet')
+
+    if dataset not in EXPORT_DATASETS:
+        return Response({"error": f"Invalid dataset. Use one of: {', '.join(EXPORT_DATASETS)}."}, status=400)
+    if file_format not in EXPORT_FORMATS:
+        return Response({"error": f"Invalid file_format. Use one of: {', '.join(EXPORT_FORMATS)}."}, status=400)
+    try:
+        start, end = parse_bounds(params.get('range'), params.get('start'), params.get('end'))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    try:
+        load_pyarrow()
+    except ImportError as e:
+        return Response({"error": str(e)}, status=501)
+
+    logger.info(f"Exporting {dataset} as {file_format} from {start} to {end}")
+    extension, content_type = EXPORT_FORMATS[file_format]
+    response = StreamingHttpResponse(
+        streaming_content(request, stream_export(dataset, file_format, start, end)), content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{extension}"'
+    horizon = compacted_before()
+    if horizon is not None and (start is None or start < horizon):
+        # Raw rows before the compaction horizon now exist only as the hourly
+        # rollups, so the file holds nothing older than this.
+        response['X-Compacted-Before'] = horizon.isoformat()
+    return response
+
+
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Bytes to send (default 1 MiB)."),
+    openapi.Parameter('duration', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, description="Stop after this many seconds."),
+])
 @api_view(['GET'])
-def http_download_test(request):
-    chunk_size = 1024  
-    total_size = 1024 * 1024
-
-    def generate():
-        sent = 0
-        while sent < total_size:
-            yield b'\0' * chunk_size
-            sent += chunk_size
-
-    response = StreamingHttpResponse(generate(), content_type='application/octet-stream')
-    response['Content-Disposition'] = 'attachment; filename="1mb_test.bin"'
-    response['Content-Length'] = str(total_size)
+async def http_download_test(request):
+    try:
+        size, duration = parse_download_params(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    start, end, status_code = 0, size - 1, 200
+    # A timed download has no known length, so ranges only apply to sized ones.
+    if duration is None:
+        try:
+            requested = parse_download_range(request.headers.get('Range'), size)
+        except ValueError as e:
+            response = Response({"error": str(e)}, status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if requested is not None:
+            (start, end), status_code = requested, 206
+
+    deadline = time.monotonic() + duration if duration else None
+    response = StreamingHttpResponse(
+        streaming_content(request, iter_payload(start, end, deadline), blocking=False),
+        content_type='application/octet-stream', status=status_code,
+    )
+    response['Content-Disposition'] = 'attachment; filename="download_test.bin"'
+    # Random bytes do not compress; no-transform also keeps proxies from trying.
+    response['Cache-Control'] = 'no-store, no-transform'
+    response['Accept-Ranges'] = 'bytes'
+    if duration is None:
+        response['Content-Length'] = str(end - start + 1)
+    if status_code == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
     return response
 
 
+def _upload_meter(request):
+    # Under the project's ASGI application UploadSink has already drained the
+    # body; otherwise the raw stream is read here without parsing the multipart.
+    # DRF leaves request.stream unset without a Content-Length, so a chunked
+    # body is read from the server's wsgi.input, which undoes the chunking.
+    meter = getattr(request, 'scope', {}).get(UPLOAD_SCOPE_KEY)
+    if meter is None:
+        meter = TransferMeter()
+        stream = request.stream
+        if stream is None and 'chunked' in request.META.get('HTTP_TRANSFER_ENCODING', '').lower():
+            stream = request.META.get('wsgi.input')
+        if stream is not None:
+            meter.drain(stream)
+    return meter
+
+
 @swagger_auto_schema(method='post')
 @api_view(['POST'])
-def http_upload_test(request):
-    if request.method == "POST" and request.FILES.get("file"):
-        uploaded_file = request.FILES["file"]
-        size_bytes = uploaded_file.size
-        size_mb = size_bytes / (1024 * 1024)
+# Session authentication would enforce CSRF by parsing the body as a form.
+@authentication_classes([])
+async def http_upload_test(request):
+    meter = _upload_meter(request)
+    if not meter.received:
+        return JsonResponse({"status": "error", "message": "No file uploaded"}, status=400)
+    return JsonResponse({
+        "status": "success",
+        "file_size_mb": round(meter.received / (1024 * 1024), 2),
+        **meter.result(),
+    })
 
-        return JsonResponse({
-            "status": "success",
-            "file_size_mb": round(size_mb, 2)
-        })
-    return JsonResponse({"status": "error", "message": "No file uploaded"}, status=400)
+
+@swagger_auto_schema(method='post', request_body=SpeedTestSessionInputSerializer)
+@api_view(['POST'])
+async def start_speedtest(request):
+    serializer = SpeedTestSessionInputSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
+    data = serializer.validated_data
+
+    user = await lookups.aget_user(data['phone_number'])
+    if user is None:
+        return Response({'error': 'User not found with given phone number'}, status=400)
+    if not await lookups.acell_info_exists(data['cell_info']):
+        return Response({'error': 'CellInfo not found with given ID'}, status=400)
+
+    session = await SpeedTestSession.objects.acreate(
+        phone_number=user, timestamp=data['timestamp'], cell_info_id=data['cell_info'], test_type=data['type_'],
+        streams=data['streams'], size=data['size'], duration=data['duration'],
+    )
+    url = request.build_absolute_uri(reverse(
+        'speedtest_download' if session.test_type == 'http_download' else 'speedtest_upload'
+    ))
+    return Response({
+        'session': str(session.id),
+        'type_': session.test_type,
+        'streams': [f'{url}?session={session.id}&stream={index}' for index in range(session.streams)],
+        'size': session.size,
+        'duration': session.duration,
+        'expires_at': session.created_at + speedtest_sessions.SESSION_TTL,
+    }, status=201)
+
+
+async def _speedtest_stream(request, test_type):
+    try:
+        index = int(request.query_params.get('stream', ''))
+    except ValueError:
+        raise ValueError("stream must be an integer")
+    session = await sync_to_async(speedtest_sessions.open_session)(request.query_params.get('session'), index, test_type)
+    return session, index
+
+
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('session', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+    openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=True),
+])
+@api_view(['GET'])
+async def speedtest_download(request):
+    try:
+        session, index = await _speedtest_stream(request, 'http_download')
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    meter = TransferMeter()
+    deadline = time.monotonic() + session.duration if session.duration else None
+    payload = metered(iter_payload(0, session.size - 1, deadline), meter)
+    # The stream is recorded when the response is closed, after its last byte.
+    response = speedtest_sessions.RecordedStreamingResponse(
+        streaming_content(request, payload, blocking=False), session, index, meter,
+        content_type='application/octet-stream',
+    )
+    response['Cache-Control'] = 'no-store, no-transform'
+    if session.duration is None:
+        response['Content-Length'] = str(session.size)
+    return response
+
+
+@swagger_auto_schema(method='post', manual_parameters=[
+    openapi.Parameter('session', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+    openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=True),
+])
+@api_view(['POST'])
+@authentication_classes([])
+async def speedtest_upload(request):
+    try:
+        session, index = await _speedtest_stream(request, 'http_upload')
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    meter = _upload_meter(request)
+    if not meter.received:
+        return Response({"error": "No data uploaded"}, status=400)
+    test = await sync_to_async(speedtest_sessions.record_stream)(session, index, meter)
+    return Response({**meter.result(), 'recorded': test is not None})
+
+
+@swagger_auto_schema(method='get', manual_parameters=[
+    openapi.Parameter('session', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+])
+@api_view(['GET'])
+async def speedtest_result(request):
+    try:
+        session = await sync_to_async(speedtest_sessions.get_session)(request.query_params.get('session'))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=404)
+
+    totals = await sync_to_async(speedtest_sessions.summarize)(session)
+    return Response({
+        'session': str(session.id),
+        'type_': session.test_type,
+        'streams': session.streams,
+        'completed': totals['streams'],
+        'bytes': totals['bytes'],
+        'seconds': totals['seconds'],
+        'throughput': totals['throughput'],
+        'test': session.test_id,
+    })
@@ -0,0 +1,90 @@
+from asgiref.sync import sync_to_async
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import RollupWatermark
+from .retention import DEFAULT_CHUNK_SIZE, purge_cell_infos, purge_tests
+from .rollups import update_cell_info_rollups, update_test_rollups, watermark
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# The compaction horizon lives in a RollupWatermark row, as epoch seconds in
+# last_id, and is cached for COMPACTION_HORIZON_TTL seconds because every
+# listing request reads it.
+HORIZON_NAME = 'compaction'
+HORIZON_CACHE_KEY = 'compacted_before'
+DEFAULT_HORIZON_TTL = 60
+
+
+def horizon_ttl():
+    return getattr(settings, 'COMPACTION_HORIZON_TTL', DEFAULT_HORIZON_TTL)
+
+
+def compaction_target(now=None):
+    """Hour before which raw rows should be compacted, or None when compaction is disabled."""
+    days = getattr(settings, 'MEASUREMENT_COMPACTION_DAYS', None)
+    if not days:
+        return None
+    return (now or timezone.now()).replace(minute=0, second=0, microsecond=0) - timedelta(days=days)
+
+
+def compacted_before():
+    """
+    Raw CellInfo and Test rows older than this have been replaced by the hourly
+    rollups; None when nothing has been compacted.
+    """
+    seconds = cache.get(HORIZON_CACHE_KEY)
+    if seconds is None:
+        seconds = RollupWatermark.objects.filter(name=HORIZON_NAME).values_list('last_id', flat=True).first() or 0
+        cache.set(HORIZON_CACHE_KEY, seconds, timeout=horizon_ttl())
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc) if seconds else None
+
+
+async def acompacted_before():
+    seconds = cache.get(HORIZON_CACHE_KEY)
+    if seconds is None:
+        return await sync_to_async(compacted_before)()
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc) if seconds else None
+
+
+def _catch_up(update):
+    while update() is not None:
+        pass
+
+
+def compact_measurements(now=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Replace raw rows older than MEASUREMENT_COMPACTION_DAYS with their hourly
+    rollups. The rollups are brought up to date first, and only rows at or
+    below the rollup watermarks are deleted, so nothing is dropped before it
+    is summarized.
+
+    The horizon is advanced before deleting, and the deletes wait until every
+    worker's cached copy has expired, so readers switch to the rollups for the
+    period while its raw rows are still there rather than after they are gone.
+    Returns ``(horizon, tests_deleted, cell_infos_deleted)``.
+    """
+    target = compaction_target(now)
+    if target is None:
+        return None, 0, 0
+
+    current = compacted_before()
+    if current is not None and current >= target:
+        target = current
+
+    _catch_up(update_cell_info_rollups)
+    _catch_up(update_test_rollups)
+
+    RollupWatermark.objects.update_or_create(name=HORIZON_NAME, defaults={'last_id': int(target.timestamp())})
+    cache.set(HORIZON_CACHE_KEY, int(target.timestamp()), timeout=horizon_ttl())
+    if target != current and horizon_ttl():
+        logger.info(f"Advanced the compaction horizon to {target}; waiting {horizon_ttl()} s for workers to see it")
+        time.sleep(horizon_ttl())
+
+    tests = purge_tests(None, target, chunk_size, max_id=watermark('test'))
+    cell_infos = purge_cell_infos(None, target, chunk_size, max_id=watermark('cell_info'))
+    logger.info(f"Compacted raw measurements before {target}: {tests} tests, {cell_infos} cell infos")
+    return target, tests, cell_infos
@@ -0,0 +1,276 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from api import cache as response_cache
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+from .models import User
+import math
+import random
+import socket
+import statistics
+import threading
+import time
+
+# The Android ForegroundService posts a cell info, then one add_test per
+# enabled test, every 15 seconds.
+CYCLE_SECONDS = 15
+
+TEST_VALUES = {
+    'ping': ('latency', 20.0, 120.0),
+    'dns': ('time', 5.0, 80.0),
+    'http_download': ('throughput', 1.0, 90.0),
+    'http_upload': ('throughput', 0.5, 30.0),
+    'web': ('response_time', 150.0, 1500.0),
+}
+
+GENERATIONS = [('4G', 'LTE'), ('3G', 'WCDMA'), ('5G', 'NR'), ('2G', 'GSM')]
+
+
+class Device:
+    """One simulated handset: a random walk through a small pool of cells."""
+
+    def __init__(self, rng, index, start):
+        self.rng = rng
+        self.phone_number = f'0990{index:07d}'
+        self.lat = 35.70 + rng.uniform(-0.1, 0.1)
+        self.lng = 51.40 + rng.uniform(-0.1, 0.1)
+        self.plmn = rng.choice(['43211', '43235', '43220'])
+        self.cells = [rng.randrange(10_000, 99_999) for _ in range(4)]
+        self.tests = rng.sample(list(TEST_VALUES), k=rng.randint(1, len(TEST_VALUES)))
+        self.timestamp = start + timedelta(seconds=rng.uniform(0, CYCLE_SECONDS))
+
+    def cell_info(self):
+        rng = self.rng
+        self.lat += rng.gauss(0, 0.0005)
+        self.lng += rng.gauss(0, 0.0005)
+        self.timestamp += timedelta(seconds=CYCLE_SECONDS + rng.uniform(-1, 1))
+        gen, tech = rng.choices(GENERATIONS, weights=[70, 15, 10, 5])[0]
+        return {
+            'phone_number': self.phone_number,
+            'lat': round(self.lat, 6),
+            'lng': round(self.lng, 6),
+            'timestamp': self.timestamp.isoformat(),
+            'gen': gen,
+            'tech': tech,
+            'plmn': self.plmn,
+            'cid': rng.choice(self.cells),
+            'tac': rng.randrange(1, 60_000),
+            'rsrp': round(rng.uniform(-125, -70), 1),
+            'rsrq': round(rng.uniform(-20, -3), 1),
+        }
+
+    def test_payloads(self, cell_info_id):
+        for type_ in self.tests:
+            field, low, high = TEST_VALUES[type_]
+            yield {
+                'type_': type_,
+                'phone_number': self.phone_number,
+                'timestamp': self.timestamp.isoformat(),
+                'cell_info': cell_info_id,
+                'detail': {field: round(self.rng.uniform(low, high), 2)},
+            }
+
+
+def create_fleet(devices, start, seed):
+    rng = random.Random(seed)
+    fleet = [Device(rng, index, start) for index in range(devices)]
+    User.objects.bulk_create([
+        User(phone_number=device.phone_number, username=f'fleet-{device.phone_number}') for device in fleet
+    ], ignore_conflicts=True)
+    return fleet
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    def request(self, name, call):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = call()
+            elapsed = time.perf_counter() - started
+        self.samples.setdefault(name, []).append((elapsed, len(queries), response.status_code < 400))
+        return response
+
+    def report(self):
+        report = {}
+        for name, samples in self.samples.items():
+            timings = sorted(elapsed for elapsed, _, _ in samples)
+            report[name] = {
+                'requests': len(samples),
+                'errors': sum(1 for _, _, ok in samples if not ok),
+                'p50_ms': round(percentile(timings, 50) * 1000, 3),
+                'p95_ms': round(percentile(timings, 95) * 1000, 3),
+                'p99_ms': round(percentile(timings, 99) * 1000, 3),
+                'mean_ms': round(statistics.mean(timings) * 1000, 3),
+                'requests_per_second': round(len(timings) / sum(timings), 1) if sum(timings) else None,
+                'queries_per_request': round(statistics.mean(count for _, count, _ in samples), 2),
+            }
+        return report
+
+
+def percentile(ordered, pct):
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def run_ingest(recorder, fleet, cycles):
+    """Replay ``cycles`` 15-second rounds of every device posting its cell info and tests."""
+    client = Client()
+    for _ in range(cycles):
+        for device in fleet:
+            response = recorder.request('add_cell_info', lambda: client.post(
+                '/api/add_cell_info/', device.cell_info(), content_type='application/json',
+            ))
+            if response.status_code != 201:
+                continue
+            cell_info_id = response.json()['id']
+            for payload in device.test_payloads(cell_info_id):
+                recorder.request('add_test', lambda: client.post(
+                    '/api/add_test/', payload, content_type='application/json',
+                ))
+
+
+def run_listing(recorder, token, requests, ranges, cached):
+    """Dashboard reads of both listing endpoints; uncached unless ``cached``."""
+    client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+    for i in range(requests):
+        time_filter = ranges[i % len(ranges)]
+        for name, path, namespace in (('get_cell_infos', '/api/get_cell_infos/', 'cell_info'),
+                                      ('get_tests', '/api/get_tests/', 'tests')):
+            if not cached:
+                response_cache.invalidate(namespace)
+            recorder.request(name, lambda: client.get(path, {'range': time_filter}))
+
+
+class InFlight:
+    """Counts requests inside the application, from call to end of body."""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def enter(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def exit(self):
+        with self.lock:
+            self.current -= 1
+
+    def wsgi(self, app):
+        def counted(environ, start_response):
+            self.enter()
+            try:
+                body = app(environ, start_response)
+            except BaseException:
+                self.exit()
+                raise
+            return _ClosingBody(body, self.exit)
+        return counted
+
+    def asgi(self, app):
+        async def counted(scope, receive, send):
+            if scope['type'] != 'http':
+                return await app(scope, receive, send)
+            self.enter()
+            try:
+                await app(scope, receive, send)
+            finally:
+                self.exit()
+        return counted
+
+
+class _ClosingBody:
+    def __init__(self, body, on_close):
+        self.body = body
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self.on_close()
+
+
+class PooledWSGIServer(WSGIServer):
+    """wsgiref server answering on a fixed pool of threads, like one threaded WSGI worker."""
+
+    request_queue_size = 1024
+
+    def __init__(self, address, threads, send_buffer=None):
+        self.send_buffer = send_buffer
+        super().__init__(address, QuietHandler)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def server_bind(self):
+        if self.send_buffer:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        super().server_bind()
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve(mode, threads=8, send_buffer=None):
+    """
+    Serve the project on 127.0.0.1 from one WSGI worker with ``threads``
+    threads ('wsgi') or one uvicorn worker ('asgi'), in a background thread.
+    Yields ``(port, in_flight)``. ``send_buffer`` fixes SO_SNDBUF of the
+    listening socket, which accepted connections inherit.
+    """
+    in_flight = InFlight()
+    if mode == 'wsgi':
+        server = PooledWSGIServer(('127.0.0.1', 0), threads, send_buffer)
+        from polarisbackened.wsgi import application
+        server.set_app(in_flight.wsgi(application))
+        port = server.server_address[1]
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        stop = server.shutdown
+    elif mode == 'asgi':
+        import uvicorn
+        from polarisbackened.asgi import application
+        sock = socket.socket()
+        if send_buffer:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config(
+            in_flight.asgi(application), lifespan='off', log_level='warning', backlog=1024,
+        ))
+        thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+
+        def stop():
+            server.should_exit = True
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+
+    thread.start()
+    time.sleep(0.5)
+    try:
+        yield port, in_flight
+    finally:
+        stop()
+        thread.join(timeout=10)
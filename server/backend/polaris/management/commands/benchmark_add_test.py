@@ -0,0 +1,69 @@
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api import lookups
+from polaris.models import CellInfo, User
+import statistics
+import time
+
+PAYLOADS = [
+    ('ping', {'latency': 40.0}),
+    ('dns', {'time': 15.0}),
+    ('http_download', {'throughput': 12.5}),
+]
+
+
+def _counted(queries):
+    # Savepoints only appear because the run is wrapped in a rolled-back transaction.
+    return sum(1 for query in queries if 'SAVEPOINT' not in query['sql'].upper())
+
+
+class Command(BaseCommand):
+    help = (
+        "Post tests through add_test/ inside a rolled-back transaction and report "
+        "database queries and latency per ingested test."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        client = APIClient()
+        counts, timings = [], []
+
+        with transaction.atomic():
+            user = User.objects.create_user(
+                phone_number='09000000000', password='benchmark', username='add-test-benchmark',
+            )
+            cell_info = CellInfo.objects.create(
+                phone_number=user, lat=35.7, lng=51.4, timestamp=timezone.now(),
+                gen='4G', tech='LTE', plmn='43211', cid=1,
+            )
+            lookups.clear()
+
+            for i in range(options['requests']):
+                type_, detail = PAYLOADS[i % len(PAYLOADS)]
+                payload = {
+                    'type_': type_, 'phone_number': user.phone_number, 'cell_info': cell_info.id,
+                    'timestamp': timezone.now().isoformat(), 'detail': detail,
+                }
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.post('/api/add_test/', payload, format='json')
+                    timings.append(time.perf_counter() - started)
+                if response.status_code != 201:
+                    self.stderr.write(f"Request {i} failed with {response.status_code}: {response.content[:200]}")
+                    break
+                counts.append(_counted(queries.captured_queries))
+
+            transaction.set_rollback(True)
+
+        if not counts:
+            return
+        self.stdout.write(f"requests: {len(counts)}")
+        self.stdout.write(f"queries, first request: {counts[0]}")
+        if len(counts) > 1:
+            self.stdout.write(f"queries per test, warm: {statistics.mean(counts[1:]):.2f}")
+        self.stdout.write(f"latency p50: {statistics.median(timings) * 1000:.2f} ms")
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.authentication import CachedTokenAuthentication, invalidate_token
+from polaris.models import User
+import statistics
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Time token authentication per request with DRF's TokenAuthentication and "
+        "with CachedTokenAuthentication, inside a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+
+        with transaction.atomic():
+            user = User.objects.create_user(
+                phone_number='09000000001', password='benchmark', username='auth-benchmark',
+            )
+            token = Token.objects.create(user=user)
+            invalidate_token(token.key)
+
+            for name, authenticator in (('TokenAuthentication', TokenAuthentication()),
+                                        ('CachedTokenAuthentication', CachedTokenAuthentication())):
+                timings = []
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(options['requests']):
+                        request = Request(factory.get('/', HTTP_AUTHORIZATION=f'Token {token.key}'))
+                        started = time.perf_counter()
+                        authenticator.authenticate(request)
+                        timings.append(time.perf_counter() - started)
+
+                timings.sort()
+                self.stdout.write(
+                    f"{name}: p50 {statistics.median(timings) * 1e6:.1f} us, "
+                    f"p99 {timings[int(len(timings) * 0.99) - 1] * 1e6:.1f} us, "
+                    f"{len(queries) / len(timings):.3f} queries/request"
+                )
+
+            invalidate_token(token.key)
+            transaction.set_rollback(True)
@@ -0,0 +1,115 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from api import compression
+from polaris.loadtest import create_fleet
+from polaris.models import User
+import gzip
+import json
+import re
+import statistics
+import time
+
+_timing = re.compile(r'(\w+);dur=([\d.]+)')
+
+
+class Command(BaseCommand):
+    help = (
+        "Post add_cell_info/ and add_batch/ bodies and read get_cell_infos/ uncompressed, with gzip "
+        "and with zstd, in a throwaway test database. Prints JSON with the bytes on the wire and the "
+        "server CPU time spent on compression per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200, help="add_cell_info/ posts per encoding.")
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--batches', type=int, default=10, help="add_batch/ posts per encoding.")
+        parser.add_argument('--listing-requests', type=int, default=10, help="Uncached reads per encoding.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, options):
+        encodings = ['identity'] + compression.encodings()[::-1]
+        start = timezone.now() - timedelta(hours=1)
+        fleet = create_fleet(options['devices'], start, options['seed'])
+        viewer = User.objects.create_user(phone_number='09000000005', password='benchmark', username='compression')
+        token = Token.objects.create(user=viewer).key
+        client = Client()
+        results = {}
+
+        for encoding in encodings:
+            results[f'add_cell_info {encoding}'] = self.post(client, '/api/add_cell_info/', encoding, [
+                fleet[i % len(fleet)].cell_info() for i in range(options['requests'])
+            ])
+            results[f'add_batch {encoding}'] = self.post(client, '/api/add_batch/', encoding, [
+                [fleet[i % len(fleet)].cell_info() for i in range(options['batch_size'])]
+                for _ in range(options['batches'])
+            ])
+
+        for encoding in encodings:
+            samples = []
+            for _ in range(options['listing_requests']):
+                cache.clear()
+                response = client.get(
+                    '/api/get_cell_infos/', {'range': '1d'},
+                    HTTP_AUTHORIZATION=f'Token {token}', HTTP_ACCEPT_ENCODING=encoding,
+                )
+                samples.append((len(response.content), response, len(self.decode(response))))
+            results[f'get_cell_infos {encoding}'] = self.summarize(samples)
+        return {
+            'meta': {key: options[key] for key in ('devices', 'requests', 'batch_size', 'batches', 'seed')},
+            'endpoints': results,
+        }
+
+    def post(self, client, path, encoding, payloads):
+        samples = []
+        client_cpu = []
+        for payload in payloads:
+            body = json.dumps(payload).encode()
+            raw = len(body)
+            headers = {}
+            if encoding != 'identity':
+                started = time.thread_time()
+                body = compression.compress(body, encoding)
+                client_cpu.append(time.thread_time() - started)
+                headers['HTTP_CONTENT_ENCODING'] = encoding
+            response = client.post(path, body, content_type='application/json', **headers)
+            samples.append((len(body), response, raw))
+        result = self.summarize(samples)
+        result['client_compress_ms'] = round(statistics.mean(client_cpu) * 1000, 3) if client_cpu else 0.0
+        return result
+
+    def summarize(self, samples):
+        timings = [dict(_timing.findall(response['Server-Timing'])) for _, response, _ in samples]
+        wire = statistics.mean(size for size, _, _ in samples)
+        raw = statistics.mean(raw for _, _, raw in samples)
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for _, response, _ in samples if response.status_code >= 400),
+            'raw_bytes': round(raw),
+            'wire_bytes': round(wire),
+            'ratio': round(raw / wire, 2),
+            'server_compress_ms': round(statistics.mean(float(t['compress']) for t in timings), 3),
+            'server_total_ms': round(statistics.mean(float(t['total']) for t in timings), 3),
+        }
+
+    def decode(self, response):
+        encoding = response.get('Content-Encoding')
+        if encoding == 'gzip':
+            return gzip.decompress(response.content)
+        if encoding == 'zstd':
+            return compression.zstandard.ZstdDecompressor().decompress(response.content)
+        return response.content
@@ -0,0 +1,153 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from polaris.loadtest import percentile, serve
+from polaris.models import CellInfo, User
+import asyncio
+import json
+import socket
+import statistics
+import time
+
+# Without a fixed send buffer Linux grows it to a few MB and absorbs whole
+# downloads, so slow readers would never hold a worker as on a mobile link.
+SEND_BUFFER = 64 * 1024
+
+SCENARIOS = {
+    # Dashboard reads; each request costs two queries delayed by --db-latency.
+    'listing': lambda i: f'/api/get_cell_infos/?range=1d&n={i}',
+    # Speed-test downloads to clients reading at --client-rate.
+    'download': lambda i: '/api/download_test/',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the API from one WSGI worker with --threads threads and from one ASGI "
+        "(uvicorn) worker, open --connections concurrent requests against each, and print "
+        "JSON with throughput, latency and the peak number of requests in flight."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', choices=SCENARIOS, default='listing')
+        parser.add_argument('--connections', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=8, help="Threads of the WSGI worker.")
+        parser.add_argument('--db-latency', type=float, default=20.0, help="Milliseconds added to every query.")
+        parser.add_argument('--client-rate', type=int, default=1024, help="KB/s each download client reads.")
+        parser.add_argument('--modes', default='wsgi,asgi')
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        latency = options['db_latency'] / 1000
+
+        def slow(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow)
+
+        try:
+            token = self.seed()
+            if latency:
+                connection_created.connect(add_latency)
+            results = {
+                mode: self.run(mode, token, options)
+                for mode in options['modes'].split(',')
+            }
+        finally:
+            connection_created.disconnect(add_latency)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'meta': {
+                'scenario': options['scenario'],
+                'connections': options['connections'],
+                'wsgi_threads': options['threads'],
+                'db_latency_ms': options['db_latency'],
+                'client_rate_kbps': options['client_rate'],
+                'database': connection.vendor,
+            },
+            'modes': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def seed(self):
+        user = User.objects.create_user(phone_number='09000000004', password='benchmark', username='concurrency')
+        now = timezone.now()
+        CellInfo.objects.bulk_create([
+            CellInfo(
+                phone_number=user, lat=35.7, lng=51.4, timestamp=now - timedelta(minutes=i),
+                gen='4G', tech='LTE', plmn='43211', cid=i, rsrp=-90.0,
+            )
+            for i in range(50)
+        ])
+        return Token.objects.create(user=user).key
+
+    def run(self, mode, token, options):
+        with serve(mode, options['threads'], send_buffer=SEND_BUFFER) as (port, in_flight):
+            started = time.perf_counter()
+            samples = asyncio.run(self.clients(port, token, options))
+            wall = time.perf_counter() - started
+
+        ok = [elapsed for elapsed, status in samples if status == 200]
+        timings = sorted(ok)
+        return {
+            'completed': len(ok),
+            'errors': len(samples) - len(ok),
+            'wall_seconds': round(wall, 3),
+            'requests_per_second': round(len(ok) / wall, 1),
+            'p50_ms': round(percentile(timings, 50) * 1000, 1) if timings else None,
+            'p99_ms': round(percentile(timings, 99) * 1000, 1) if timings else None,
+            'mean_ms': round(statistics.mean(timings) * 1000, 1) if timings else None,
+            'peak_in_flight': in_flight.peak,
+        }
+
+    async def clients(self, port, token, options):
+        path = SCENARIOS[options['scenario']]
+        rate = options['client_rate'] * 1024
+        return await asyncio.gather(*(
+            self.request(port, path(i), token, rate) for i in range(options['connections'])
+        ))
+
+    async def request(self, port, path, token, rate):
+        started = time.perf_counter()
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16384)
+        sock.setblocking(False)
+        try:
+            await asyncio.get_running_loop().sock_connect(sock, ('127.0.0.1', port))
+            reader, writer = await asyncio.open_connection(sock=sock)
+            writer.write((
+                f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Token {token}\r\n'
+                f'Connection: close\r\n\r\n'
+            ).encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            # The client reads at ``rate`` from its first byte on, so a response
+            # that was queued does not catch up by being read faster.
+            first_byte = time.perf_counter()
+            received = 0
+            while True:
+                chunk = await reader.read(16384)
+                if not chunk:
+                    break
+                received += len(chunk)
+                wait = received / rate - (time.perf_counter() - first_byte)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            writer.close()
+            status = int(status_line.split()[1])
+        except (OSError, IndexError, ValueError):
+            status = None
+        return time.perf_counter() - started, status
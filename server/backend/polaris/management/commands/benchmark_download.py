@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from polaris.loadtest import serve
+import json
+import subprocess
+import sys
+import time
+
+# Runs in a separate process so the client does not share the server's GIL.
+# Each thread downloads its share of the requests one after another and
+# discards the body; prints the number of bytes received.
+CLIENT = '''
+import socket, sys, threading
+port, path, requests, parallel = int(sys.argv[1]), sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+received = [0] * parallel
+
+def worker(i, n):
+    view = memoryview(bytearray(1024 * 1024))
+    for _ in range(n):
+        with socket.create_connection(('127.0.0.1', port)) as sock:
+            sock.sendall(f'GET {path} HTTP/1.1\\r\\nHost: 127.0.0.1\\r\\nConnection: close\\r\\n\\r\\n'.encode())
+            while True:
+                count = sock.recv_into(view)
+                if not count:
+                    break
+                received[i] += count
+
+threads = []
+for i in range(parallel):
+    thread = threading.Thread(target=worker, args=(i, requests // parallel + (i < requests % parallel),))
+    threads.append(thread)
+    thread.start()
+for thread in threads:
+    thread.join()
+print(sum(received))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the API from one WSGI worker and from one ASGI (uvicorn) worker, download "
+        "download_test/ over local sockets from a separate client process, and report the "
+        "Gbps the worker sends per second of wall time and per second of its own CPU time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=64 * 1024 * 1024, help="Bytes per request.")
+        parser.add_argument('--requests', type=int, default=16)
+        parser.add_argument('--parallel', type=int, default=4, help="Concurrent connections.")
+        parser.add_argument('--threads', type=int, default=8, help="Threads of the WSGI worker.")
+        parser.add_argument('--modes', default='wsgi,asgi')
+
+    def handle(self, *args, **options):
+        results = {mode: self.run(mode, options) for mode in options['modes'].split(',')}
+        self.stdout.write(json.dumps({
+            'meta': {key: options[key] for key in ('size', 'requests', 'parallel', 'threads')},
+            'modes': results,
+        }, indent=2))
+
+    def run(self, mode, options):
+        path = f"/api/download_test/?size={options['size']}"
+        with serve(mode, options['threads']) as (port, _):
+            # The server runs in this process and the client in another, so this
+            # process's CPU time is what the worker spent sending.
+            cpu, started = time.process_time(), time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, '-c', CLIENT, str(port), path, str(options['requests']), str(options['parallel'])],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            wall, cpu = time.perf_counter() - started, time.process_time() - cpu
+
+        received = int(output)
+        return {
+            'bytes': received,
+            'wall_seconds': round(wall, 3),
+            'server_cpu_seconds': round(cpu, 3),
+            'gbps': round(received * 8 / wall / 1e9, 2),
+            'gbps_per_cpu_second': round(received * 8 / cpu / 1e9, 2) if cpu else None,
+        }
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from api.ingest import bulk_create_with_ids
+from api.listing import CELL_INFO_LISTING, TEST_LISTINGS, dumps
+from api.serializers import CellInfoSerializer, TEST_SERIALIZER_MAP, UnifiedTestSerializer
+from polaris.models import CellInfo, PingTest, Test, User
+import time
+import uuid
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Encode a listing of --rows rows with the DRF serializers and with the values_list() "
+        "read path (records and columnar layouts), inside a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=['cell_info', 'tests'])
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per path; the fastest is reported.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_user(
+                phone_number='09000000003', password='benchmark', username='listing-benchmark',
+            )
+            self.create_rows(user, options['dataset'], options['rows'])
+
+            if options['dataset'] == 'cell_info':
+                query = CellInfo.objects.filter(phone_number=user)
+                paths = [
+                    ('serializer', lambda: CellInfoSerializer(query.select_related('phone_number'), many=True).data),
+                    ('values records', lambda: CELL_INFO_LISTING.records(CELL_INFO_LISTING.values(query))),
+                    ('values columnar', lambda: CELL_INFO_LISTING.rows(CELL_INFO_LISTING.values(query))),
+                ]
+            else:
+                query = Test.objects.filter(phone_number=user)
+                listing = TEST_LISTINGS[None]
+                related = [serializer.Meta.model._meta.model_name for serializer in TEST_SERIALIZER_MAP.values()]
+                paths = [
+                    ('serializer', lambda: UnifiedTestSerializer(query.select_related(*related), many=True).data),
+                    ('values records', lambda: listing.records(listing.values(query))),
+                    ('values columnar', lambda: listing.rows(listing.values(query))),
+                ]
+
+            results = [(name, *self.measure(build, options['repeat'])) for name, build in paths]
+            transaction.set_rollback(True)
+
+        baseline = results[0][1]
+        self.stdout.write(f"{options['dataset']}, {options['rows']} rows (fetch + encode, best of {options['repeat']}):")
+        for name, elapsed, size in results:
+            self.stdout.write(
+                f"  {name:<16} {elapsed * 1000:9.1f} ms  {size / 1e6:7.2f} MB  {baseline / elapsed:5.1f}x"
+            )
+
+    def measure(self, build, repeat):
+        # The serializer path is rendered by DRF's JSONRenderer as the views did;
+        # the read path is encoded with api.listing.dumps.
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = build()
+            body = JSONRenderer().render(data) if hasattr(data, 'serializer') else dumps(data)
+            timings.append(time.perf_counter() - started)
+        return min(timings), len(body)
+
+    def create_rows(self, user, dataset, rows):
+        start = timezone.now() - timedelta(days=1)
+        for offset in range(0, rows, BATCH_SIZE):
+            count = min(BATCH_SIZE, rows - offset)
+            cell_infos = [
+                CellInfo(
+                    uuid=uuid.uuid4(), phone_number=user, lat=35.7 + i * 1e-6, lng=51.4, gen='4G', tech='LTE',
+                    plmn='43211', cid=1000 + i % 50, tac=i % 600, rsrp=-90.0 - i % 30, rsrq=-10.5,
+                    timestamp=start + timedelta(seconds=offset + i),
+                )
+                for i in range(count)
+            ]
+            if dataset == 'cell_info':
+                CellInfo.objects.bulk_create(cell_infos)
+                continue
+            cell_info = bulk_create_with_ids(CellInfo, cell_infos[:1])[0]
+            tests = bulk_create_with_ids(Test, [
+                Test(
+                    uuid=uuid.uuid4(), phone_number=user, cell_info=cell_info, test_type='ping',
+                    timestamp=start + timedelta(seconds=offset + i),
+                )
+                for i in range(count)
+            ])
+            PingTest.objects.bulk_create([PingTest(id=test, latency=20.0 + i % 80) for i, test in enumerate(tests)])
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from polaris.compaction import compacted_before
+from polaris.retention import retention_cutoff
+from polaris.rollups import find_rollup_mismatches
+from utils.time_range import parse_range
+
+
+class Command(BaseCommand):
+    help = "Verify the rollup tables against the raw CellInfo and Test rows they summarize."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--range', help="Only check recent buckets, e.g. '1d' or '2w'.")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['range']:
+            try:
+                since = timezone.now() - parse_range(options['range'])
+            except ValueError as e:
+                raise CommandError(f"Invalid range format: {e}")
+
+        # Expired and compacted periods have rollups but no raw rows left to
+        # compare them with.
+        for cutoff in (retention_cutoff(), compacted_before()):
+            if cutoff is not None and (since is None or since < cutoff):
+                since = cutoff
+
+        problems = find_rollup_mismatches(since)
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f"{len(problems)} rollup mismatches found")
+        self.stdout.write(self.style.SUCCESS("Rollups match the raw data"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from api import cache as response_cache
+from polaris.compaction import compact_measurements
+from polaris.retention import DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Replace raw CellInfo and Test rows older than MEASUREMENT_COMPACTION_DAYS with their hourly rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows deleted per transaction.")
+
+    def handle(self, *args, **options):
+        horizon, tests, cell_infos = compact_measurements(chunk_size=options['chunk_size'])
+        if horizon is None:
+            self.stdout.write("Compaction is disabled (MEASUREMENT_COMPACTION_DAYS is not set)")
+            return
+
+        for namespace in response_cache.NAMESPACES:
+            response_cache.invalidate(namespace)
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted before {horizon:%Y-%m-%d %H:%M}: {tests} tests, {cell_infos} cell infos replaced by rollups"
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from api.ingest import drain_ingest_queue, get_ingest_queue
+import time
+
+
+class Command(BaseCommand):
+    help = "Write measurements queued by /api/enqueue_batch/ to the database in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help="Queue entries claimed per round.")
+        parser.add_argument('--loop', action='store_true', help="Keep draining, polling when the queue is empty.")
+        parser.add_argument('--interval', type=float, default=1, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        while True:
+            handled = drain_ingest_queue(options['batch_size'])
+            if handled:
+                stats = get_ingest_queue().stats()
+                self.stdout.write(f"Drained {handled} entries; {stats['pending']} pending, lag {stats['lag_seconds']}s")
+                continue
+
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from api import cache as response_cache
+from polaris.models import CellInfo, Test
+from polaris.retention import DEFAULT_CHUNK_SIZE, expire_measurements, expired_periods, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = "Delete raw CellInfo and Test rows older than MEASUREMENT_RETENTION_MONTHS, a month at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows deleted per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only list the months that would be expired.")
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff()
+        if cutoff is None:
+            self.stdout.write("Retention is disabled (MEASUREMENT_RETENTION_MONTHS is not set)")
+            return
+
+        if options['dry_run']:
+            for start, end in expired_periods(cutoff):
+                tests = Test.objects.filter(timestamp__gte=start, timestamp__lt=end).count()
+                cell_infos = CellInfo.objects.filter(timestamp__gte=start, timestamp__lt=end).count()
+                if tests or cell_infos:
+                    self.stdout.write(f"Would expire {start:%Y-%m}: {tests} tests, {cell_infos} cell infos")
+            return
+
+        expired = expire_measurements(chunk_size=options['chunk_size'])
+        for start, tests, cell_infos in expired:
+            self.stdout.write(f"{start:%Y-%m}: {tests} tests, {cell_infos} cell infos deleted")
+        if expired:
+            for namespace in response_cache.NAMESPACES:
+                response_cache.invalidate(namespace)
+        self.stdout.write(self.style.SUCCESS(f"Raw measurements before {cutoff:%Y-%m-%d} are expired"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.export import DATASETS, EXPORT_CHUNK_SIZE, FORMATS, parse_bounds, write_export
+import time
+
+
+class Command(BaseCommand):
+    help = "Export CellInfo or Test rows over a time range to a Parquet or Arrow IPC file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument('output', help="Destination file path.")
+        parser.add_argument('--format', choices=list(FORMATS), default='parquet')
+        parser.add_argument('--range', help="Only export recent rows, e.g. '1d' or '4w'.")
+        parser.add_argument('--start', help="ISO 8601 lower bound (inclusive).")
+        parser.add_argument('--end', help="ISO 8601 upper bound (exclusive).")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help="Rows per database read and per row group.")
+
+    def handle(self, *args, **options):
+        try:
+            start, end = parse_bounds(options['range'], options['start'], options['end'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        try:
+            with open(options['output'], 'wb') as sink:
+                rows = write_export(options['dataset'], options['format'], sink, start, end, options['chunk_size'])
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {rows} {options['dataset']} rows to {options['output']} in {elapsed:.1f}s"
+        ))
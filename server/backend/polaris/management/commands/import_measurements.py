@@ -0,0 +1,112 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from api.importer import FORMATS, iter_records, validate_records
+from api.ingest import persist_validated
+from polaris.models import User
+import json
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Load CellInfo records, with optional nested tests, from a CSV or NDJSON file. "
+        "Progress is checkpointed after every batch so an interrupted import can be resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--map', action='append', default=[], metavar='SOURCE=FIELD',
+                            help="Rename an input column onto a CellInfo field, e.g. latitude=lat.")
+        parser.add_argument('--checkpoint', help="Defaults to <path>.checkpoint.")
+        parser.add_argument('--rejects', help="NDJSON file for rejected records. Defaults to <path>.rejects.")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt == 'jsonl':
+            fmt = 'ndjson'
+        if fmt not in FORMATS:
+            raise CommandError(f"Cannot tell the format of {path}; pass --format.")
+        try:
+            mapping = dict(item.split('=', 1) for item in options['map'])
+        except ValueError:
+            raise CommandError("--map takes SOURCE=FIELD")
+
+        checkpoint_path = options['checkpoint'] or f"{path}.checkpoint"
+        rejects_path = options['rejects'] or f"{path}.rejects"
+        state = {'offset': 0, 'line': 0, 'created': 0, 'duplicates': 0, 'rejected': 0}
+        if os.path.exists(checkpoint_path) and not options['restart']:
+            with open(checkpoint_path) as f:
+                state.update(json.load(f))
+            self.stdout.write(f"Resuming {path} at line {state['line']}")
+
+        started = time.monotonic()
+        imported = 0
+        with open(path, 'rb') as handle, open(rejects_path, 'a') as rejects:
+            tracker, records = iter_records(handle, fmt, state['offset'], state['line'], mapping)
+            batch = []
+            for line, record in records:
+                batch.append((line, record))
+                if len(batch) >= options['batch_size']:
+                    imported += self._load(batch, rejects, state)
+                    self._checkpoint(checkpoint_path, state, tracker)
+                    self._progress(state, imported, started)
+                    batch = []
+            if batch:
+                imported += self._load(batch, rejects, state)
+                self._checkpoint(checkpoint_path, state, tracker)
+                self._progress(state, imported, started)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {state['created']} created, {state['duplicates']} duplicates, "
+            f"{state['rejected']} rejected (see {rejects_path})"
+        ))
+
+    def _load(self, batch, rejects, state):
+        valid, errors = validate_records([record for _, record in batch])
+
+        phones = {data['phone_number'] for _, data in valid}
+        users = User.objects.in_bulk(phones, field_name='phone_number') if phones else {}
+        accepted = []
+        for index, data in valid:
+            if data['phone_number'] in users:
+                accepted.append((index, data))
+            else:
+                errors[index] = {'phone_number': ['User with this phone number does not exist.']}
+
+        results = [None] * len(batch)
+        if accepted:
+            try:
+                persist_validated(accepted, users, results)
+            except IntegrityError:
+                # Another writer stored one of the UUIDs first; the retry sees it.
+                persist_validated(accepted, users, results)
+
+        for index, error in sorted(errors.items()):
+            line, record = batch[index]
+            rejects.write(json.dumps({'line': line, 'record': record, 'errors': error}, default=str) + '\n')
+        rejects.flush()
+
+        state['created'] += sum(1 for result in results if result and result['status'] == 'created')
+        state['duplicates'] += sum(1 for result in results if result and result['status'] == 'duplicate')
+        state['rejected'] += len(errors)
+        return len(batch)
+
+    def _checkpoint(self, checkpoint_path, state, tracker):
+        state['offset'], state['line'] = tracker.offset, tracker.line
+        temporary = f"{checkpoint_path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(state, f)
+        os.replace(temporary, checkpoint_path)
+
+    def _progress(self, state, imported, started):
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(
+            f"line {state['line']}: {state['created']} created, {state['duplicates']} duplicates, "
+            f"{state['rejected']} rejected, {rate:.0f} records/s"
+        )
@@ -0,0 +1,69 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from polaris.loadtest import CYCLE_SECONDS, Recorder, create_fleet, run_ingest, run_listing
+from polaris.models import User
+import django
+import json
+import platform
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a synthetic device fleet against add_cell_info/ and add_test/, then read "
+        "get_cell_infos/ and get_tests/, in a throwaway test database. Prints JSON with "
+        "p50/p95/p99 latency, requests per second and queries per request for each endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=50)
+        parser.add_argument('--cycles', type=int, default=20, help="15-second rounds each device uploads.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--listing-requests', type=int, default=20, help="Reads per listing endpoint.")
+        parser.add_argument('--ranges', default='1h,1d', help="Comma-separated range values the reads cycle through.")
+        parser.add_argument('--cached', action='store_true', help="Let listing reads hit the response cache.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def run(self, options):
+        start = timezone.now() - timedelta(seconds=CYCLE_SECONDS * options['cycles'])
+        fleet = create_fleet(options['devices'], start, options['seed'])
+        viewer = User.objects.create_user(phone_number='09000000002', password='benchmark', username='benchmark-viewer')
+        token = Token.objects.create(user=viewer)
+
+        recorder = Recorder()
+        run_ingest(recorder, fleet, options['cycles'])
+        ranges = [value.strip() for value in options['ranges'].split(',') if value.strip()]
+        run_listing(recorder, token.key, options['listing_requests'], ranges, options['cached'])
+
+        return {
+            'meta': {
+                'started_at': start.isoformat(),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'devices': options['devices'],
+                'cycles': options['cycles'],
+                'seed': options['seed'],
+                'listing_requests': options['listing_requests'],
+                'ranges': ranges,
+                'cached': options['cached'],
+            },
+            'endpoints': recorder.report(),
+        }
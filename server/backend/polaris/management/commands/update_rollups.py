@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from polaris.rollups import DEFAULT_BATCH_SIZE, update_cell_info_rollups, update_test_rollups
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold CellInfo and Test rows added since the last run into the hourly rollup and tile rollup tables. "
+        "New rows are folded in on the first run at least ROLLUP_LAG_SECONDS after they were first seen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep running, polling for new rows.")
+        parser.add_argument('--interval', type=float, default=60, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            for name, update in (('cell_info', update_cell_info_rollups), ('test', update_test_rollups)):
+                batches = groups = 0
+                while (touched := update(options['batch_size'])) is not None:
+                    batches += 1
+                    groups += touched
+                if batches:
+                    self.stdout.write(f"{name}: {batches} batches, {groups} rollup groups updated")
+
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:38
+
+from django.db import migrations, models
+
+
+SUBTYPE_ACCESSORS = [
+    ('http_download', 'httpdownloadtest'),
+    ('http_upload', 'httpuploadtest'),
+    ('ping', 'pingtest'),
+    ('dns', 'dnstest'),
+    ('web', 'webtest'),
+    ('sms', 'smstest'),
+]
+
+
+def backfill_test_type(apps, schema_editor):
+    Test = apps.get_model('polaris', 'Test')
+    for test_type, accessor in SUBTYPE_ACCESSORS:
+        Test.objects.filter(**{f'{accessor}__isnull': False}).update(test_type=test_type)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polaris', '0004_alter_cellinfo_afrn_alter_cellinfo_ecno_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='test_type',
+            field=models.CharField(blank=True, choices=[('http_download', 'http_download'), ('http_upload', 'http_upload'), ('ping', 'ping'), ('dns', 'dns'), ('web', 'web'), ('sms', 'sms')], max_length=20, null=True),
+        ),
+        migrations.RunPython(backfill_test_type, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cellinfo',
+            index=models.Index(fields=['timestamp'], name='polaris_cel_timesta_76a341_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cellinfo',
+            index=models.Index(fields=['phone_number', 'timestamp'], name='polaris_cel_phone_n_55e835_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cellinfo',
+            index=models.Index(fields=['plmn', 'gen', 'timestamp'], name='polaris_cel_plmn_d6c063_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['timestamp'], name='polaris_tes_timesta_3da880_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['phone_number', 'timestamp'], name='polaris_tes_phone_n_1962bf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['test_type', 'timestamp'], name='polaris_tes_test_ty_12f3ce_idx'),
+        ),
+    ]
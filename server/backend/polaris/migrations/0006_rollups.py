@@ -0,0 +1,77 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polaris', '0005_test_type_and_measurement_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CellInfoRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('plmn', models.CharField(max_length=20)),
+                ('gen', models.CharField(max_length=20)),
+                ('tech', models.CharField(max_length=50)),
+                ('cid', models.BigIntegerField()),
+                ('samples', models.IntegerField(default=0)),
+                ('rsrp_count', models.IntegerField(default=0)),
+                ('rsrp_sum', models.FloatField(default=0)),
+                ('rsrp_min', models.FloatField(blank=True, null=True)),
+                ('rsrp_max', models.FloatField(blank=True, null=True)),
+                ('rsrq_count', models.IntegerField(default=0)),
+                ('rsrq_sum', models.FloatField(default=0)),
+                ('rsrq_min', models.FloatField(blank=True, null=True)),
+                ('rsrq_max', models.FloatField(blank=True, null=True)),
+                ('rscp_count', models.IntegerField(default=0)),
+                ('rscp_sum', models.FloatField(default=0)),
+                ('rscp_min', models.FloatField(blank=True, null=True)),
+                ('rscp_max', models.FloatField(blank=True, null=True)),
+                ('ecno_count', models.IntegerField(default=0)),
+                ('ecno_sum', models.FloatField(default=0)),
+                ('ecno_min', models.FloatField(blank=True, null=True)),
+                ('ecno_max', models.FloatField(blank=True, null=True)),
+                ('rxlev_count', models.IntegerField(default=0)),
+                ('rxlev_sum', models.FloatField(default=0)),
+                ('rxlev_min', models.FloatField(blank=True, null=True)),
+                ('rxlev_max', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TestRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('test_type', models.CharField(choices=[('http_download', 'http_download'), ('http_upload', 'http_upload'), ('ping', 'ping'), ('dns', 'dns'), ('web', 'web'), ('sms', 'sms')], max_length=20)),
+                ('plmn', models.CharField(blank=True, max_length=20, null=True)),
+                ('gen', models.CharField(blank=True, max_length=20, null=True)),
+                ('tech', models.CharField(blank=True, max_length=50, null=True)),
+                ('cid', models.BigIntegerField(blank=True, null=True)),
+                ('value_count', models.IntegerField(default=0)),
+                ('value_sum', models.FloatField(default=0)),
+                ('value_min', models.FloatField(blank=True, null=True)),
+                ('value_max', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='testrollup',
+            index=models.Index(fields=['test_type', 'bucket'], name='polaris_tes_test_ty_93dbd7_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cellinforollup',
+            constraint=models.UniqueConstraint(fields=('bucket', 'plmn', 'gen', 'tech', 'cid'), name='unique_cellinfo_rollup'),
+        ),
+    ]
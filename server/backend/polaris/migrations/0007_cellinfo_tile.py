@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:41
+
+from django.db import migrations, models
+from utils.geo import quadkey
+
+
+def backfill_tile(apps, schema_editor):
+    CellInfo = apps.get_model('polaris', 'CellInfo')
+    last_id = 0
+    while True:
+        batch = list(CellInfo.objects.filter(id__gt=last_id, tile__isnull=True).only('id', 'lat', 'lng').order_by('id')[:5000])
+        if not batch:
+            return
+        for cell_info in batch:
+            cell_info.tile = quadkey(cell_info.lat, cell_info.lng)
+        CellInfo.objects.bulk_update(batch, ['tile'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polaris', '0006_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cellinfo',
+            name='tile',
+            field=models.CharField(blank=True, max_length=18, null=True),
+        ),
+        migrations.RunPython(backfill_tile, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cellinfo',
+            index=models.Index(fields=['tile', 'timestamp'], name='polaris_cel_tile_60cfb9_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polaris', '0007_cellinfo_tile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True)),
+                ('created', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('processed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
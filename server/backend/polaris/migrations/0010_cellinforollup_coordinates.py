@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:55
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncHour
+
+
+def backfill_coordinates(apps, schema_editor):
+    CellInfo = apps.get_model('polaris', 'CellInfo')
+    CellInfoRollup = apps.get_model('polaris', 'CellInfoRollup')
+    RollupWatermark = apps.get_model('polaris', 'RollupWatermark')
+
+    covered = RollupWatermark.objects.filter(name='cell_info').values_list('last_id', flat=True).first() or 0
+    dimensions = ['bucket', 'plmn', 'gen', 'tech', 'cid']
+    rollups = {row[1:]: row[0] for row in CellInfoRollup.objects.values_list('id', *dimensions).iterator()}
+    groups = (
+        CellInfo.objects.filter(id__lte=covered)
+        .annotate(bucket=TruncHour('timestamp'))
+        .values(*dimensions)
+        .annotate(lat_sum=Sum('lat'), lng_sum=Sum('lng'))
+        .order_by()
+    )
+
+    batch = []
+    for group in groups.iterator():
+        pk = rollups.get(tuple(group[name] for name in dimensions))
+        if pk is not None:
+            batch.append(CellInfoRollup(id=pk, lat_sum=group['lat_sum'], lng_sum=group['lng_sum']))
+        if len(batch) >= 2000:
+            CellInfoRollup.objects.bulk_update(batch, ['lat_sum', 'lng_sum'])
+            batch = []
+    CellInfoRollup.objects.bulk_update(batch, ['lat_sum', 'lng_sum'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polaris', '0009_measurement_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cellinforollup',
+            name='lat_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cellinforollup',
+            name='lng_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polaris', '0010_cellinforollup_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpeedTestSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('timestamp', models.DateTimeField()),
+                ('test_type', models.CharField(choices=[('http_download', 'http_download'), ('http_upload', 'http_upload')], max_length=20)),
+                ('streams', models.PositiveSmallIntegerField()),
+                ('size', models.BigIntegerField()),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cell_info', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='polaris.cellinfo')),
+                ('phone_number', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, to_field='phone_number')),
+                ('test', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='polaris.test')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SpeedTestStream',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('bytes', models.BigIntegerField()),
+                ('started', models.DateTimeField()),
+                ('finished', models.DateTimeField()),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='polaris.speedtestsession')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='speedteststream',
+            constraint=models.UniqueConstraint(fields=('session', 'index'), name='unique_speedtest_stream'),
+        ),
+    ]
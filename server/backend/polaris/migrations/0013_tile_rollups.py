@@ -0,0 +1,128 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:53
+
+from datetime import datetime, timezone as dt_timezone
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Substr, TruncHour
+from utils.geo import quadkey
+
+ZOOMS = range(2, 19, 2)
+METRICS = ['rsrp', 'rsrq', 'rscp', 'ecno', 'rxlev']
+
+
+def _merge(groups, key, values):
+    group = groups.setdefault(key, {})
+    for metric in METRICS:
+        count = values[f'{metric}_count']
+        if not count:
+            continue
+        group[f'{metric}_count'] = group.get(f'{metric}_count', 0) + count
+        group[f'{metric}_sum'] = group.get(f'{metric}_sum', 0) + values[f'{metric}_sum']
+        for name, pick in (('min', min), ('max', max)):
+            current = group.get(f'{metric}_{name}')
+            value = values[f'{metric}_{name}']
+            group[f'{metric}_{name}'] = value if current is None else pick(current, value)
+
+
+def backfill_tiles(apps, schema_editor):
+    CellInfo = apps.get_model('polaris', 'CellInfo')
+    CellInfoRollup = apps.get_model('polaris', 'CellInfoRollup')
+    RollupWatermark = apps.get_model('polaris', 'RollupWatermark')
+    TileRollup = apps.get_model('polaris', 'TileRollup')
+
+    marks = dict(RollupWatermark.objects.values_list('name', 'last_id'))
+    covered = marks.get('cell_info', 0)
+    horizon = datetime.fromtimestamp(marks['compaction'], tz=dt_timezone.utc) if marks.get('compaction') else None
+
+    aggregates = {}
+    for metric in METRICS:
+        aggregates.update({
+            f'{metric}_count': Count(metric), f'{metric}_sum': Sum(metric),
+            f'{metric}_min': Min(metric), f'{metric}_max': Max(metric),
+        })
+    raw = CellInfo.objects.filter(id__lte=covered, tile__isnull=False)
+    if horizon is not None:
+        raw = raw.filter(timestamp__gte=horizon)
+    for zoom in ZOOMS:
+        rows = (
+            raw.annotate(bucket=TruncHour('timestamp'), quadkey=Substr('tile', 1, zoom))
+            .values('bucket', 'quadkey')
+            .annotate(**aggregates)
+            .order_by()
+        )
+        batch = []
+        for row in rows.iterator():
+            for metric in METRICS:
+                row[f'{metric}_sum'] = row[f'{metric}_sum'] or 0
+            batch.append(TileRollup(zoom=zoom, tile=row.pop('quadkey'), **row))
+            if len(batch) >= 2000:
+                TileRollup.objects.bulk_create(batch)
+                batch = []
+        TileRollup.objects.bulk_create(batch)
+
+    if horizon is None:
+        return
+    # Raw rows before the compaction horizon are gone; place each compacted
+    # cell-hour on the tile of its mean position instead.
+    rollups = CellInfoRollup.objects.filter(bucket__lt=horizon, samples__gt=0).order_by('bucket')
+    current, groups = None, {}
+    for rollup in rollups.iterator():
+        if rollup.bucket != current:
+            TileRollup.objects.bulk_create([TileRollup(bucket=current, zoom=zoom, tile=tile, **values)
+                                            for (zoom, tile), values in groups.items()])
+            current, groups = rollup.bucket, {}
+        tile = quadkey(rollup.lat_sum / rollup.samples, rollup.lng_sum / rollup.samples)
+        values = {field: getattr(rollup, field) for metric in METRICS
+                  for field in (f'{metric}_count', f'{metric}_sum', f'{metric}_min', f'{metric}_max')}
+        for zoom in ZOOMS:
+            _merge(groups, (zoom, tile[:zoom]), values)
+    TileRollup.objects.bulk_create([TileRollup(bucket=current, zoom=zoom, tile=tile, **values)
+                                    for (zoom, tile), values in groups.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polaris', '0012_rollup_watermark_lag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TileRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('tile', models.CharField(max_length=18)),
+                ('rsrp_count', models.IntegerField(default=0)),
+                ('rsrp_sum', models.FloatField(default=0)),
+                ('rsrp_min', models.FloatField(blank=True, null=True)),
+                ('rsrp_max', models.FloatField(blank=True, null=True)),
+                ('rsrq_count', models.IntegerField(default=0)),
+                ('rsrq_sum', models.FloatField(default=0)),
+                ('rsrq_min', models.FloatField(blank=True, null=True)),
+                ('rsrq_max', models.FloatField(blank=True, null=True)),
+                ('rscp_count', models.IntegerField(default=0)),
+                ('rscp_sum', models.FloatField(default=0)),
+                ('rscp_min', models.FloatField(blank=True, null=True)),
+                ('rscp_max', models.FloatField(blank=True, null=True)),
+                ('ecno_count', models.IntegerField(default=0)),
+                ('ecno_sum', models.FloatField(default=0)),
+                ('ecno_min', models.FloatField(blank=True, null=True)),
+                ('ecno_max', models.FloatField(blank=True, null=True)),
+                ('rxlev_count', models.IntegerField(default=0)),
+                ('rxlev_sum', models.FloatField(default=0)),
+                ('rxlev_min', models.FloatField(blank=True, null=True)),
+                ('rxlev_max', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tilerollup',
+            index=models.Index(fields=['zoom', 'tile', 'bucket'], name='polaris_til_zoom_b17b42_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tilerollup',
+            constraint=models.UniqueConstraint(fields=('bucket', 'zoom', 'tile'), name='unique_tile_rollup'),
+        ),
+        migrations.RunPython(backfill_tiles, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from utils.geo import quadkey
+import uuid
 
 class User(AbstractUser):
     phone_number = models.CharField(max_length=15, unique=True, blank=False, null=False)
@@ -11,6 +13,7 @@ class User(AbstractUser):
 
 class CellInfo(models.Model):
     id = models.AutoField(primary_key=True)
+    uuid = models.UUIDField(unique=True, null=True, blank=True)
     phone_number = models.ForeignKey(User, on_delete=models.CASCADE, to_field='phone_number')
     lat = models.FloatField()
     lng = models.FloatField()
@@ -30,13 +33,47 @@ class CellInfo(models.Model):
     rscp = models.FloatField(null=True, blank=True)
     ecno = models.FloatField(null=True, blank=True)
     rxlev = models.FloatField(null=True, blank=True)
+    # Quadkey of the map tile at utils.geo.TILE_ZOOM; any prefix of it is the
+    # enclosing tile at a lower zoom level.
+    tile = models.CharField(max_length=18, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp']),
+            models.Index(fields=['phone_number', 'timestamp']),
+            models.Index(fields=['plmn', 'gen', 'timestamp']),
+            models.Index(fields=['tile', 'timestamp']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.tile is None and self.lat is not None and self.lng is not None:
+            self.tile = quadkey(self.lat, self.lng)
+        super().save(*args, **kwargs)
 
 
 class Test(models.Model):
+    TYPE_CHOICES = [
+        ('http_download', 'http_download'),
+        ('http_upload', 'http_upload'),
+        ('ping', 'ping'),
+        ('dns', 'dns'),
+        ('web', 'web'),
+        ('sms', 'sms'),
+    ]
+
     id = models.AutoField(primary_key=True)
+    uuid = models.UUIDField(unique=True, null=True, blank=True)
     phone_number = models.ForeignKey(User, on_delete=models.CASCADE, to_field='phone_number')
     timestamp = models.DateTimeField()
     cell_info = models.ForeignKey(CellInfo, on_delete=models.SET_NULL, null=True)
+    test_type = models.CharField(max_length=20, choices=TYPE_CHOICES, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp']),
+            models.Index(fields=['phone_number', 'timestamp']),
+            models.Index(fields=['test_type', 'timestamp']),
+        ]
 
 
 class HTTPDownloadTest(models.Model):
@@ -67,3 +104,149 @@ class WebTest(models.Model):
 class SMSTest(models.Model):
     id = models.OneToOneField(Test, on_delete=models.CASCADE, primary_key=True)
     send_time = models.FloatField()
+
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    # Highest id seen when the rollups last caught up, and when. Rows up to it
+    # are rolled up once ROLLUP_LAG_SECONDS have passed (see polaris/rollups.py).
+    seen_id = models.BigIntegerField(default=0)
+    seen_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class CellInfoRollup(models.Model):
+    bucket = models.DateTimeField()
+    plmn = models.CharField(max_length=20)
+    gen = models.CharField(max_length=20)
+    tech = models.CharField(max_length=50)
+    cid = models.BigIntegerField()
+    samples = models.IntegerField(default=0)
+    # Coordinate sums, so that compacted hours can still be placed on a map.
+    lat_sum = models.FloatField(default=0)
+    lng_sum = models.FloatField(default=0)
+    rsrp_count = models.IntegerField(default=0)
+    rsrp_sum = models.FloatField(default=0)
+    rsrp_min = models.FloatField(null=True, blank=True)
+    rsrp_max = models.FloatField(null=True, blank=True)
+    rsrq_count = models.IntegerField(default=0)
+    rsrq_sum = models.FloatField(default=0)
+    rsrq_min = models.FloatField(null=True, blank=True)
+    rsrq_max = models.FloatField(null=True, blank=True)
+    rscp_count = models.IntegerField(default=0)
+    rscp_sum = models.FloatField(default=0)
+    rscp_min = models.FloatField(null=True, blank=True)
+    rscp_max = models.FloatField(null=True, blank=True)
+    ecno_count = models.IntegerField(default=0)
+    ecno_sum = models.FloatField(default=0)
+    ecno_min = models.FloatField(null=True, blank=True)
+    ecno_max = models.FloatField(null=True, blank=True)
+    rxlev_count = models.IntegerField(default=0)
+    rxlev_sum = models.FloatField(default=0)
+    rxlev_min = models.FloatField(null=True, blank=True)
+    rxlev_max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'plmn', 'gen', 'tech', 'cid'], name='unique_cellinfo_rollup'),
+        ]
+
+
+class TestRollup(models.Model):
+    bucket = models.DateTimeField()
+    test_type = models.CharField(max_length=20, choices=Test.TYPE_CHOICES)
+    # Copied from the test's cell info; null for tests recorded without one.
+    plmn = models.CharField(max_length=20, null=True, blank=True)
+    gen = models.CharField(max_length=20, null=True, blank=True)
+    tech = models.CharField(max_length=50, null=True, blank=True)
+    cid = models.BigIntegerField(null=True, blank=True)
+    value_count = models.IntegerField(default=0)
+    value_sum = models.FloatField(default=0)
+    value_min = models.FloatField(null=True, blank=True)
+    value_max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['test_type', 'bucket']),
+        ]
+
+
+class TileRollup(models.Model):
+    # Hourly CellInfo statistics per map tile, kept at every zoom level in
+    # polaris.rollups.TILE_ROLLUP_ZOOMS so the heatmap never reads raw rows
+    # of rolled up hours.
+    bucket = models.DateTimeField()
+    zoom = models.PositiveSmallIntegerField()
+    tile = models.CharField(max_length=18)
+    rsrp_count = models.IntegerField(default=0)
+    rsrp_sum = models.FloatField(default=0)
+    rsrp_min = models.FloatField(null=True, blank=True)
+    rsrp_max = models.FloatField(null=True, blank=True)
+    rsrq_count = models.IntegerField(default=0)
+    rsrq_sum = models.FloatField(default=0)
+    rsrq_min = models.FloatField(null=True, blank=True)
+    rsrq_max = models.FloatField(null=True, blank=True)
+    rscp_count = models.IntegerField(default=0)
+    rscp_sum = models.FloatField(default=0)
+    rscp_min = models.FloatField(null=True, blank=True)
+    rscp_max = models.FloatField(null=True, blank=True)
+    ecno_count = models.IntegerField(default=0)
+    ecno_sum = models.FloatField(default=0)
+    ecno_min = models.FloatField(null=True, blank=True)
+    ecno_max = models.FloatField(null=True, blank=True)
+    rxlev_count = models.IntegerField(default=0)
+    rxlev_sum = models.FloatField(default=0)
+    rxlev_min = models.FloatField(null=True, blank=True)
+    rxlev_max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'zoom', 'tile'], name='unique_tile_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['zoom', 'tile', 'bucket']),
+        ]
+
+
+class IngestReceipt(models.Model):
+    # One row per drained ingest queue entry, written in the same transaction
+    # as its measurements so that redelivered entries are skipped.
+    key = models.CharField(max_length=32, unique=True)
+    created = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+
+class SpeedTestSession(models.Model):
+    # A download or upload test run as several parallel streams. The server
+    # records each stream and writes the Test itself once all have reported.
+    TYPE_CHOICES = [
+        ('http_download', 'http_download'),
+        ('http_upload', 'http_upload'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    phone_number = models.ForeignKey(User, on_delete=models.CASCADE, to_field='phone_number')
+    timestamp = models.DateTimeField()
+    cell_info = models.ForeignKey(CellInfo, on_delete=models.SET_NULL, null=True)
+    test_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    streams = models.PositiveSmallIntegerField()
+    # Bytes per download stream and the time limit of each; unused for uploads.
+    size = models.BigIntegerField()
+    duration = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    test = models.OneToOneField(Test, on_delete=models.SET_NULL, null=True, blank=True)
+
+
+class SpeedTestStream(models.Model):
+    session = models.ForeignKey(SpeedTestSession, on_delete=models.CASCADE, related_name='results')
+    index = models.PositiveSmallIntegerField()
+    bytes = models.BigIntegerField()
+    started = models.DateTimeField()
+    finished = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='unique_speedtest_stream'),
+        ]
@@ -0,0 +1,119 @@
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from .models import CellInfo, Test
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def month_start(value):
+    return value.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value):
+    return value.replace(year=value.year + 1, month=1) if value.month == 12 else value.replace(month=value.month + 1)
+
+
+def retention_cutoff(now=None):
+    """Start of the oldest month still retained, or None when retention is disabled."""
+    months = getattr(settings, 'MEASUREMENT_RETENTION_MONTHS', None)
+    if not months:
+        return None
+    current = month_start(now or timezone.now())
+    index = current.year * 12 + current.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def expired_periods(cutoff):
+    """The [start, end) months wholly before ``cutoff`` that still hold rows, oldest first."""
+    oldest = [
+        value for value in (
+            CellInfo.objects.aggregate(oldest=Min('timestamp'))['oldest'],
+            Test.objects.aggregate(oldest=Min('timestamp'))['oldest'],
+        ) if value is not None
+    ]
+    if not oldest:
+        return []
+
+    periods = []
+    start = month_start(min(oldest))
+    while start < cutoff:
+        periods.append((start, next_month(start)))
+        start = next_month(start)
+    return periods
+
+
+def _delete_ids(model, ids):
+    # delete() applies every on_delete rule: subtype rows are deleted and
+    # references from newer rows set to NULL, each in one statement per chunk.
+    # only('id') keeps the collector from loading more than the primary keys.
+    _, deleted = model.objects.filter(id__in=ids).only('id').delete()
+    return deleted.get(model._meta.label, 0)
+
+
+def _period(query, start, end, max_id):
+    query = query.filter(timestamp__lt=end)
+    if start is not None:
+        query = query.filter(timestamp__gte=start)
+    if max_id is not None:
+        query = query.filter(id__lte=max_id)
+    return query
+
+
+def purge_tests(start, end, chunk_size=DEFAULT_CHUNK_SIZE, max_id=None):
+    """
+    Delete the tests timestamped in [start, end), with their subtype rows.
+    A None start is unbounded; ``max_id`` limits the purge to ids up to it.
+    """
+    deleted = 0
+    while True:
+        ids = list(
+            _period(Test.objects.all(), start, end, max_id)
+            .order_by('timestamp').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += _delete_ids(Test, ids)
+
+
+def purge_cell_infos(start, end, chunk_size=DEFAULT_CHUNK_SIZE, max_id=None):
+    """Delete the cell infos timestamped in [start, end); arguments as for purge_tests."""
+    deleted = 0
+    while True:
+        ids = list(
+            _period(CellInfo.objects.all(), start, end, max_id)
+            .order_by('timestamp').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        # Tests are expired by their own timestamp; a newer test pointing at an
+        # expiring cell info keeps its row, with cell_info set to NULL.
+        with transaction.atomic():
+            deleted += _delete_ids(CellInfo, ids)
+
+
+def expire_measurements(now=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Delete raw CellInfo and Test rows of every month older than the retention
+    window, one month and one chunk at a time. Hourly rollups are kept.
+
+    Returns ``[(month_start, tests_deleted, cell_infos_deleted)]``.
+    """
+    cutoff = retention_cutoff(now)
+    if cutoff is None:
+        return []
+
+    expired = []
+    for start, end in expired_periods(cutoff):
+        tests = purge_tests(start, end, chunk_size)
+        cell_infos = purge_cell_infos(start, end, chunk_size)
+        if tests or cell_infos:
+            logger.info(f"Expired {start:%Y-%m}: {tests} tests, {cell_infos} cell infos")
+            expired.append((start, tests, cell_infos))
+    return expired
@@ -0,0 +1,276 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Substr, TruncHour
+from django.utils import timezone
+from utils.geo import TILE_ZOOM
+from .models import CellInfo, CellInfoRollup, RollupWatermark, Test, TestRollup, TileRollup
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+CELL_INFO_METRICS = ['rsrp', 'rsrq', 'rscp', 'ecno', 'rxlev']
+
+CELL_INFO_COUNTERS = ['samples', 'lat_sum', 'lng_sum']
+
+TEST_VALUE_FIELDS = {
+    'http_download': 'httpdownloadtest__throughput',
+    'http_upload': 'httpuploadtest__throughput',
+    'ping': 'pingtest__latency',
+    'dns': 'dnstest__time',
+    'web': 'webtest__response_time',
+    'sms': 'smstest__send_time',
+}
+
+ROLLUP_DIMENSIONS = ['plmn', 'gen', 'tech', 'cid']
+
+# Zoom levels of the tile rollups. A heatmap at zoom z reads the next level at
+# or above z, so each of its tiles sums at most four rollup rows per hour.
+TILE_ROLLUP_ZOOMS = list(range(2, TILE_ZOOM + 1, 2))
+
+DEFAULT_BATCH_SIZE = 50000
+
+DEFAULT_LAG_SECONDS = 60
+
+
+def _merge_min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _merge_max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _stat_aggregates(field, prefix):
+    return {
+        f'{prefix}_count': Count(field),
+        f'{prefix}_sum': Sum(field),
+        f'{prefix}_min': Min(field),
+        f'{prefix}_max': Max(field),
+    }
+
+
+def cell_info_groups(query):
+    """Aggregate CellInfo rows into rollup-shaped dicts, one per hour and cell."""
+    aggregates = {'samples': Count('id'), 'lat_sum': Sum('lat'), 'lng_sum': Sum('lng')}
+    for metric in CELL_INFO_METRICS:
+        aggregates.update(_stat_aggregates(metric, metric))
+    return (
+        query.annotate(bucket=TruncHour('timestamp'))
+        .values('bucket', *ROLLUP_DIMENSIONS)
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+
+def tile_groups(query):
+    """Aggregate CellInfo rows into rollup-shaped dicts, one per hour and tile at each TILE_ROLLUP_ZOOMS level."""
+    aggregates = {}
+    for metric in CELL_INFO_METRICS:
+        aggregates.update(_stat_aggregates(metric, metric))
+    for zoom in TILE_ROLLUP_ZOOMS:
+        rows = (
+            query.filter(tile__isnull=False)
+            .annotate(bucket=TruncHour('timestamp'), quadkey=Substr('tile', 1, zoom))
+            .values('bucket', 'quadkey')
+            .annotate(**aggregates)
+            .order_by()
+        )
+        for row in rows:
+            row['tile'] = row.pop('quadkey')
+            row['zoom'] = zoom
+            yield row
+
+
+def test_groups(query, test_type):
+    """Aggregate Test rows of one type into rollup-shaped dicts, one per hour and cell."""
+    paths = {f'cell_info__{name}': name for name in ROLLUP_DIMENSIONS}
+    rows = (
+        query.filter(test_type=test_type, **{f'{TEST_VALUE_FIELDS[test_type]}__isnull': False})
+        .annotate(bucket=TruncHour('timestamp'))
+        .values('bucket', *paths)
+        .annotate(**_stat_aggregates(TEST_VALUE_FIELDS[test_type], 'value'))
+        .order_by()
+    )
+    for row in rows:
+        for path, name in paths.items():
+            row[name] = row.pop(path)
+        row['test_type'] = test_type
+        yield row
+
+
+def _merge_into(model, key_fields, groups, prefixes, counters=()):
+    groups = list(groups)
+    if not groups:
+        return 0
+
+    existing = {}
+    candidates = model.objects.filter(bucket__in={group['bucket'] for group in groups})
+    for rollup in candidates:
+        existing[tuple(getattr(rollup, name) for name in key_fields)] = rollup
+
+    created, updated = [], {}
+    for group in groups:
+        key = tuple(group[name] for name in key_fields)
+        rollup = existing.get(key)
+        if rollup is None:
+            rollup = model(**{name: group[name] for name in key_fields})
+            existing[key] = rollup
+            created.append(rollup)
+        elif rollup.pk is not None:
+            updated[key] = rollup
+
+        for name in counters:
+            setattr(rollup, name, getattr(rollup, name) + group[name])
+        for prefix in prefixes:
+            setattr(rollup, f'{prefix}_count', getattr(rollup, f'{prefix}_count') + group[f'{prefix}_count'])
+            setattr(rollup, f'{prefix}_sum', getattr(rollup, f'{prefix}_sum') + (group[f'{prefix}_sum'] or 0))
+            setattr(rollup, f'{prefix}_min', _merge_min(getattr(rollup, f'{prefix}_min'), group[f'{prefix}_min']))
+            setattr(rollup, f'{prefix}_max', _merge_max(getattr(rollup, f'{prefix}_max'), group[f'{prefix}_max']))
+
+    model.objects.bulk_create(created)
+    if updated:
+        fields = list(counters)
+        for prefix in prefixes:
+            fields += [f'{prefix}_count', f'{prefix}_sum', f'{prefix}_min', f'{prefix}_max']
+        model.objects.bulk_update(list(updated.values()), fields)
+    return len(groups)
+
+
+def _ceiling(watermark, model):
+    # Ids are allocated at INSERT but become visible at COMMIT, so a row may
+    # appear below ids the watermark has already passed. Rows are therefore
+    # only rolled up to the highest id seen at least ROLLUP_LAG_SECONDS ago,
+    # by which time every transaction that held a lower id has committed.
+    lag = getattr(settings, 'ROLLUP_LAG_SECONDS', DEFAULT_LAG_SECONDS)
+    if not lag:
+        return None
+    now = timezone.now()
+    settled = watermark.seen_at is not None and now - watermark.seen_at >= timedelta(seconds=lag)
+    if watermark.seen_at is not None and not settled:
+        return watermark.last_id
+    if watermark.last_id < watermark.seen_id:
+        return watermark.seen_id
+    # Caught up with the last observation; start the next one.
+    watermark.seen_id = model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    watermark.seen_at = now
+    watermark.save()
+    return watermark.last_id
+
+
+def _advance(name, model, batch_size, apply):
+    # Returns the number of rollup groups touched, or None once caught up.
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=name)
+        ceiling = _ceiling(watermark, model)
+        pending = model.objects.filter(id__gt=watermark.last_id)
+        if ceiling is not None:
+            pending = pending.filter(id__lte=ceiling)
+        upper = pending.order_by('id').values_list('id', flat=True)
+        upper = upper[batch_size - 1:batch_size].first() or upper.last()
+        if upper is None:
+            if ceiling is None or watermark.last_id >= ceiling:
+                return None
+            # The rest of the rows up to the ceiling were deleted unseen.
+            upper = ceiling
+
+        groups = apply(model.objects.filter(id__gt=watermark.last_id, id__lte=upper))
+        logger.info(f"Rolled up {name} rows {watermark.last_id + 1}..{upper} into {groups} groups")
+
+        watermark.last_id = upper
+        watermark.save()
+        return groups
+
+
+def update_cell_info_rollups(batch_size=DEFAULT_BATCH_SIZE):
+    def apply(query):
+        _merge_into(TileRollup, ['bucket', 'zoom', 'tile'], tile_groups(query), CELL_INFO_METRICS)
+        return _merge_into(
+            CellInfoRollup, ['bucket', *ROLLUP_DIMENSIONS], cell_info_groups(query),
+            CELL_INFO_METRICS, counters=CELL_INFO_COUNTERS,
+        )
+    return _advance('cell_info', CellInfo, batch_size, apply)
+
+
+def update_test_rollups(batch_size=DEFAULT_BATCH_SIZE):
+    def apply(query):
+        return sum(
+            _merge_into(TestRollup, ['bucket', 'test_type', *ROLLUP_DIMENSIONS], test_groups(query, test_type), ['value'])
+            for test_type in TEST_VALUE_FIELDS
+        )
+    return _advance('test', Test, batch_size, apply)
+
+
+def watermark(name):
+    return RollupWatermark.objects.filter(name=name).values_list('last_id', flat=True).first() or 0
+
+
+def _compare(label, key, expected, actual, fields):
+    problems = []
+    key = ', '.join(value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in key)
+    for field in fields:
+        want = expected.get(field) if expected else None
+        have = getattr(actual, field) if actual else None
+        if field.endswith('_sum') or field.endswith('_count') or field == 'samples':
+            want, have = want or 0, have or 0
+        if want is None or have is None:
+            if want != have:
+                problems.append(f"{label} ({key}): {field} expected {want}, found {have}")
+        elif not math.isclose(want, have, rel_tol=1e-9, abs_tol=1e-6):
+            problems.append(f"{label} ({key}): {field} expected {want}, found {have}")
+    return problems
+
+
+def find_rollup_mismatches(since=None):
+    """
+    Recompute the rollups from the raw rows below each watermark and list every
+    group whose stored counts, sums or extremes disagree.
+    """
+    problems = []
+    if since is not None:
+        since = since.replace(minute=0, second=0, microsecond=0)
+
+    cell_infos = CellInfo.objects.filter(id__lte=watermark('cell_info'))
+    rollups = CellInfoRollup.objects.all()
+    if since is not None:
+        cell_infos = cell_infos.filter(timestamp__gte=since)
+        rollups = rollups.filter(bucket__gte=since)
+
+    key_fields = ['bucket', *ROLLUP_DIMENSIONS]
+    fields = list(CELL_INFO_COUNTERS)
+    for metric in CELL_INFO_METRICS:
+        fields += [f'{metric}_count', f'{metric}_sum', f'{metric}_min', f'{metric}_max']
+    expected = {tuple(group[name] for name in key_fields): group for group in cell_info_groups(cell_infos)}
+    actual = {tuple(getattr(rollup, name) for name in key_fields): rollup for rollup in rollups}
+    for key in expected.keys() | actual.keys():
+        problems += _compare('cell_info', key, expected.get(key), actual.get(key), fields)
+
+    key_fields = ['bucket', 'zoom', 'tile']
+    fields = fields[len(CELL_INFO_COUNTERS):]
+    rollups = TileRollup.objects.all()
+    if since is not None:
+        rollups = rollups.filter(bucket__gte=since)
+    expected = {tuple(group[name] for name in key_fields): group for group in tile_groups(cell_infos)}
+    actual = {tuple(getattr(rollup, name) for name in key_fields): rollup for rollup in rollups}
+    for key in expected.keys() | actual.keys():
+        problems += _compare('tile', key, expected.get(key), actual.get(key), fields)
+
+    tests = Test.objects.filter(id__lte=watermark('test'))
+    rollups = TestRollup.objects.all()
+    if since is not None:
+        tests = tests.filter(timestamp__gte=since)
+        rollups = rollups.filter(bucket__gte=since)
+
+    key_fields = ['bucket', 'test_type', *ROLLUP_DIMENSIONS]
+    fields = ['value_count', 'value_sum', 'value_min', 'value_max']
+    expected = {}
+    for test_type in TEST_VALUE_FIELDS:
+        for group in test_groups(tests, test_type):
+            expected[tuple(group[name] for name in key_fields)] = group
+    actual = {tuple(getattr(rollup, name) for name in key_fields): rollup for rollup in rollups}
+    for key in expected.keys() | actual.keys():
+        problems += _compare('test', key, expected.get(key), actual.get(key), fields)
+
+    return problems
@@ -1,3 +1,1279 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from importlib.util import find_spec
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from api import cache as response_cache, compression, instrumentation, lookups
+from api.aggregation import EpochBucket, bucket_start, can_use_rollups
+from api.export import write_export
+from api.ingest import drain_ingest_queue, ingest_batch
+from api.pagination import encode_cursor
+from api.serializers import TEST_SERIALIZER_MAP
+from api.speedtest import UPLOAD_SCOPE_KEY, Echo, UploadSink, WSGIEcho
+from polaris.compaction import compacted_before, compaction_target
+from polaris.management.commands.import_measurements import Command as ImportCommand
+from polaris.retention import purge_tests, retention_cutoff
+from polaris.models import *
+from polaris.rollups import update_cell_info_rollups, update_test_rollups, watermark
+from utils.durable_queue import DurableQueue
+from utils.geo import TILE_ZOOM, covering_quadkeys, quadkey, quadkey_to_xy, xy_to_quadkey
+import gzip
+import json
+import os
+import tempfile
+import time
+import uuid
 
-# Create your tests here.
+
+TEST_DETAILS = {
+    'http_download': {'throughput': 12.5},
+    'http_upload': {'throughput': 3.5},
+    'ping': {'latency': 40.0},
+    'dns': {'time': 15.0},
+    'web': {'response_time': 250.0},
+    'sms': {'send_time': 1.2},
+}
+
+
+class GetTestsQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Warm the cached compaction horizon, read once per process in practice.
+        compacted_before()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.cell_info = CellInfo.objects.create(
+            phone_number=self.user, lat=35.7, lng=51.4, timestamp=timezone.now(),
+            gen='4G', tech='LTE', plmn='43211', cid=1234,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_tests(self, count):
+        types = list(TEST_SERIALIZER_MAP)
+        for i in range(count):
+            type_ = types[i % len(types)]
+            test = Test.objects.create(
+                phone_number=self.user,
+                timestamp=timezone.now() - timedelta(minutes=i),
+                cell_info=self.cell_info,
+                test_type=type_,
+            )
+            TEST_SERIALIZER_MAP[type_].Meta.model.objects.create(id=test, **TEST_DETAILS[type_])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for count in (1, 30):
+            Test.objects.all().delete()
+            response_cache.invalidate('tests')
+            self.create_tests(count)
+
+            # One COUNT(*) and one SELECT joining every subtype table.
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/get_tests/')
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), count)
+
+    def test_results_resolve_type_and_detail(self):
+        self.create_tests(len(TEST_SERIALIZER_MAP))
+
+        results = self.client.get('/api/get_tests/').json()['results']
+
+        self.assertEqual({result['type_'] for result in results}, set(TEST_SERIALIZER_MAP))
+        for result in results:
+            self.assertEqual(result['phone_number'], self.user.phone_number)
+            for field, value in TEST_DETAILS[result['type_']].items():
+                self.assertEqual(result['detail'][field], value)
+
+    def test_type_filter_uses_discriminator(self):
+        self.create_tests(len(TEST_SERIALIZER_MAP) * 2)
+
+        with self.assertNumQueries(2):
+            results = self.client.get('/api/get_tests/', {'type': 'ping'}).json()['results']
+
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(result['type_'] == 'ping' for result in results))
+
+    def test_columnar_layout_matches_records(self):
+        self.create_tests(len(TEST_SERIALIZER_MAP))
+
+        records = self.client.get('/api/get_tests/').json()
+        columnar = self.client.get('/api/get_tests/', {'layout': 'columnar'}).json()
+
+        self.assertEqual(columnar['count'], records['count'])
+        rows = [dict(zip(columnar['fields'], row)) for row in columnar['results']]
+        self.assertEqual(rows, records['results'])
+        self.assertEqual(self.client.get('/api/get_tests/', {'layout': 'xml'}).status_code, 400)
+
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        # Pairs of rows share a timestamp, so pages must break ties on id.
+        for i in range(7):
+            CellInfo.objects.create(
+                phone_number=self.user, lat=35.7, lng=51.4, timestamp=now - timedelta(minutes=i // 2),
+                gen='4G', tech='LTE', plmn='43211', cid=i,
+            )
+
+    def test_cursor_walks_every_row_once_in_order(self):
+        listing = self.client.get('/api/get_cell_infos/').json()['results']
+
+        pages, cursor = [], None
+        while True:
+            page = self.client.get('/api/get_cell_infos/', {'page_size': 3, 'cursor': cursor or ''}).json()
+            pages.append([record['id'] for record in page['results']])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), [pk for _, pk in sorted((record['timestamp'], record['id']) for record in listing)])
+
+    def test_last_full_page_has_no_cursor(self):
+        page = self.client.get('/api/get_cell_infos/', {'page_size': 7}).json()
+
+        self.assertEqual((len(page['results']), page['next_cursor']), (7, None))
+
+    def test_stream_matches_the_listing(self):
+        listing = self.client.get('/api/get_cell_infos/').json()
+
+        response = self.client.get('/api/get_cell_infos/', {'stream': 1})
+        streamed = json.loads(b''.join(response.streaming_content))
+
+        keyset = sorted(listing['results'], key=lambda record: (record['timestamp'], record['id']))
+        self.assertEqual(streamed['results'], keyset)
+        self.assertNotIn('count', streamed)
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ('not-a-cursor', encode_cursor(timezone.now(), 1)[:-4]):
+            response = self.client.get('/api/get_cell_infos/', {'cursor': cursor})
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+class AddTestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        lookups.clear()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.cell_info = CellInfo.objects.create(
+            phone_number=self.user, lat=35.7, lng=51.4, timestamp=timezone.now(),
+            gen='4G', tech='LTE', plmn='43211', cid=1234,
+        )
+        self.client = APIClient()
+
+    def post_test(self, **overrides):
+        payload = {
+            'type_': 'ping', 'phone_number': self.user.phone_number, 'cell_info': self.cell_info.id,
+            'timestamp': timezone.now().isoformat(), 'detail': {'latency': 40.0},
+        }
+        payload.update(overrides)
+        return self.client.post('/api/add_test/', payload, format='json')
+
+    def test_warm_lookups_leave_only_the_inserts(self):
+        self.assertEqual(self.post_test().status_code, 201)
+
+        # The Test and PingTest inserts, plus SAVEPOINT/RELEASE because the
+        # test case already runs inside a transaction.
+        with self.assertNumQueries(4):
+            response = self.post_test()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['detail']['latency'], 40.0)
+
+    def test_invalid_detail_writes_nothing(self):
+        response = self.post_test(detail={'latency': 'fast'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Test.objects.exists())
+
+    def test_unknown_cell_info_is_rejected(self):
+        response = self.post_test(cell_info=self.cell_info.id + 1)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Test.objects.exists())
+
+
+
+    def test_repeated_uuid_returns_the_stored_test(self):
+        test_uuid = str(uuid.uuid4())
+        first = self.post_test(uuid=test_uuid)
+        cached = self.post_test(uuid=test_uuid)
+        cache.clear()
+        indexed = self.post_test(uuid=test_uuid)
+
+        self.assertEqual([first.status_code, cached.status_code, indexed.status_code], [201, 200, 200])
+        self.assertEqual({cached.json()['id'], indexed.json()['id']}, {first.json()['id']})
+        self.assertEqual(Test.objects.count(), 1)
+
+    def test_repeated_uuid_returns_the_stored_cell_info(self):
+        payload = {
+            'phone_number': self.user.phone_number, 'lat': 35.7, 'lng': 51.4, 'timestamp': timezone.now().isoformat(),
+            'gen': '4G', 'tech': 'LTE', 'plmn': '43211', 'cid': 1234, 'uuid': str(uuid.uuid4()),
+        }
+        first = self.client.post('/api/add_cell_info/', payload, format='json')
+        cached = self.client.post('/api/add_cell_info/', payload, format='json')
+        cache.clear()
+        indexed = self.client.post('/api/add_cell_info/', payload, format='json')
+
+        self.assertEqual([first.status_code, cached.status_code, indexed.status_code], [201, 200, 200])
+        self.assertEqual({cached.json()['id'], indexed.json()['id']}, {first.json()['id']})
+        self.assertEqual(CellInfo.objects.filter(uuid=payload['uuid']).count(), 1)
+
+    def test_cell_info_deleted_after_it_was_cached_is_rejected(self):
+        missing = self.cell_info.id + 1
+        lookups.remember_cell_infos([missing])
+
+        # SQLite defers the foreign key check to COMMIT; MySQL fails the INSERT.
+        with patch('api.views.Test.objects.create', side_effect=IntegrityError('FOREIGN KEY constraint failed')):
+            response = self.post_test(cell_info=missing)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'CellInfo not found with given ID'})
+        self.assertEqual(self.post_test(cell_info=missing).status_code, 400)
+        self.assertFalse(Test.objects.exists())
+
+class BatchIngestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.client = APIClient()
+
+    def cell_info(self, uuid=None, tests=()):
+        record = {
+            'phone_number': self.user.phone_number, 'lat': 35.7, 'lng': 51.4, 'timestamp': timezone.now().isoformat(),
+            'gen': '4G', 'tech': 'LTE', 'plmn': '43211', 'cid': 1234, 'tests': list(tests),
+        }
+        if uuid:
+            record['uuid'] = str(uuid)
+        return record
+
+    def ping(self, uuid=None):
+        test = {'type_': 'ping', 'timestamp': timezone.now().isoformat(), 'detail': {'latency': 40.0}}
+        if uuid:
+            test['uuid'] = str(uuid)
+        return test
+
+    def test_items_are_reported_in_input_order(self):
+        cell_uuid = uuid.uuid4()
+        items = [
+            self.cell_info(cell_uuid, [self.ping(), self.ping()]),
+            self.cell_info(cell_uuid),
+            {'lat': 'north'},
+            {**self.cell_info(), 'phone_number': '09990000000'},
+        ]
+
+        results = ingest_batch(items)
+
+        self.assertEqual([result['status'] for result in results], ['created', 'duplicate', 'rejected', 'rejected'])
+        self.assertEqual(results[1]['id'], results[0]['id'])
+        self.assertEqual(len(results[0]['tests']), 2)
+        self.assertEqual(ingest_batch(items[:1])[0]['status'], 'duplicate')
+        self.assertEqual((CellInfo.objects.count(), PingTest.objects.count()), (1, 2))
+
+    def test_repeated_test_uuid_in_one_batch_is_stored_once(self):
+        test_uuid = uuid.uuid4()
+
+        response = self.client.post('/api/add_batch/', [
+            self.cell_info(tests=[self.ping(test_uuid)]),
+            self.cell_info(tests=[self.ping(test_uuid), self.ping()]),
+        ], format='json')
+
+        self.assertEqual(response.status_code, 201)
+        first, second = response.json()['results']
+        stored = Test.objects.get(uuid=test_uuid)
+        self.assertEqual(first['tests'], [stored.id])
+        self.assertEqual((len(second['tests']), stored.id in second['tests']), (2, True))
+        self.assertEqual(PingTest.objects.count(), 2)
+
+    def test_uuid_stored_by_a_concurrent_batch_is_a_duplicate(self):
+        cell_uuid = uuid.uuid4()
+        stored = CellInfo.objects.create(
+            phone_number=self.user, uuid=cell_uuid, lat=35.7, lng=51.4, timestamp=timezone.now(),
+            gen='4G', tech='LTE', plmn='43211', cid=1234,
+        )
+
+        # The first attempt misses the row, as if it was committed meanwhile.
+        with patch('api.dedupe.known_ids', side_effect=[{}, {}, {cell_uuid: stored.id}, {}]):
+            results = ingest_batch([self.cell_info(cell_uuid), self.cell_info()])
+
+        self.assertEqual([result['status'] for result in results], ['duplicate', 'created'])
+        self.assertEqual(results[0]['id'], stored.id)
+
+
+class IngestQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.queue = DurableQueue(os.path.join(directory.name, 'queue.sqlite3'), lease_seconds=60, max_attempts=2)
+        patcher = patch('api.ingest.get_ingest_queue', return_value=self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cell_info(self, **overrides):
+        return {
+            'phone_number': self.user.phone_number, 'lat': 35.7, 'lng': 51.4, 'timestamp': timezone.now().isoformat(),
+            'gen': '4G', 'tech': 'LTE', 'plmn': '43211', 'cid': 1234, **overrides,
+        }
+
+    def later(self, seconds):
+        return patch('utils.durable_queue.time.time', return_value=time.time() + seconds)
+
+    def test_unacknowledged_entries_are_redelivered_after_the_lease(self):
+        key = self.queue.put(['payload'])
+
+        self.assertEqual(self.queue.claim(10), [(1, key, ['payload'])])
+        self.assertEqual(self.queue.claim(10), [])
+        self.assertEqual(self.queue.stats()['in_flight'], 1)
+        with self.later(61):
+            self.assertEqual(self.queue.claim(10), [(1, key, ['payload'])])
+
+    def test_redelivered_entry_is_written_once(self):
+        response = self.client.post('/api/enqueue_batch/', [self.cell_info(), self.cell_info()], content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+
+        # The worker dies after committing, before acknowledging the entry.
+        with patch.object(self.queue, 'ack'):
+            self.assertEqual(drain_ingest_queue(), 1)
+        with self.later(61):
+            self.assertEqual(drain_ingest_queue(), 1)
+
+        self.assertEqual(CellInfo.objects.count(), 2)
+        self.assertEqual(IngestReceipt.objects.get().created, 2)
+        self.assertEqual(self.queue.stats(), {'pending': 0, 'in_flight': 0, 'dead': 0, 'lag_seconds': 0})
+
+    def test_rejected_items_are_logged_by_their_position_in_the_request(self):
+        self.client.post('/api/enqueue_batch/', [
+            {'lat': 'north'}, self.cell_info(), self.cell_info(phone_number='09990000000'),
+        ], content_type='application/json')
+
+        with self.assertLogs('api.ingest', 'WARNING') as logs:
+            drain_ingest_queue()
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('#2 rejected', logs.output[0])
+        self.assertEqual(IngestReceipt.objects.get().rejected, 1)
+
+    def test_failing_entry_becomes_a_dead_letter(self):
+        self.queue.put({'items': [self.cell_info()], 'indices': [0]})
+
+        with patch('api.ingest.ingest_batch', side_effect=RuntimeError('database down')), self.assertLogs('api.ingest'):
+            drain_ingest_queue()
+            with self.later(31):
+                drain_ingest_queue()
+        with self.later(62):
+            self.assertEqual(drain_ingest_queue(), 0)
+
+        self.assertEqual(self.queue.stats()['dead'], 1)
+        self.assertFalse(CellInfo.objects.exists())
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_cell_info(self, cid):
+        return self.client.post('/api/add_cell_info/', {
+            'phone_number': self.user.phone_number, 'lat': 35.7, 'lng': 51.4, 'timestamp': timezone.now().isoformat(),
+            'gen': '4G', 'tech': 'LTE', 'plmn': '43211', 'cid': cid,
+        }, format='json')
+
+    def test_writes_invalidate_cached_listings(self):
+        self.assertEqual(self.post_cell_info(1).status_code, 201)
+
+        first = self.client.get('/api/get_cell_infos/')
+        hit = self.client.get('/api/get_cell_infos/')
+        self.assertEqual(self.post_cell_info(2).status_code, 201)
+        after_write = self.client.get('/api/get_cell_infos/')
+        hit_again = self.client.get('/api/get_cell_infos/')
+
+        self.assertEqual([response['X-Cache'] for response in (first, hit, after_write, hit_again)], [
+            'MISS', 'HIT', 'MISS', 'HIT',
+        ])
+        self.assertEqual([response.json()['count'] for response in (first, hit, after_write, hit_again)], [1, 1, 2, 2])
+        self.assertEqual(self.client.get('/api/get_cache_stats/').json()['cell_info'], {
+            'hits': 2, 'misses': 2, 'version': 2,
+        })
+
+
+class TokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def test_listing_requires_a_valid_token(self):
+        self.assertEqual(self.client.get('/api/get_cell_infos/').status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token not-a-token')
+        self.assertEqual(self.client.get('/api/get_cell_infos/').status_code, 401)
+
+    def test_token_is_cached_between_requests(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get('/api/get_cell_infos/').status_code, 200)
+
+        # A different range misses the response cache, leaving only the
+        # listing's COUNT and SELECT; the token itself comes from the cache.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/get_cell_infos/', {'range': '1h'}).status_code, 200)
+
+    def test_logout_revokes_the_cached_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get('/api/get_cell_infos/').status_code, 200)
+
+        self.assertEqual(self.client.post('/api/logout/').status_code, 200)
+
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        self.assertEqual(self.client.get('/api/get_cell_infos/').status_code, 401)
+
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for rsrp in (-100, -90, -80):
+            cell_info = CellInfo.objects.create(
+                phone_number=self.user, lat=35.7, lng=51.4, timestamp=timezone.now(),
+                gen='4G', tech='LTE', plmn='43211', cid=1234, rsrp=rsrp,
+            )
+        test = Test.objects.create(phone_number=self.user, timestamp=timezone.now(), cell_info=cell_info, test_type='ping')
+        PingTest.objects.create(id=test, latency=40.0)
+
+    def test_parquet_export_streams_typed_columns(self):
+        import pyarrow.parquet
+
+        response = self.client.get('/api/export/', {'dataset': 'tests', 'file_format': 'parquet', 'range': '1d'})
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tests.parquet"')
+        table = pyarrow.parquet.read_table(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.column('latency').to_pylist(), [40.0])
+        self.assertEqual((table.column('type').to_pylist(), table.column('cid').to_pylist()), (['ping'], [1234]))
+
+    def test_arrow_export_writes_one_batch_per_page(self):
+        import pyarrow.ipc
+
+        sink = BytesIO()
+        self.assertEqual(write_export('cell_info', 'arrow', sink, chunk_size=2), 3)
+
+        reader = pyarrow.ipc.open_file(BytesIO(sink.getvalue()))
+        self.assertEqual(reader.num_record_batches, 2)
+        self.assertEqual(reader.read_all().column('rsrp').to_pylist(), [-100.0, -90.0, -80.0])
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'measurements.ndjson')
+
+    def record(self, cid, **overrides):
+        return {
+            'phone_number': self.user.phone_number, 'lat': 35.7, 'lng': 51.4, 'timestamp': '2025-06-01T12:00:00Z',
+            'gen': '4G', 'tech': 'LTE', 'plmn': '43211', 'cid': cid, **overrides,
+        }
+
+    def test_interrupted_import_resumes_from_its_checkpoint(self):
+        records = [
+            self.record(1), self.record(2), self.record(3, lat='north'), self.record(1),
+            self.record(4, phone_number='09990000000'),
+        ]
+        with open(self.path, 'w') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+        load = ImportCommand._load
+
+        def crash_on_second_batch(command, batch, rejects, state):
+            if state['line'] > 0:
+                raise RuntimeError('killed')
+            return load(command, batch, rejects, state)
+
+        with patch.object(ImportCommand, '_load', crash_on_second_batch), self.assertRaises(RuntimeError):
+            call_command('import_measurements', self.path, '--batch-size', '2', stdout=StringIO())
+        output = StringIO()
+        call_command('import_measurements', self.path, '--batch-size', '2', stdout=output)
+
+        self.assertIn('Resuming', output.getvalue())
+        self.assertIn('Done: 2 created, 1 duplicates, 2 rejected', output.getvalue())
+        self.assertEqual(sorted(CellInfo.objects.values_list('cid', flat=True)), [1, 2])
+        with open(f'{self.path}.rejects') as f:
+            rejects = [json.loads(line) for line in f]
+        self.assertEqual([reject['line'] for reject in rejects], [3, 5])
+        self.assertIn('lat', rejects[0]['errors'])
+
+        call_command('import_measurements', self.path, '--restart', stdout=output)
+        self.assertIn('Done: 0 created, 3 duplicates, 2 rejected', output.getvalue())
+
+
+class BenchmarkTests(TestCase):
+    def test_run_benchmarks_reports_every_endpoint(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'report.json')
+
+        # The command normally creates its own throwaway database; this test's is used instead.
+        with patch.object(connection.creation, 'create_test_db'), patch.object(connection.creation, 'destroy_test_db'):
+            call_command(
+                'run_benchmarks', '--devices', '2', '--cycles', '1', '--listing-requests', '1', '--output', path,
+                stdout=StringIO(),
+            )
+
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(report['meta']['devices'], 2)
+        self.assertTrue(report['endpoints'])
+        for name, endpoint in report['endpoints'].items():
+            self.assertEqual(endpoint['errors'], 0, name)
+
+@override_settings(ROLLUP_LAG_SECONDS=60)
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.hour = timezone.now().replace(minute=10, second=0, microsecond=0) - timedelta(hours=3)
+
+    def create_cell_info(self, rsrp, **fields):
+        return CellInfo.objects.create(
+            phone_number=self.user, lat=35.7, lng=51.4, timestamp=self.hour,
+            gen='4G', tech='LTE', plmn='43211', cid=1234, rsrp=rsrp, **fields,
+        )
+
+    def later(self, seconds):
+        return patch('polaris.rollups.timezone.now', return_value=timezone.now() + timedelta(seconds=seconds))
+
+    def test_rows_are_rolled_up_once_their_ids_settle(self):
+        self.create_cell_info(-100, id=1)
+        self.create_cell_info(-90, id=3)
+        self.assertIsNone(update_cell_info_rollups())
+
+        # Commits after a higher id was already visible.
+        self.create_cell_info(-80, id=2)
+        with self.later(30):
+            self.assertIsNone(update_cell_info_rollups())
+        with self.later(61):
+            self.assertEqual(update_cell_info_rollups(), 1)
+            self.assertIsNone(update_cell_info_rollups())
+
+        rollup = CellInfoRollup.objects.get()
+        self.assertEqual((rollup.samples, rollup.rsrp_sum, rollup.rsrp_max), (3, -270.0, -80.0))
+
+    def test_deleted_rows_do_not_hold_back_the_watermark(self):
+        self.create_cell_info(-100)
+        update_cell_info_rollups()
+        CellInfo.objects.all().delete()
+
+        with self.later(61):
+            self.assertEqual(update_cell_info_rollups(), 0)
+            self.create_cell_info(-90)
+            self.assertIsNone(update_cell_info_rollups())
+
+        self.assertEqual(watermark('cell_info'), 1)
+
+    @override_settings(ROLLUP_LAG_SECONDS=0)
+    def test_check_rollups_reports_drift(self):
+        self.create_cell_info(-100)
+        test = Test.objects.create(phone_number=self.user, timestamp=self.hour, test_type='ping')
+        PingTest.objects.create(id=test, latency=40.0)
+        call_command('update_rollups', stdout=StringIO())
+        call_command('check_rollups', stdout=StringIO())
+
+        CellInfoRollup.objects.update(samples=2)
+
+        with self.assertRaises(CommandError):
+            call_command('check_rollups', stdout=StringIO(), stderr=StringIO())
+
+    @override_settings(ROLLUP_LAG_SECONDS=0)
+    def test_aggregates_top_up_rollups_with_uncovered_rows(self):
+        self.create_cell_info(-100)
+        self.create_cell_info(-90)
+        update_cell_info_rollups()
+        self.create_cell_info(-80)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        data = client.get('/api/get_aggregates/', {
+            'metric': 'rsrp', 'bucket': '1h', 'range': '1d', 'stats': 'count,mean,min,max',
+        }).json()
+
+        self.assertEqual(data['source'], 'rollup')
+        self.assertEqual(data['series'], [{
+            'bucket_start': self.hour.replace(minute=0).isoformat().replace('+00:00', 'Z'),
+            'count': 3, 'mean': -90.0, 'min': -100.0, 'max': -80.0,
+        }])
+
+
+class AggregationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.hour = timezone.now().replace(minute=10, second=0, microsecond=0) - timedelta(hours=3)
+
+    def create_cell_info(self, rsrp, cid=1234, timestamp=None):
+        return CellInfo.objects.create(
+            phone_number=self.user, lat=35.7, lng=51.4, timestamp=timestamp or self.hour,
+            gen='4G', tech='LTE', plmn='43211', cid=cid, rsrp=rsrp,
+        )
+
+    def aggregate(self, **params):
+        return self.client.get('/api/get_aggregates/', {'metric': 'rsrp', 'range': '1d', **params}).json()
+
+    def test_epoch_bucket_floors_to_the_bucket_width(self):
+        timestamp = datetime(2026, 1, 1, 0, 7, 30, tzinfo=dt_timezone.utc)
+        self.create_cell_info(-100, timestamp=timestamp)
+
+        index = CellInfo.objects.annotate(index=EpochBucket('timestamp', 300)).values_list('index', flat=True).get()
+
+        self.assertEqual(index, int(timestamp.timestamp()) // 300)
+        self.assertEqual(bucket_start(index, 300), '2026-01-01T00:05:00Z')
+
+    def test_percentiles_use_the_nearest_rank(self):
+        for rsrp in range(-100, -90):
+            self.create_cell_info(rsrp)
+
+        data = self.aggregate(bucket='5m', stats='count,p50,p90')
+
+        self.assertEqual(data['source'], 'raw')
+        self.assertEqual([{key: point[key] for key in ('count', 'p50', 'p90')} for point in data['series']], [
+            {'count': 10, 'p50': -96.0, 'p90': -92.0},
+        ])
+
+    def test_percentiles_are_read_per_point_and_capped(self):
+        for rsrp, cid, minutes in ((-100, 1, 0), (-90, 1, 0), (-80, 1, 0), (-70, 2, 0), (-60, 1, 10), (-50, 1, 10)):
+            self.create_cell_info(rsrp, cid=cid, timestamp=self.hour + timedelta(minutes=minutes))
+
+        data = self.aggregate(bucket='5m', group_by='cid', stats='count,p50,p90')
+
+        self.assertEqual([(point['cid'], point['count'], point['p50'], point['p90']) for point in data['series']], [
+            (1, 3, -90.0, -80.0), (2, 1, -70.0, -70.0), (1, 2, -60.0, -50.0),
+        ])
+        with patch('api.aggregation.MAX_PERCENTILE_POINTS', 2):
+            response = self.client.get('/api/get_aggregates/', {
+                'metric': 'rsrp', 'bucket': '5m', 'group_by': 'cid', 'stats': 'p50',
+            })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Percentiles are limited to 2 points', response.json()['error'])
+
+    def test_group_by_splits_each_bucket(self):
+        for rsrp, cid in ((-100, 1), (-90, 1), (-80, 2)):
+            self.create_cell_info(rsrp, cid=cid)
+
+        data = self.aggregate(bucket='1h', group_by='cid', stats='count,mean')
+
+        self.assertEqual([(point['cid'], point['count'], point['mean']) for point in data['series']], [
+            (1, 2, -95.0), (2, 1, -80.0),
+        ])
+
+    def test_rollups_serve_hour_aligned_buckets_without_percentiles(self):
+        self.assertTrue(can_use_rollups('1d', ['count', 'mean']))
+        self.assertFalse(can_use_rollups('1h', ['count', 'p90']))
+        self.assertFalse(can_use_rollups('5m', ['count']))
+        self.create_cell_info(-100)
+
+        self.assertEqual(self.aggregate(bucket='1h', stats='count')['source'], 'rollup')
+        self.assertEqual(self.aggregate(bucket='1h', stats='count,p50')['source'], 'raw')
+        self.assertEqual(self.aggregate(bucket='bogus')['error'], 'Invalid bucket. Use one of: 1m, 5m, 1h, 1d.')
+
+
+class HeatmapTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def heatmap(self, bbox, **params):
+        return self.client.get('/api/get_heatmap/', {'bbox': bbox, **params})
+
+    def test_quadkeys_encode_tile_coordinates(self):
+        self.assertEqual(xy_to_quadkey(3, 5, 3), '213')
+        self.assertEqual(quadkey_to_xy('213'), (3, 5))
+        self.assertEqual(quadkey(0.0, 0.0, 1), '3')
+        self.assertEqual(quadkey(90.0, -180.0, 2), '00')
+        self.assertEqual(len(quadkey(35.7, 51.4)), TILE_ZOOM)
+        self.assertTrue(quadkey(35.7, 51.4).startswith(quadkey(35.7, 51.4, 10)))
+
+    def test_covering_quadkeys_prefix_every_point_in_the_box(self):
+        prefixes = covering_quadkeys(35.6, 51.2, 35.8, 51.6)
+
+        self.assertLessEqual(len(prefixes), 16)
+        for lat in (35.6, 35.7, 35.8):
+            for lng in (51.2, 51.4, 51.6):
+                self.assertTrue(any(quadkey(lat, lng).startswith(prefix) for prefix in prefixes))
+
+    def test_measurements_are_grouped_per_tile(self):
+        for lat, lng, rsrp in ((35.7001, 51.4001, -100), (35.7002, 51.4002, -90), (35.75, 51.45, -80), (10.0, 10.0, -70)):
+            CellInfo.objects.create(
+                phone_number=self.user, lat=lat, lng=lng, timestamp=timezone.now(),
+                gen='4G', tech='LTE', plmn='43211', cid=1234, rsrp=rsrp,
+            )
+
+        tiles = self.heatmap('51.3,35.6,51.5,35.8', zoom=12).json()['tiles']
+
+        self.assertEqual({tile['quadkey']: (tile['count'], tile['mean']) for tile in tiles}, {
+            quadkey(35.7001, 51.4001, 12): (2, -95.0),
+            quadkey(35.75, 51.45, 12): (1, -80.0),
+        })
+        self.assertTrue(all((tile['x'], tile['y']) == quadkey_to_xy(tile['quadkey']) for tile in tiles))
+
+    @override_settings(ROLLUP_LAG_SECONDS=0)
+    def test_rolled_up_hours_are_read_from_tile_rollups(self):
+        for minutes, rsrp in ((120, -100), (125, -90)):
+            CellInfo.objects.create(
+                phone_number=self.user, lat=35.7001, lng=51.4001, timestamp=timezone.now() - timedelta(minutes=minutes),
+                gen='4G', tech='LTE', plmn='43211', cid=1234, rsrp=rsrp,
+            )
+        update_cell_info_rollups()
+        self.assertEqual(TileRollup.objects.filter(zoom=14).count(), 1)
+        # Only the rollups can still answer for these rows.
+        CellInfo.objects.all().delete()
+        CellInfo.objects.create(
+            phone_number=self.user, lat=35.7002, lng=51.4002, timestamp=timezone.now(),
+            gen='4G', tech='LTE', plmn='43211', cid=1234, rsrp=-80,
+        )
+
+        tiles = self.heatmap('51.3,35.6,51.5,35.8', zoom=13).json()['tiles']
+
+        self.assertEqual([(tile['quadkey'], tile['count'], tile['mean'], tile['min'], tile['max']) for tile in tiles], [
+            (quadkey(35.7001, 51.4001, 13), 3, -90.0, -100.0, -80.0),
+        ])
+
+    def test_invalid_bbox_and_zoom_are_rejected(self):
+        for bbox, params in (
+            ('51.3,35.6,51.5', {}),
+            ('51.5,35.6,51.3,35.8', {}),
+            ('51.3,35.6,51.5,35.8', {'zoom': TILE_ZOOM + 1}),
+            ('51.3,35.6,51.5,35.8', {'zoom': 'close'}),
+            ('-180,-85,180,85', {'zoom': TILE_ZOOM}),
+            ('51.3,35.6,51.5,35.8', {'metric': 'latency'}),
+        ):
+            self.assertEqual(self.heatmap(bbox, **params).status_code, 400, (bbox, params))
+
+@override_settings(MEASUREMENT_COMPACTION_DAYS=30, COMPACTION_HORIZON_TTL=0, ROLLUP_LAG_SECONDS=0)
+class CompactionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_measurement(self, timestamp, rsrp, latency):
+        cell_info = CellInfo.objects.create(
+            phone_number=self.user, lat=35.7, lng=51.4, timestamp=timestamp,
+            gen='4G', tech='LTE', plmn='43211', cid=1234, rsrp=rsrp,
+        )
+        test = Test.objects.create(phone_number=self.user, timestamp=timestamp, cell_info=cell_info, test_type='ping')
+        PingTest.objects.create(id=test, latency=latency)
+
+    def test_listings_serve_rollups_for_compacted_hours(self):
+        old = timezone.now().replace(minute=10) - timedelta(days=40)
+        self.create_measurement(old, -100, 30.0)
+        self.create_measurement(old + timedelta(minutes=5), -90, 50.0)
+        self.create_measurement(timezone.now(), -80, 20.0)
+
+        call_command('compact_measurements', stdout=StringIO())
+
+        self.assertEqual(CellInfo.objects.count(), 1)
+        self.assertEqual(Test.objects.count(), 1)
+
+        cell_infos = self.client.get('/api/get_cell_infos/').json()
+        self.assertEqual(cell_infos['count'], 2)
+        summary, raw = cell_infos['results']
+        self.assertTrue(summary['compacted'])
+        self.assertEqual((summary['samples'], summary['rsrp'], summary['rsrp_min']), (2, -95.0, -100.0))
+        self.assertEqual(raw['rsrp'], -80.0)
+
+        tests = self.client.get('/api/get_tests/', {'type': 'ping'}).json()['results']
+        self.assertEqual(tests[0]['detail']['latency'], 40.0)
+        self.assertEqual(tests[1]['detail']['latency'], 20.0)
+
+        recent = self.client.get('/api/get_cell_infos/', {'range': '1d'}).json()
+        self.assertEqual(recent['count'], 1)
+
+    def test_heatmap_and_export_cover_compacted_hours(self):
+        old = timezone.now().replace(minute=10) - timedelta(days=40)
+        self.create_measurement(old, -100, 30.0)
+        self.create_measurement(old + timedelta(minutes=5), -90, 50.0)
+        self.create_measurement(timezone.now(), -80, 20.0)
+        call_command('compact_measurements', stdout=StringIO())
+        horizon = compacted_before()
+
+        # 'since' lands inside the compacted hour, which is then counted whole.
+        for time_filter in ('41d', f'{((timezone.now() - old).total_seconds() - 120) / 3600}h'):
+            tiles = self.client.get('/api/get_heatmap/', {
+                'bbox': '51.3,35.6,51.5,35.8', 'zoom': 12, 'range': time_filter,
+            }).json()['tiles']
+            self.assertEqual([(tile['count'], tile['mean']) for tile in tiles], [(3, -90.0)], time_filter)
+
+        exported = self.client.get('/api/export/', {'dataset': 'cell_info', 'file_format': 'arrow', 'range': '41d'})
+        recent = self.client.get('/api/export/', {'dataset': 'cell_info', 'file_format': 'arrow', 'range': '1d'})
+
+        self.assertEqual(exported['X-Compacted-Before'], horizon.isoformat())
+        self.assertNotIn('X-Compacted-Before', recent)
+
+    def test_summaries_are_paged_and_streamed_with_the_raw_rows(self):
+        old = timezone.now().replace(minute=10) - timedelta(days=40)
+        for hour in range(3):
+            self.create_measurement(old + timedelta(hours=hour), -100 + hour, 30.0)
+        for minute in range(2):
+            self.create_measurement(timezone.now() - timedelta(minutes=minute), -80, 20.0)
+        call_command('compact_measurements', stdout=StringIO())
+        listing = self.client.get('/api/get_cell_infos/').json()['results']
+
+        pages, cursor = [], ''
+        while cursor is not None:
+            page = self.client.get('/api/get_cell_infos/', {'page_size': 2, 'cursor': cursor}).json()
+            pages.append([record.get('compacted', False) for record in page['results']])
+            listing_page, cursor = page['results'], page['next_cursor']
+            self.assertEqual(listing_page, listing[2 * (len(pages) - 1):2 * len(pages)])
+        streamed = self.client.get('/api/get_cell_infos/', {'stream': 1})
+
+        self.assertEqual(pages, [[True, True], [True, False], [False]])
+        self.assertEqual(json.loads(b''.join(streamed.streaming_content))['results'], listing)
+
+    def test_rows_not_yet_rolled_up_are_kept(self):
+        old = timezone.now() - timedelta(days=40)
+        self.create_measurement(old, -100, 30.0)
+        update_cell_info_rollups()
+        update_test_rollups()
+        self.create_measurement(old, -90, 50.0)
+
+        with patch('polaris.compaction._catch_up'):
+            call_command('compact_measurements', stdout=StringIO())
+
+        self.assertEqual(list(CellInfo.objects.values_list('rsrp', flat=True)), [-90.0])
+
+    @override_settings(COMPACTION_HORIZON_TTL=60)
+    def test_horizon_advanced_by_another_process_is_seen_after_the_ttl(self):
+        self.assertIsNone(compacted_before())
+        horizon = compaction_target()
+        RollupWatermark.objects.create(name='compaction', last_id=int(horizon.timestamp()))
+
+        self.assertIsNone(compacted_before())
+        with patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 61):
+            self.assertEqual(compacted_before(), horizon)
+
+    @override_settings(COMPACTION_HORIZON_TTL=60)
+    def test_deletes_wait_for_cached_horizons_to_expire(self):
+        self.create_measurement(timezone.now() - timedelta(days=40), -100, 30.0)
+
+        with patch('polaris.compaction.time.sleep') as sleep:
+            call_command('compact_measurements', stdout=StringIO())
+
+        sleep.assert_called_once_with(60)
+        self.assertFalse(CellInfo.objects.exists())
+
+    def test_check_rollups_skips_compacted_hours(self):
+        self.create_measurement(timezone.now() - timedelta(days=40), -100, 30.0)
+        self.create_measurement(timezone.now(), -80, 20.0)
+
+        call_command('compact_measurements', stdout=StringIO())
+        output = StringIO()
+        call_command('check_rollups', stdout=output)
+
+        self.assertIn('match', output.getvalue())
+
+    def test_speedtest_sessions_of_compacted_rows_are_kept(self):
+        self.create_measurement(timezone.now() - timedelta(days=40), -100, 30.0)
+        session = SpeedTestSession.objects.create(
+            phone_number=self.user, timestamp=timezone.now(), cell_info=CellInfo.objects.get(),
+            test_type='http_download', streams=1, size=1000, test=Test.objects.get(),
+        )
+
+        call_command('compact_measurements', stdout=StringIO())
+
+        connection.check_constraints()
+        session.refresh_from_db()
+        self.assertEqual((session.test_id, session.cell_info_id), (None, None))
+
+
+@override_settings(MEASUREMENT_RETENTION_MONTHS=12)
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+
+    def create_measurement(self, timestamp):
+        cell_info = CellInfo.objects.create(
+            phone_number=self.user, lat=35.7, lng=51.4, timestamp=timestamp,
+            gen='4G', tech='LTE', plmn='43211', cid=1234,
+        )
+        test = Test.objects.create(phone_number=self.user, timestamp=timestamp, cell_info=cell_info, test_type='ping')
+        PingTest.objects.create(id=test, latency=30.0)
+        return cell_info, test
+
+    def test_cutoff_is_the_start_of_the_oldest_retained_month(self):
+        now = datetime(2026, 3, 15, 12, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(retention_cutoff(now), datetime(2025, 3, 1, tzinfo=dt_timezone.utc))
+        with override_settings(MEASUREMENT_RETENTION_MONTHS=3):
+            self.assertEqual(retention_cutoff(now), datetime(2025, 12, 1, tzinfo=dt_timezone.utc))
+        with override_settings(MEASUREMENT_RETENTION_MONTHS=None):
+            self.assertIsNone(retention_cutoff(now))
+
+    def test_rows_before_the_cutoff_month_are_deleted(self):
+        cutoff = retention_cutoff()
+        self.create_measurement(cutoff - timedelta(microseconds=1))
+        kept_cell_info, kept_test = self.create_measurement(cutoff)
+
+        call_command('expire_measurements', stdout=StringIO())
+
+        self.assertEqual(list(CellInfo.objects.all()), [kept_cell_info])
+        self.assertEqual(list(Test.objects.all()), [kept_test])
+        self.assertEqual(list(PingTest.objects.values_list('id', flat=True)), [kept_test.id])
+
+    def test_subtype_rows_are_deleted_with_their_tests(self):
+        old = retention_cutoff() - timedelta(days=1)
+        for type_, detail in TEST_DETAILS.items():
+            test = Test.objects.create(phone_number=self.user, timestamp=old, test_type=type_)
+            TEST_SERIALIZER_MAP[type_].Meta.model.objects.create(id=test, **detail)
+
+        # Per chunk: its ids twice, one DELETE per subtype table, the session
+        # UPDATE and the tests' DELETE in a savepoint; then the empty last chunk.
+        with self.assertNumQueries(13):
+            self.assertEqual(purge_tests(None, retention_cutoff()), len(TEST_DETAILS))
+
+        for type_ in TEST_DETAILS:
+            self.assertFalse(TEST_SERIALIZER_MAP[type_].Meta.model.objects.exists())
+
+    def test_newer_tests_of_an_expired_cell_info_are_kept(self):
+        cell_info, _ = self.create_measurement(retention_cutoff() - timedelta(days=1))
+        newer = Test.objects.create(phone_number=self.user, timestamp=timezone.now(), cell_info=cell_info, test_type='ping')
+
+        call_command('expire_measurements', stdout=StringIO())
+
+        newer.refresh_from_db()
+        self.assertIsNone(newer.cell_info_id)
+        self.assertFalse(CellInfo.objects.exists())
+
+    def test_dry_run_only_lists_the_months(self):
+        old = retention_cutoff() - timedelta(days=1)
+        self.create_measurement(old)
+        output = StringIO()
+
+        call_command('expire_measurements', '--dry-run', stdout=output)
+
+        self.assertEqual(output.getvalue().strip(), f"Would expire {old:%Y-%m}: 1 tests, 1 cell infos")
+        self.assertEqual((CellInfo.objects.count(), Test.objects.count()), (1, 1))
+
+    def test_speedtest_sessions_of_expired_rows_are_kept(self):
+        cell_info, test = self.create_measurement(timezone.now() - timedelta(days=400))
+        session = SpeedTestSession.objects.create(
+            phone_number=self.user, timestamp=test.timestamp, cell_info=cell_info, test_type='http_download', streams=1, size=1000, test=test,
+        )
+
+        call_command('expire_measurements', stdout=StringIO())
+
+        connection.check_constraints()
+        session.refresh_from_db()
+        self.assertEqual((session.test_id, session.cell_info_id), (None, None))
+        self.assertFalse(Test.objects.exists())
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        compacted_before()
+        instrumentation.reset()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get('/api/get_tests/')
+
+        timing = response['Server-Timing']
+        for name in ('db', 'serialize', 'render', 'total'):
+            self.assertIn(f'{name};dur=', timing)
+        self.assertIn('desc="2 queries"', timing)
+
+        metrics = self.client.get('/api/metrics/').content.decode()
+        self.assertIn('polaris_request_queries_count{method="GET",endpoint="get_tests"} 1', metrics)
+        self.assertIn('polaris_request_queries_bucket{method="GET",endpoint="get_tests",le="2"} 1', metrics)
+        self.assertIn('polaris_response_size_bytes_sum{method="GET",endpoint="get_tests"}', metrics)
+
+    def test_monitoring_endpoints_need_a_token_or_an_allowed_address(self):
+        anonymous = APIClient()
+        paths = ['/api/metrics/', '/api/get_cache_stats/', '/api/get_ingest_queue_stats/']
+
+        with patch('api.views.get_ingest_queue') as queue:
+            queue.return_value.stats.return_value = {'pending': 0}
+            self.assertEqual([anonymous.get(path).status_code for path in paths], [401] * 3)
+            with override_settings(MONITORING_ALLOWED_IPS=['127.0.0.1']):
+                self.assertEqual([anonymous.get(path).status_code for path in paths], [200] * 3)
+            self.assertEqual([self.client.get(path).status_code for path in paths], [200] * 3)
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_query_shape_is_flagged(self):
+        def view(request):
+            for pk in range(3):
+                list(Test.objects.filter(pk=pk))
+            return HttpResponse()
+        middleware = instrumentation.InstrumentationMiddleware(view)
+
+        with self.assertLogs('api.instrumentation', 'WARNING') as logs:
+            middleware(RequestFactory().get('/anything/'))
+
+        self.assertIn('Possible N+1', logs.output[0])
+        self.assertIn('polaris_n_plus_one_total{method="GET",endpoint="unmatched"} 1', instrumentation.expose())
+
+
+class AsgiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.token = Token.objects.create(user=self.user)
+        CellInfo.objects.create(
+            phone_number=self.user, lat=35.7, lng=51.4, timestamp=timezone.now(),
+            gen='4G', tech='LTE', plmn='43211', cid=1234,
+        )
+
+    async def test_streamed_listing_is_async_under_asgi(self):
+        response = await self.async_client.get(
+            '/api/get_cell_infos/', {'stream': '1'}, headers={'Authorization': f'Token {self.token.key}'},
+        )
+
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([row['cid'] for row in json.loads(body)['results']], [1234])
+
+    async def test_add_cell_info_is_idempotent(self):
+        payload = {
+            'phone_number': self.user.phone_number, 'lat': 35.7, 'lng': 51.4, 'timestamp': timezone.now().isoformat(),
+            'gen': '4G', 'tech': 'LTE', 'plmn': '43211', 'cid': 99, 'uuid': '3f2a6c1e-8a57-4c2e-9c1b-2b6f1d0e9a11',
+        }
+
+        first = await self.async_client.post('/api/add_cell_info/', payload, content_type='application/json')
+        again = await self.async_client.post('/api/add_cell_info/', payload, content_type='application/json')
+
+        self.assertEqual((first.status_code, again.status_code), (201, 200))
+        self.assertEqual(first.json(), again.json())
+        self.assertEqual(await CellInfo.objects.filter(cid=99).acount(), 1)
+
+    async def test_download_test_serves_ranges_of_the_payload(self):
+        full = await self.async_client.get('/api/download_test/', {'size': 1000})
+        body = b''.join([chunk async for chunk in full.streaming_content])
+        part = await self.async_client.get('/api/download_test/', {'size': 1000}, headers={'Range': 'bytes=100-199'})
+        beyond = await self.async_client.get('/api/download_test/', {'size': 1000}, headers={'Range': 'bytes=1000-'})
+
+        self.assertEqual((full['Content-Length'], len(body)), ('1000', 1000))
+        self.assertEqual(part.status_code, 206)
+        self.assertEqual(part['Content-Range'], 'bytes 100-199/1000')
+        self.assertEqual(b''.join([chunk async for chunk in part.streaming_content]), body[100:200])
+        self.assertEqual((beyond.status_code, beyond['Content-Range']), (416, 'bytes */1000'))
+
+
+class UploadTestTests(TestCase):
+    def test_multipart_body_is_counted_without_parsing(self):
+        payload = SimpleUploadedFile('test.bin', b'\x01' * 300_000)
+
+        response = self.client.post('/api/upload_test/', {'file': payload})
+
+        result = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((result['status'], result['file_size_mb']), ('success', 0.29))
+        self.assertGreater(result['bytes'], 300_000)
+        self.assertEqual(sum(result['intervals']), result['bytes'])
+
+    def test_chunked_body_without_content_length_is_counted(self):
+        response = self.client.post(
+            '/api/upload_test/', b'', content_type='application/octet-stream',
+            CONTENT_LENGTH='', HTTP_TRANSFER_ENCODING='chunked', **{'wsgi.input': BytesIO(b'\x01' * 200_000)},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['bytes'], 200_000)
+
+    def test_asgi_sink_drains_the_body_before_django(self):
+        seen = {}
+
+        async def application(scope, receive, send):
+            seen['meter'] = scope[UPLOAD_SCOPE_KEY]
+            seen['body'] = await receive()
+
+        messages = [
+            {'type': 'http.request', 'body': b'x' * 1000, 'more_body': True},
+            {'type': 'http.request', 'body': b'x' * 500, 'more_body': False},
+        ]
+
+        async def receive():
+            return messages.pop(0)
+
+        sink = UploadSink(application, paths=['/api/upload_test/'])
+        async_to_sync(sink)({'type': 'http', 'path': '/api/upload_test/'}, receive, None)
+
+        self.assertEqual(seen['meter'].received, 1500)
+        self.assertEqual(seen['body'], {'type': 'http.request', 'body': b'', 'more_body': False})
+
+
+class EchoTests(TestCase):
+    def test_wsgi_echo_answers_without_django(self):
+        def application(environ, start_response):
+            raise AssertionError("The echo path reached Django")
+
+        echo = WSGIEcho(application, path='/api/echo/')
+        body = b''.join(echo({'PATH_INFO': '/api/echo/', 'QUERY_STRING': 'seq=3'}, lambda status, headers: None))
+
+        self.assertEqual(json.loads(body)['seq'], '3')
+
+    def test_websocket_echoes_every_message_with_a_timestamp(self):
+        messages = [
+            {'type': 'websocket.connect'},
+            {'type': 'websocket.receive', 'text': '1'},
+            {'type': 'websocket.receive', 'text': '2'},
+            {'type': 'websocket.disconnect'},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        async_to_sync(Echo(None, path='/api/echo/'))({'type': 'websocket', 'path': '/api/echo/'}, receive, send)
+
+        self.assertEqual(sent[0], {'type': 'websocket.accept'})
+        replies = [json.loads(message['text']) for message in sent[1:]]
+        self.assertEqual([reply['seq'] for reply in replies], ['1', '2'])
+        self.assertLessEqual(replies[0]['server_time'], replies[1]['server_time'])
+
+
+class SpeedTestSessionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.cell_info = CellInfo.objects.create(
+            phone_number=self.user, lat=35.7, lng=51.4, timestamp=timezone.now(),
+            gen='4G', tech='LTE', plmn='43211', cid=1234,
+        )
+
+    def start(self, type_, **extra):
+        response = self.client.post('/api/speedtest/start/', {
+            'type_': type_, 'phone_number': self.user.phone_number, 'timestamp': timezone.now().isoformat(),
+            'cell_info': self.cell_info.id, 'streams': 2, **extra,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def test_download_streams_are_recorded_as_one_test(self):
+        session = self.start('http_download', size=100_000)
+
+        for url in session['streams']:
+            response = self.client.get(url)
+            self.assertEqual(len(b''.join(response.streaming_content)), 100_000)
+
+        result = self.client.get('/api/speedtest/result/', {'session': session['session']}).json()
+        test = Test.objects.get(uuid=session['session'])
+        self.assertEqual((result['completed'], result['bytes'], result['test']), (2, 200_000, test.id))
+        self.assertEqual(test.httpdownloadtest.throughput, result['throughput'])
+        self.assertEqual(self.client.get(session['streams'][0]).status_code, 400)
+
+    def test_upload_streams_are_recorded_once_all_report(self):
+        session = self.start('http_upload')
+        first, second = session['streams']
+
+        self.assertFalse(self.client.post(first, b'x' * 50_000, content_type='application/octet-stream').json()['recorded'])
+        self.assertTrue(self.client.post(second, b'x' * 50_000, content_type='application/octet-stream').json()['recorded'])
+
+        self.assertEqual(SpeedTestStream.objects.filter(session_id=session['session']).count(), 2)
+        self.assertTrue(HTTPUploadTest.objects.filter(id__uuid=session['session']).exists())
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='09120000000', password='Passw0rd!', username='tester')
+        self.token = Token.objects.create(user=self.user)
+
+    def cell_info(self, cid):
+        return {
+            'phone_number': self.user.phone_number, 'lat': 35.7, 'lng': 51.4, 'timestamp': timezone.now().isoformat(),
+            'gen': '4G', 'tech': 'LTE', 'plmn': '43211', 'cid': cid,
+        }
+
+    def post(self, body, encoding):
+        return self.client.post(
+            '/api/add_cell_info/', body, content_type='application/json', headers={'Content-Encoding': encoding},
+        )
+
+    def test_gzip_and_zstd_bodies_are_ingested(self):
+        payloads = {'gzip': gzip.compress}
+        if compression.zstandard is not None:
+            payloads['zstd'] = compression.zstandard.ZstdCompressor().compress
+
+        for cid, (encoding, compress) in enumerate(payloads.items()):
+            response = self.post(compress(json.dumps(self.cell_info(cid)).encode()), encoding)
+            self.assertEqual(response.status_code, 201, encoding)
+
+        self.assertEqual(CellInfo.objects.count(), len(payloads))
+        self.assertEqual(self.post(b'{}', 'br').status_code, 415)
+
+    @skipUnless(find_spec('zstandard'), "needs the optional zstandard package")
+    def test_zstd_round_trip(self):
+        zstd = compression.zstandard
+        body = zstd.ZstdCompressor().compress(json.dumps(self.cell_info(1)).encode())
+        self.assertEqual(self.post(body, 'zstd').status_code, 201)
+        self.assertEqual(CellInfo.objects.get().cid, 1)
+        headers = {'Authorization': f'Token {self.token.key}'}
+
+        plain = self.client.get('/api/get_cell_infos/', headers=headers)
+        compressed = self.client.get('/api/get_cell_infos/', headers={**headers, 'Accept-Encoding': 'gzip, zstd'})
+
+        self.assertEqual(compressed['Content-Encoding'], 'zstd')
+        self.assertEqual(json.loads(zstd.ZstdDecompressor().decompress(compressed.content)), plain.json())
+
+    def test_refused_codings_are_not_picked_by_the_wildcard(self):
+        self.assertEqual(compression.negotiate('*'), compression.encodings()[0])
+        self.assertEqual(compression.negotiate('zstd;q=0, *'), 'gzip')
+        self.assertEqual(compression.negotiate('gzip;q=0.5'), 'gzip')
+        self.assertIsNone(compression.negotiate('zstd;q=0, gzip;q=0, *'))
+        CellInfo.objects.create(**{**self.cell_info(1), 'phone_number': self.user})
+
+        response = self.client.get('/api/get_cell_infos/', headers={
+            'Authorization': f'Token {self.token.key}', 'Accept-Encoding': 'zstd;q=0, *',
+        })
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    @override_settings(MAX_DECOMPRESSED_REQUEST_SIZE=1000)
+    def test_decompressed_size_is_capped(self):
+        body = json.dumps({**self.cell_info(1), 'padding': ' ' * 5000}).encode()
+
+        response = self.post(gzip.compress(body), 'gzip')
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(CellInfo.objects.exists())
+
+    def test_listing_is_compressed_when_accepted(self):
+        for cid in range(20):
+            CellInfo.objects.create(**{**self.cell_info(cid), 'phone_number': self.user})
+        headers = {'Authorization': f'Token {self.token.key}'}
+
+        plain = self.client.get('/api/get_cell_infos/', headers=headers)
+        compressed = self.client.get('/api/get_cell_infos/', headers={**headers, 'Accept-Encoding': 'gzip'})
+        cached = self.client.get('/api/get_cell_infos/', headers={**headers, 'Accept-Encoding': 'gzip'})
+
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(compressed.content)), plain.json())
+        self.assertEqual((cached['X-Cache'], cached.content), ('HIT', compressed.content))
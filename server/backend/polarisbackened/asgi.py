@@ -11,6 +11,11 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from api.speedtest import Echo, UploadSink
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'polarisbackened.settings')
 
-application = get_asgi_application()
+# Upload-test bodies are measured and discarded before Django buffers them,
+# and latency samples are answered without going through Django at all.
+application = UploadSink(get_asgi_application(), paths=['/api/upload_test/', '/api/speedtest/upload/'])
+application = Echo(application, path='/api/echo/')
@@ -56,8 +56,16 @@ INSTALLED_APPS = [
 #     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 # }
 
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+}
+
 
 MIDDLEWARE = [
+    'api.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -158,6 +166,38 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'polaris.User'
 
+# Addresses that may read /api/metrics/, get_cache_stats/ and
+# get_ingest_queue_stats/ without a token, e.g. a Prometheus scraper. Matched
+# against REMOTE_ADDR, which is the proxy's address behind a reverse proxy.
+MONITORING_ALLOWED_IPS = []
+
+# Local SQLite file backing the write-behind queue of /api/enqueue_batch/.
+INGEST_QUEUE_PATH = BASE_DIR / 'ingest_queue.sqlite3'
+
+# Rows are folded into the hourly rollups only once this many seconds have
+# passed since their ids were first seen, so a transaction that commits a lower
+# id after a higher one is not skipped by the rollup watermark.
+ROLLUP_LAG_SECONDS = 60
+
+# Months of raw CellInfo/Test rows kept by `manage.py expire_measurements`;
+# None keeps everything. Hourly rollups are never expired.
+MEASUREMENT_RETENTION_MONTHS = 12
+
+# Days of full-resolution CellInfo/Test rows kept by `manage.py compact_measurements`;
+# older rows are replaced by the hourly rollups. None disables compaction.
+MEASUREMENT_COMPACTION_DAYS = 30
+
+# Seconds each worker caches the compaction horizon. compact_measurements waits
+# this long after advancing it before deleting raw rows.
+COMPACTION_HORIZON_TTL = 60
+
+# Requests that run one SQL shape this many times are logged as possible N+1
+# queries and counted in polaris_n_plus_one_total (see api/instrumentation.py).
+N_PLUS_ONE_THRESHOLD = 5
+
+# Limit on gzip/zstd request bodies once decompressed (see api/compression.py).
+MAX_DECOMPRESSED_REQUEST_SIZE = 10 * 1024 * 1024
+
 CSRF_TRUSTED_ORIGINS = [
     "https://polaris-server-30ha.onrender.com",
 ]
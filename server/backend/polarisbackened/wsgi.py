@@ -11,6 +11,9 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from api.speedtest import WSGIEcho
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'polarisbackened.settings')
 
-application = get_wsgi_application()
+# Latency samples are answered without going through Django at all.
+application = WSGIEcho(get_wsgi_application(), path='/api/echo/')
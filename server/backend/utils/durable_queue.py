@@ -0,0 +1,95 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class DurableQueue:
+    """
+    Work queue persisted in a local SQLite file.
+
+    Entries survive process restarts and are delivered at least once: a claimed
+    entry is leased for ``lease_seconds`` and becomes visible again unless it is
+    acknowledged. Entries that fail ``max_attempts`` times stay in the file as
+    dead letters instead of being retried forever.
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=5):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' key TEXT UNIQUE NOT NULL,'
+                ' payload TEXT NOT NULL,'
+                ' enqueued_at REAL NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' leased_until REAL NOT NULL DEFAULT 0,'
+                ' last_error TEXT)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def put(self, payload):
+        key = uuid.uuid4().hex
+        self._connection().execute(
+            'INSERT INTO entries (key, payload, enqueued_at) VALUES (?, ?, ?)',
+            (key, json.dumps(payload), time.time()),
+        )
+        return key
+
+    def claim(self, limit):
+        """Lease up to ``limit`` entries, oldest first. Returns ``(id, key, payload)`` tuples."""
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT id, key, payload FROM entries WHERE leased_until < ? AND attempts < ? ORDER BY id LIMIT ?',
+                (now, self.max_attempts, limit),
+            ).fetchall()
+            conn.executemany(
+                'UPDATE entries SET leased_until = ?, attempts = attempts + 1 WHERE id = ?',
+                [(now + self.lease_seconds, row[0]) for row in rows],
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return [(entry_id, key, json.loads(payload)) for entry_id, key, payload in rows]
+
+    def ack(self, ids):
+        self._connection().executemany('DELETE FROM entries WHERE id = ?', [(entry_id,) for entry_id in ids])
+
+    def release(self, entry_id, error, retry_after=30):
+        self._connection().execute(
+            'UPDATE entries SET leased_until = ?, last_error = ? WHERE id = ?',
+            (time.time() + retry_after, str(error), entry_id),
+        )
+
+    def stats(self):
+        pending, leased, dead, oldest = self._connection().execute(
+            'SELECT'
+            ' SUM(attempts < ? AND leased_until < ?),'
+            ' SUM(attempts < ? AND leased_until >= ?),'
+            ' SUM(attempts >= ?),'
+            ' MIN(CASE WHEN attempts < ? THEN enqueued_at END)'
+            ' FROM entries',
+            (self.max_attempts, time.time(), self.max_attempts, time.time(), self.max_attempts, self.max_attempts),
+        ).fetchone()
+        return {
+            'pending': pending or 0,
+            'in_flight': leased or 0,
+            'dead': dead or 0,
+            'lag_seconds': round(time.time() - oldest, 3) if oldest is not None else 0,
+        }
@@ -0,0 +1,56 @@
+import math
+
+# Zoom level stored on each measurement; tiles are roughly 150 m wide at the equator.
+TILE_ZOOM = 18
+
+MAX_LATITUDE = 85.05112878
+
+
+def tile_xy(lat, lng, zoom):
+    """Web Mercator (slippy map) tile coordinates of a point at ``zoom``."""
+    lat = min(max(lat, -MAX_LATITUDE), MAX_LATITUDE)
+    n = 1 << zoom
+    sin_lat = math.sin(math.radians(lat))
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def xy_to_quadkey(x, y, zoom):
+    digits = []
+    for level in range(zoom, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return ''.join(digits)
+
+
+def quadkey_to_xy(quadkey):
+    x = y = 0
+    for digit in quadkey:
+        x, y = x << 1, y << 1
+        digit = int(digit)
+        x |= digit & 1
+        y |= digit >> 1
+    return x, y
+
+
+def quadkey(lat, lng, zoom=TILE_ZOOM):
+    return xy_to_quadkey(*tile_xy(lat, lng, zoom), zoom)
+
+
+def bbox_tiles(min_lat, min_lng, max_lat, max_lng, zoom):
+    """Inclusive tile ranges ``(x0, y0, x1, y1)`` covering a bounding box."""
+    x0, y0 = tile_xy(max_lat, min_lng, zoom)
+    x1, y1 = tile_xy(min_lat, max_lng, zoom)
+    return x0, y0, x1, y1
+
+
+def covering_quadkeys(min_lat, min_lng, max_lat, max_lng, max_tiles=16):
+    """
+    Quadkeys of the deepest zoom level at which at most ``max_tiles`` tiles
+    cover the bounding box. Every point in the box has one of them as prefix.
+    """
+    for zoom in range(TILE_ZOOM, -1, -1):
+        x0, y0, x1, y1 = bbox_tiles(min_lat, min_lng, max_lat, max_lng, zoom)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= max_tiles:
+            return [xy_to_quadkey(x, y, zoom) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
@@ -0,0 +1,34 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+
+def is_asgi(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def streaming_content(request, iterator, blocking=True):
+    """
+    ``iterator`` in the form the running handler can stream without buffering.
+
+    Under ASGI, Django reads a synchronous iterator to the end before sending
+    any of it, so it is wrapped in an async generator. ``blocking`` iterators
+    (database pages, files) are advanced through sync_to_async one chunk at a
+    time; others are iterated directly on the event loop.
+    """
+    if not is_asgi(request):
+        return iterator
+    return _threaded(iterator) if blocking else _direct(iterator)
+
+
+async def _threaded(iterator):
+    done = object()
+    while True:
+        chunk = await sync_to_async(next)(iterator, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+async def _direct(iterator):
+    for chunk in iterator:
+        yield chunk
@@ -0,0 +1,13 @@
+from datetime import timedelta
+
+
+def parse_range(value):
+    """Parse a relative range such as '6h', '1d' or '2w' into a timedelta."""
+    value = value.lower().strip()
+    if value.endswith('h'):
+        return timedelta(hours=float(value[:-1]))
+    if value.endswith('d'):
+        return timedelta(days=int(value[:-1]))
+    if value.endswith('w'):
+        return timedelta(weeks=int(value[:-1]))
+    raise ValueError("Use formats like '1h', '1d', '1w'.")